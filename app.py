@@ -3,9 +3,14 @@ import os
 import logging
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
-from routes import index, music, playlists, debug
+from routes import index, music, playlists, debug, metrics
 from middlewares.supa_auth import supa_auth
 from middlewares.cors_headers import add_cors_middleware
+from middlewares.access_log import add_access_log_middleware
+from middlewares.profiling import add_profiling_middleware
+from services import cache_service, innertube_service, po_token, supabase_service
+from services.cache_snapshot import start_snapshots, stop_snapshots
+from services.warmup import start_warmup
 
 # Crear la app
 app = FastAPI()
@@ -17,17 +22,17 @@ add_cors_middleware(app)
 ENV = os.getenv("NODE_ENV", "development")
 print(f"🚀 Iniciando FastAPI con ENV={ENV}")
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    print(f"➡️ Request recibido: {request.method} {request.url}")
-    response = await call_next(request)
-    print(f"⬅️ Response enviado: {response.status_code} {request.url}")
-    return response
-
 # También tu middleware supa_auth
 app.middleware("http")(supa_auth)
 print("🔐 Middleware supa_auth registrado")
 
+# Server-Timing + profiling on-demand (?__profile=1, ver middlewares/profiling.py)
+add_profiling_middleware(app)
+
+# Access log estructurado (JSON, asíncrono). Se registra último para quedar
+# por fuera de todo y medir también los 401 de supa_auth.
+add_access_log_middleware(app)
+
 # 🚨 Global exception handler
 logger = logging.getLogger("uvicorn.error")
 
@@ -39,10 +44,33 @@ async def global_exception_handler(request: Request, exc: Exception):
         content={"error": "internal_server_error", "detail": str(exc)},
     )
 
+# Warm-up en background (imports pesados, clientes, TLS) sin demorar el arranque
+@app.on_event("startup")
+async def warm_up_upstreams():
+    start_warmup([
+        ("innertube", innertube_service.warm_up),
+        ("yt-dlp", music.warm_up),
+        ("supabase", supabase_service.warm_up),
+        ("po-token", po_token.start_refresher),
+    ])
+
+# Snapshot de caches: restore tibio en background + guardado periódico y al salir
+@app.on_event("startup")
+async def restore_cache_snapshot():
+    start_snapshots([
+        ("metadata", cache_service.export_entries, cache_service.import_entries),
+        ("stream_urls", music.export_cache, music.import_cache),
+    ])
+
+@app.on_event("shutdown")
+async def save_cache_snapshot():
+    stop_snapshots()
+
 # Rutas principales
 app.include_router(index.router, prefix="/api")
 app.include_router(music.router, prefix="/api/music")
 app.include_router(playlists.router, prefix="/api/playlists")
+app.include_router(metrics.router, prefix="/metrics")
 
 # Rutas de debug/test (solo en desarrollo)
 if ENV != "production":
@@ -0,0 +1,154 @@
+# bench/compression.py
+"""
+Benchmark de los cuerpos precomprimidos del cache (services/http_cache).
+
+Levanta la app una vez por modo, llena el cache con un request por path y
+después mide N hits por path:
+- CPU del server por request (utime+stime de /proc/<pid>/stat, sólo Linux)
+- bytes en el cable por response (antes de descomprimir)
+
+Modos:
+    per-hit      CACHE_PRECOMPRESS=0: se serializa el JSON en cada hit (como antes)
+    identity     precomprimido, cliente sin Accept-Encoding
+    gzip / br    precomprimido, el cliente acepta gzip / br (br sólo si está brotli)
+
+/artist no tiene un cuerpo precomprimido: se arma con las secciones cacheadas
+(http_cache.composed_or_fill) y en gzip / br se comprime en cada hit.
+
+Además, en proceso, compara contra lo que haría un middleware gzip genérico
+(serializar + comprimir en cada hit) con los mismos payloads.
+
+Uso (desde la raíz del repo):
+    python -m bench.compression
+    python -m bench.compression -n 500 --json compression.json
+"""
+import argparse
+import gzip
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+import httpx
+
+from bench.fakes import FakeCDN, FakeSupabase
+from bench.loadtest import start_server
+from services.http_cache import GZIP_LEVEL, brotli, encode_bodies, negotiate_encoding
+
+PATHS = {
+    "search": "/api/music/search?q=bench+compression",
+    "artist": "/api/music/artist/UCbenchcompression0001",
+    "album": "/api/music/album/MPREb_benchcomp01",
+}
+
+MODES = [
+    ("per-hit", {"CACHE_PRECOMPRESS": "0"}, "identity"),
+    ("identity", {}, "identity"),
+    ("gzip", {}, "gzip"),
+]
+if brotli is not None:
+    MODES.append(("br", {}, "br"))
+
+def _cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime y stime son los campos 14 y 15 (acá 11 y 12, después del ")")
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+def run_mode(args, mode: str, env: dict, encoding: str, cdn: FakeCDN, supa: FakeSupabase) -> list[dict]:
+    results = []
+    headers = {"Accept-Encoding": encoding}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        proc, base_url = start_server(args, cdn, supa, tmpdir, extra_env={"CACHE_SNAPSHOT": "0", **env})
+        try:
+            with httpx.Client(base_url=base_url, timeout=60) as client:
+                for name, path in PATHS.items():
+                    client.get(path, headers=headers).raise_for_status()  # miss: llena el cache
+                    wire, raw = 0, 0
+                    cpu0, t0 = _cpu_seconds(proc.pid), time.perf_counter()
+                    for _ in range(args.requests):
+                        r = client.get(path, headers=headers)
+                        r.raise_for_status()
+                        wire += r.num_bytes_downloaded
+                        raw += len(r.content)
+                    cpu, elapsed = _cpu_seconds(proc.pid) - cpu0, time.perf_counter() - t0
+                    results.append({
+                        "mode": mode,
+                        "path": name,
+                        "content_encoding": r.headers.get("Content-Encoding", "identity"),
+                        "wire_bytes": wire // args.requests,
+                        "json_bytes": raw // args.requests,
+                        "cpu_us_per_req": round(cpu / args.requests * 1e6, 1),
+                        "rps": round(args.requests / elapsed, 1),
+                        "_payload": r.json(),
+                    })
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+    return results
+
+def in_process(payloads: dict, rounds: int) -> list[dict]:
+    """CPU por hit en proceso: middleware gzip genérico vs variante precomprimida"""
+    out = []
+    for name, data in payloads.items():
+        t0 = time.process_time()
+        for _ in range(rounds):
+            body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            gzip.compress(body, compresslevel=GZIP_LEVEL)
+        middleware = time.process_time() - t0
+
+        bodies = encode_bodies(data)
+        t0 = time.process_time()
+        for _ in range(rounds):
+            bodies[negotiate_encoding("gzip, deflate, br", bodies)]
+        precompressed = time.process_time() - t0
+
+        out.append({
+            "path": name,
+            "gzip_middleware_us": round(middleware / rounds * 1e6, 1),
+            "precompressed_us": round(precompressed / rounds * 1e6, 2),
+            "sizes": {enc: len(b) for enc, b in bodies.items()},
+        })
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-n", "--requests", type=int, default=300, help="hits por path y modo")
+    ap.add_argument("--rounds", type=int, default=500, help="iteraciones de la comparación en proceso")
+    ap.add_argument("--extract-latency", type=float, default=0.05)
+    ap.add_argument("--innertube-latency", type=float, default=0.05)
+    ap.add_argument("--json", help="guardar resultados en este archivo")
+    args = ap.parse_args(argv)
+
+    cdn = FakeCDN().start()
+    supa = FakeSupabase().start()
+    results = []
+    try:
+        for mode, env, encoding in MODES:
+            results += run_mode(args, mode, env, encoding, cdn, supa)
+    finally:
+        cdn.stop()
+        supa.stop()
+
+    payloads = {r["path"]: r.pop("_payload") for r in results}
+    cols = ("mode", "path", "content_encoding", "wire_bytes", "json_bytes", "cpu_us_per_req", "rps")
+    print(" ".join(f"{c:>16}" for c in cols))
+    for r in results:
+        print(" ".join(f"{str(r[c]):>16}" for c in cols))
+
+    local = in_process(payloads, args.rounds)
+    print("\nen proceso (µs por hit):")
+    for r in local:
+        print(f"  {r['path']:>8}: middleware gzip {r['gzip_middleware_us']:>8} | precomprimido "
+              f"{r['precompressed_us']:>6} | tamaños {r['sizes']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results, "in_process": local}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+# bench/fakes.py
+"""
+Servidores falsos para el benchmark offline (stdlib, un thread por conexión):
+
+- FakeCDN: sirve audio "googlevideo" con soporte Range/HEAD y, opcionalmente,
+  un límite de bytes/s POR CONEXIÓN (como hace googlevideo).
+- FakeSupabase: lo mínimo de GoTrue (/auth/v1/user) y PostgREST
+  (/rest/v1/<tabla>) para que supa_auth y routes/playlists funcionen.
+"""
+import json
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # El proxy corta conexiones keep-alive a mitad de camino (stream
+        # cancelado, pool que se cierra): no es un error del benchmark
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+class _Server:
+    """Arranca un ThreadingHTTPServer en un puerto libre, en background"""
+
+    def __init__(self, handler_cls):
+        self.httpd = _QuietHTTPServer(("127.0.0.1", 0), handler_cls)
+        self.httpd.daemon_threads = True
+        self.httpd.owner = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status: int, payload, headers: dict | None = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+# --- CDN ---
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+class _CDNHandler(_QuietHandler):
+    def _serve(self):
+        cdn: FakeCDN = self.server.owner
+        size = cdn.size
+        start, end = 0, size - 1
+        status = 200
+        rng = self.headers.get("Range")
+        if rng:
+            m = _RANGE_RE.match(rng)
+            if m:
+                if m.group(1):
+                    start = int(m.group(1))
+                    end = int(m.group(2)) if m.group(2) else size - 1
+                else:  # bytes=-N (sufijo)
+                    start = max(0, size - int(m.group(2)))
+                end = min(end, size - 1)
+                if start > end:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                status = 206
+
+        length = end - start + 1
+        self.send_response(status)
+        self.send_header("Content-Type", "audio/mp4")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(length))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+
+        cdn.connections += 1
+        chunk = 64 * 1024
+        sent = 0
+        t0 = time.perf_counter()
+        try:
+            while sent < length:
+                n = min(chunk, length - sent)
+                pos = start + sent
+                self.wfile.write(cdn.read(pos, n))
+                sent += n
+                if cdn.throttle_bps:
+                    # Limita throughput por conexión: dormimos hasta "alcanzar" el rate
+                    ahead = sent / cdn.throttle_bps - (time.perf_counter() - t0)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    do_GET = _serve
+    do_HEAD = _serve
+
+class FakeCDN(_Server):
+    """
+    size: tamaño del "archivo" de audio.
+    throttle_bps: bytes/s por conexión (0 = sin límite).
+    """
+
+    def __init__(self, size: int = 4 * 1024 * 1024, throttle_bps: int = 0):
+        super().__init__(_CDNHandler)
+        self.size = size
+        self.throttle_bps = throttle_bps
+        self.connections = 0
+        self.block = bytes(range(256)) * 256  # 64 KiB de patrón
+
+    def read(self, pos: int, n: int) -> bytes:
+        """Contenido determinístico del "archivo" (para validar rangos armados por partes)"""
+        out = bytearray()
+        while len(out) < n:
+            off = (pos + len(out)) % len(self.block)
+            out += self.block[off:off + n - len(out)]
+        return bytes(out)
+
+    def audio_url(self, video_id: str, ttl: int = 6 * 3600) -> str:
+        expire = int(time.time()) + ttl
+        return f"{self.url}/videoplayback?id={video_id}&expire={expire}&mime=audio%2Fmp4"
+
+# --- Supabase (GoTrue + PostgREST) ---
+
+BENCH_USER_ID = "00000000-0000-4000-8000-000000000001"
+
+class _SupabaseHandler(_QuietHandler):
+    def _route(self):
+        fake: FakeSupabase = self.server.owner
+        parsed = urllib.parse.urlsplit(self.path)
+        params = urllib.parse.parse_qs(parsed.query)
+
+        if parsed.path == "/auth/v1/user":
+            return self._json(200, fake.user())
+
+        m = re.match(r"^/rest/v1/(\w+)$", parsed.path)
+        if not m:
+            return self._json(404, {"message": "not found"})
+        table = m.group(1)
+
+        # postgrest-py manda "{}" como body también en GET: hay que leerlo
+        # siempre o queda en el socket y rompe el próximo request keep-alive
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        body = json.loads(raw or b"null") if self.command in ("POST", "PATCH") else None
+
+        rows, total = fake.query(self.command, table, params, body)
+
+        headers = {}
+        if "count=exact" in (self.headers.get("Prefer") or ""):
+            headers["Content-Range"] = f"0-{max(0, len(rows) - 1)}/{total}"
+        if "vnd.pgrst.object" in (self.headers.get("Accept") or ""):
+            return self._json(200, rows[0] if rows else {}, headers)
+        status = 201 if self.command == "POST" else 200
+        return self._json(status, rows, headers)
+
+    do_GET = _route
+    do_HEAD = _route
+    do_POST = _route
+    do_PATCH = _route
+    do_DELETE = _route
+
+class FakeSupabase(_Server):
+    """
+    Datos en memoria: `playlists` playlists de `tracks_per_playlist` tracks para
+    BENCH_USER_ID. Las consultas se resuelven de forma aproximada (filtros eq,
+    limit/offset); alcanza para medir el costo del lado de la API.
+    """
+
+    def __init__(self, playlists: int = 20, tracks_per_playlist: int = 100):
+        super().__init__(_SupabaseHandler)
+        self.lock = threading.Lock()
+        self.tracks = {}
+        self.playlists = []
+        self.links = []
+        for p in range(playlists):
+            pid = f"pl-{p:04d}"
+            self.playlists.append({
+                "id": pid, "title": f"Playlist {p}", "description": None, "is_public": False,
+                "owner_id": BENCH_USER_ID, "created_at": f"2025-01-{(p % 28) + 1:02d}T00:00:00Z",
+            })
+            for t in range(tracks_per_playlist):
+                tid = f"tr-{p:04d}-{t:04d}"
+                self.tracks[tid] = {
+                    "id": tid, "track_id": f"vid{p:04d}{t:04d}", "title": f"Track {t}",
+                    "artist": "Artist", "artist_id": "UCbench", "album": "Album", "duration_ms": 200000,
+                    "thumbnail_url": f"https://lh3.googleusercontent.com/{tid}=w120-h120", "extra": None,
+                }
+                self.links.append({
+                    "playlist_id": pid, "track_id": tid, "position": t + 1,
+                    "added_at": "2025-01-01T00:00:00Z", "added_by": BENCH_USER_ID,
+                })
+
+    def user(self) -> dict:
+        return {
+            "id": BENCH_USER_ID, "aud": "authenticated", "role": "authenticated",
+            "email": "bench@example.com", "app_metadata": {}, "user_metadata": {},
+            "created_at": "2025-01-01T00:00:00Z",
+        }
+
+    @staticmethod
+    def _eq_filters(params: dict) -> dict:
+        return {k: v[0][3:] for k, v in params.items() if v and v[0].startswith("eq.")}
+
+    def query(self, method: str, table: str, params: dict, body):
+        with self.lock:
+            filters = self._eq_filters(params)
+            if method == "POST":
+                rows = body if isinstance(body, list) else [body]
+                out = []
+                for row in rows:
+                    row = dict(row)
+                    if table == "playlists":
+                        row.setdefault("id", f"pl-new-{len(self.playlists)}")
+                        row.setdefault("created_at", "2025-02-01T00:00:00Z")
+                        self.playlists.append(row)
+                    elif table == "tracks":
+                        row.setdefault("id", f"tr-{row.get('track_id')}")
+                        self.tracks[row["id"]] = row
+                    elif table == "playlist_tracks":
+                        self.links.append(row)
+                    out.append(row)
+                return out, len(out)
+            if method == "DELETE":
+                before = len(self.links)
+                self.links = [l for l in self.links if not all(str(l.get(k)) == v for k, v in filters.items())]
+                return [], before - len(self.links)
+
+            if table == "playlists":
+                rows = [p for p in self.playlists if all(str(p.get(k)) == v for k, v in filters.items())]
+                select = (params.get("select") or [""])[0]
+                if "playlist_tracks" in select:
+                    rows = [self._with_tracks(p, select) for p in rows]
+            elif table == "playlist_tracks":
+                rows = [
+                    {**l, "tracks": self.tracks.get(l["track_id"])}
+                    for l in self.links if all(str(l.get(k)) == v for k, v in filters.items())
+                ]
+            else:
+                rows = [t for t in self.tracks.values() if all(str(t.get(k)) == v for k, v in filters.items())]
+
+            total = len(rows)
+            offset = int((params.get("offset") or [0])[0])
+            limit = params.get("limit")
+            rows = rows[offset:offset + int(limit[0])] if limit else rows[offset:]
+            if method == "HEAD":
+                return [], total
+            return rows, total
+
+    def _with_tracks(self, playlist: dict, select: str) -> dict:
+        links = [l for l in self.links if l["playlist_id"] == playlist["id"]]
+        out = dict(playlist)
+        if "(count)" in select:
+            out["track_count"] = [{"count": len(links)}]
+            links = sorted(links, key=lambda l: l["position"])[:4]
+        out["playlist_tracks"] = [
+            {"position": l["position"], "tracks": {"thumbnail_url": self.tracks[l["track_id"]]["thumbnail_url"]}}
+            for l in links
+        ]
+        return out
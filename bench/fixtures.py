@@ -0,0 +1,316 @@
+# bench/fixtures.py
+"""
+Respuestas InnerTube para el benchmark offline.
+
+Si existe un fixture grabado (ver BENCH_FIXTURES_DIR) se usa ese; si no, se
+genera una respuesta sintética con la misma forma que las reales, suficiente
+para ejercitar los parsers de utils/ y las rutas.
+
+Layout de fixtures grabados (el mismo que services/upstream_store.py, así que
+se puede apuntar BENCH_FIXTURES_DIR a un store grabado con UPSTREAM_MODE=record):
+    <dir>/search/<query>.json(.gz)
+    <dir>/browse/<browseId>.json(.gz)
+    <dir>/next/<videoId>:RDAMVM<videoId>.json(.gz)
+"""
+import gzip
+import hashlib
+import json
+import os
+import urllib.parse
+
+FIXTURES_DIR = os.getenv("BENCH_FIXTURES_DIR", os.path.join(os.path.dirname(__file__), "fixtures"))
+
+def _load_recorded(kind: str, key: str) -> dict | None:
+    name = urllib.parse.quote(key, safe="")
+    for ext in (".json.gz", ".json"):
+        path = os.path.join(FIXTURES_DIR, kind, name + ext)
+        if os.path.exists(path):
+            opener = gzip.open if ext.endswith(".gz") else open
+            with opener(path, "rt", encoding="utf-8") as f:
+                return json.load(f)
+    return None
+
+def fake_id(seed: str, prefix: str = "", length: int = 11) -> str:
+    """ID determinístico con pinta de ID de YouTube"""
+    digest = hashlib.sha1(seed.encode()).hexdigest()
+    return (prefix + digest)[:length]
+
+def _thumbs(seed: str) -> dict:
+    base = f"https://lh3.googleusercontent.com/{fake_id(seed, length=40)}"
+    return {
+        "musicThumbnailRenderer": {
+            "thumbnail": {
+                "thumbnails": [
+                    {"url": f"{base}=w60-h60", "width": 60, "height": 60},
+                    {"url": f"{base}=w120-h120", "width": 120, "height": 120},
+                    {"url": f"{base}=w544-h544", "width": 544, "height": 544},
+                ]
+            }
+        }
+    }
+
+def _browse_run(text: str, browse_id: str) -> dict:
+    return {"text": text, "navigationEndpoint": {"browseEndpoint": {"browseId": browse_id}}}
+
+def _flex(runs: list) -> dict:
+    return {"musicResponsiveListItemFlexColumnRenderer": {"text": {"runs": runs}}}
+
+def _song_item(seed: str, artist_id: str, album_id: str, n: int) -> dict:
+    video_id = fake_id(f"{seed}:song:{n}")
+    return {
+        "musicResponsiveListItemRenderer": {
+            "thumbnail": _thumbs(video_id),
+            "overlay": {
+                "musicItemThumbnailOverlayRenderer": {
+                    "content": {
+                        "musicPlayButtonRenderer": {
+                            "playNavigationEndpoint": {"watchEndpoint": {"videoId": video_id}}
+                        }
+                    }
+                }
+            },
+            "playlistItemData": {"videoId": video_id},
+            "flexColumns": [
+                _flex([{"text": f"Song {n} ({seed})", "navigationEndpoint": {"watchEndpoint": {"videoId": video_id}}}]),
+                _flex([_browse_run(f"Artist {seed}", artist_id)]),
+                _flex([{"text": f"{(n + 1) * 1234567} plays"}]),
+                _flex([_browse_run(f"Album {seed}", album_id)]),
+            ],
+            "fixedColumns": [
+                {"musicResponsiveListItemFixedColumnRenderer": {"text": {"runs": [{"text": f"3:{n % 60:02d}"}]}}}
+            ],
+            "index": {"runs": [{"text": str(n + 1)}]},
+        }
+    }
+
+def _two_row_item(title: str, browse_id: str, subtitle_runs: list) -> dict:
+    return {
+        "musicTwoRowItemRenderer": {
+            "title": {"runs": [_browse_run(title, browse_id)]},
+            "subtitle": {"runs": subtitle_runs},
+            "thumbnailRenderer": _thumbs(browse_id),
+        }
+    }
+
+def _carousel(title: str, items: list, more_browse_id: str | None = None, more_params: str = "bench") -> dict:
+    header = {"title": {"runs": [{"text": title}]}}
+    if more_browse_id:
+        header["moreContentButton"] = {
+            "buttonRenderer": {
+                "navigationEndpoint": {"browseEndpoint": {"browseId": more_browse_id, "params": more_params}}
+            }
+        }
+    return {
+        "musicCarouselShelfRenderer": {
+            "header": {"musicCarouselShelfBasicHeaderRenderer": header},
+            "contents": items,
+        }
+    }
+
+def synthetic_search(query: str) -> dict:
+    artist_id = "UC" + fake_id(f"artist:{query}", length=22)
+    album_id = "MPREb_" + fake_id(f"album:{query}")
+    video_id = fake_id(f"top:{query}")
+    artist_card = {
+        "musicCardShelfRenderer": {
+            "title": {"runs": [_browse_run(query.title(), artist_id)]},
+            "subtitle": {"runs": [{"text": "Artist"}, {"text": " • "}, {"text": "12M monthly audience"}]},
+            "thumbnail": _thumbs(artist_id),
+        }
+    }
+    song_card = {
+        "musicCardShelfRenderer": {
+            "title": {"runs": [{"text": f"{query} (Audio)", "navigationEndpoint": {"watchEndpoint": {"videoId": video_id}}}]},
+            "subtitle": {"runs": [{"text": "Song"}, {"text": " • "}, _browse_run(query.title(), artist_id), {"text": " • "}, {"text": "3:21"}]},
+            "thumbnail": _thumbs(video_id),
+        }
+    }
+    songs_shelf = {
+        "musicShelfRenderer": {
+            "title": {"runs": [{"text": "Songs"}]},
+            "contents": [_song_item(query, artist_id, album_id, n) for n in range(20)],
+        }
+    }
+    return {
+        "contents": {
+            "tabbedSearchResultsRenderer": {
+                "tabs": [{"tabRenderer": {"content": {"sectionListRenderer": {"contents": [artist_card, song_card, songs_shelf]}}}}]
+            }
+        }
+    }
+
+def synthetic_artist(artist_id: str) -> dict:
+    albums = [
+        _two_row_item(f"Album {n}", "MPREb_" + fake_id(f"{artist_id}:album:{n}"), [{"text": str(2000 + n)}])
+        for n in range(10)
+    ]
+    singles = [
+        _two_row_item(f"Single {n}", "MPREb_" + fake_id(f"{artist_id}:single:{n}"), [{"text": "Single"}, {"text": " • "}, {"text": str(2010 + n)}])
+        for n in range(10)
+    ]
+    related = [
+        _two_row_item(f"Related {n}", "UC" + fake_id(f"{artist_id}:rel:{n}", length=22), [{"text": "3.2M monthly audience"}])
+        for n in range(15)
+    ]
+    filler = [_carousel(f"Section {n}", []) for n in range(4)]
+    album_id = "MPREb_" + fake_id(f"{artist_id}:album:0")
+    sections = [
+        {"musicShelfRenderer": {"title": {"runs": [{"text": "Top songs"}]},
+                                "contents": [_song_item(artist_id, artist_id, album_id, n) for n in range(5)]}},
+        _carousel("Albums", albums, "MPAD" + artist_id, "albums"),
+        _carousel("Singles & EPs", singles, "MPAD" + artist_id, "singles"),
+        *filler,
+        _carousel("Fans might also like", related),
+    ]
+    return {
+        "header": {
+            "musicImmersiveHeaderRenderer": {
+                "title": {"runs": [{"text": f"Artist {artist_id[:6]}"}]},
+                "description": {"runs": [{"text": "Lorem ipsum dolor sit amet. " * 20}]},
+                "thumbnail": _thumbs(artist_id),
+                "monthlyListenerCount": {"runs": [{"text": "12.3M monthly audience"}]},
+            }
+        },
+        "contents": {
+            "singleColumnBrowseResultsRenderer": {
+                "tabs": [{"tabRenderer": {"content": {"sectionListRenderer": {"contents": sections}}}}]
+            }
+        },
+    }
+
+def synthetic_album(album_id: str) -> dict:
+    artist_id = "UC" + fake_id(f"{album_id}:artist", length=22)
+    return {
+        "microformat": {
+            "microformatDataRenderer": {
+                "title": f"Album {album_id[-6:]}",
+                "description": "Album description",
+                "urlCanonical": f"https://music.youtube.com/browse/{album_id}",
+                "thumbnail": _thumbs(album_id)["musicThumbnailRenderer"]["thumbnail"],
+                "siteName": "YouTube Music",
+            }
+        },
+        "contents": {
+            "twoColumnBrowseResultsRenderer": {
+                "secondaryContents": {
+                    "sectionListRenderer": {
+                        "contents": [{"musicShelfRenderer": {
+                            "contents": [_song_item(album_id, artist_id, album_id, n) for n in range(14)]
+                        }}]
+                    }
+                }
+            }
+        },
+    }
+
+def synthetic_next(video_id: str) -> dict:
+    """Radio de un video: playlistPanelRenderer con el video y 20 que siguen"""
+    ids = [video_id] + [fake_id(f"{video_id}:radio:{n}") for n in range(20)]
+    return {
+        "contents": {"singleColumnMusicWatchNextResultsRenderer": {"tabbedRenderer": {
+            "watchNextTabbedResultsRenderer": {"tabs": [{"tabRenderer": {"content": {"musicQueueRenderer": {
+                "content": {"playlistPanelRenderer": {"contents": [
+                    {"playlistPanelVideoRenderer": {
+                        "videoId": vid,
+                        "title": {"runs": [{"text": f"Radio {vid}"}]},
+                        "lengthText": {"runs": [{"text": "3:21"}]},
+                    }}
+                    for vid in ids
+                ]}}
+            }}}}]}
+        }}}
+    }
+
+DISCOGRAPHY_PAGES = 3
+DISCOGRAPHY_PAGE_SIZE = 12
+
+def synthetic_discography(browse_id: str, kind: str, page: int = 0) -> dict:
+    """Grid de la página "Más" (álbumes o singles) con continuaciones"""
+    artist_id = browse_id[len("MPAD"):]
+    label = "Album" if kind == "albums" else "Single"
+    items = [
+        _two_row_item(f"{label} {n}", "MPREb_" + fake_id(f"{artist_id}:{kind}:{n}"),
+                      [{"text": label}, {"text": " • "}, {"text": str(1990 + n % 35)}])
+        for n in range(page * DISCOGRAPHY_PAGE_SIZE, (page + 1) * DISCOGRAPHY_PAGE_SIZE)
+    ]
+    grid = {"items": items}
+    if page + 1 < DISCOGRAPHY_PAGES:
+        grid["continuations"] = [{"nextContinuationData": {"continuation": f"cont:{browse_id}:{kind}:{page + 1}"}}]
+    if page:
+        return {"continuationContents": {"gridContinuation": grid}}
+    return {
+        "contents": {
+            "singleColumnBrowseResultsRenderer": {
+                "tabs": [{"tabRenderer": {"content": {"sectionListRenderer": {"contents": [{"gridRenderer": grid}]}}}}]
+            }
+        }
+    }
+
+SEARCH_PAGES = 3
+SEARCH_PAGE_SIZE = 20
+# params de las búsquedas filtradas (los mismos que routes/music.SEARCH_FILTERS)
+_SEARCH_KINDS = {
+    "EgWKAQIIAWoMEA4QChADEAQQCRAF": "songs",
+    "EgWKAQIYAWoMEA4QChADEAQQCRAF": "albums",
+    "EgWKAQIgAWoMEA4QChADEAQQCRAF": "artists",
+}
+
+def _filtered_item(query: str, kind: str, n: int) -> dict:
+    artist_id = "UC" + fake_id(f"artist:{query}:{n % 5}", length=22)
+    album_id = "MPREb_" + fake_id(f"album:{query}:{n}")
+    if kind == "songs":
+        return _song_item(query, artist_id, album_id, n)
+    browse_id = artist_id if kind == "artists" else album_id
+    subtitle = (
+        [{"text": "Artist"}, {"text": " • "}, {"text": f"{n + 1}M monthly audience"}] if kind == "artists"
+        else [{"text": "Album"}, {"text": " • "}, _browse_run(f"Artist {n % 5}", artist_id), {"text": " • "}, {"text": str(2000 + n % 25)}]
+    )
+    title = f"Artist {n % 5} ({query})" if kind == "artists" else f"Album {n} ({query})"
+    return {
+        "musicResponsiveListItemRenderer": {
+            "thumbnail": _thumbs(browse_id),
+            "navigationEndpoint": {"browseEndpoint": {"browseId": browse_id}},
+            "flexColumns": [_flex([{"text": title}]), _flex(subtitle)],
+        }
+    }
+
+def synthetic_filtered_search(query: str, kind: str, page: int = 0) -> dict:
+    """Búsqueda filtrada (musicShelfRenderer) con continuaciones"""
+    # Los artistas se repiten entre páginas, como en la búsqueda real
+    count = 5 if kind == "artists" else SEARCH_PAGE_SIZE
+    shelf = {"contents": [_filtered_item(query, kind, page * count + n) for n in range(count)]}
+    if page + 1 < SEARCH_PAGES:
+        shelf["continuations"] = [{"nextContinuationData": {"continuation": f"scont:{kind}:{page + 1}:{query}"}}]
+    if page:
+        return {"continuationContents": {"musicShelfContinuation": shelf}}
+    return {
+        "contents": {
+            "tabbedSearchResultsRenderer": {
+                "tabs": [{"tabRenderer": {"content": {"sectionListRenderer": {"contents": [{"musicShelfRenderer": shelf}]}}}}]
+            }
+        }
+    }
+
+def search_response(query: str | None, params: str | None = None, continuation: str | None = None) -> dict:
+    if continuation:
+        _, kind, page, query = continuation.split(":", 3)
+        return synthetic_filtered_search(query, kind, int(page))
+    if params in _SEARCH_KINDS:
+        return synthetic_filtered_search(query or "", _SEARCH_KINDS[params])
+    return _load_recorded("search", query or "") or synthetic_search(query or "")
+
+def browse_response(browse_id: str, params: str | None = None) -> dict:
+    recorded = _load_recorded("browse", browse_id)
+    if recorded:
+        return recorded
+    if browse_id.startswith("cont:"):
+        _, more_id, kind, page = browse_id.split(":")
+        return synthetic_discography(more_id, kind, int(page))
+    if browse_id.startswith("MPAD"):
+        return synthetic_discography(browse_id, params or "albums")
+    if browse_id.startswith("MPREb_"):
+        return synthetic_album(browse_id)
+    return synthetic_artist(browse_id)
+
+def next_response(video_id: str) -> dict:
+    return _load_recorded("next", f"{video_id}:RDAMVM{video_id}") or synthetic_next(video_id)
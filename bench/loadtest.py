@@ -0,0 +1,234 @@
+# bench/loadtest.py
+"""
+Benchmark / load test offline: sin YouTube ni Supabase reales.
+
+Levanta FakeCDN + FakeSupabase en este proceso, la app (bench/server.py) como
+subproceso, y dispara cada escenario con N requests a concurrencia C.
+Reporta throughput, p50/p95/p99 y RSS del server.
+
+Uso (desde la raíz del repo):
+    python -m bench.loadtest
+    python -m bench.loadtest -c 32 -n 1000 --scenarios search,play --extract-latency 0.5
+    python -m bench.loadtest --json bench_output.json
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench.fakes import FakeCDN, FakeSupabase, BENCH_USER_ID
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ("search", "artist", "album", "play", "prefetch", "playlists", "playlist")
+
+def _fake_jwt(claims: dict) -> str:
+    enc = lambda d: base64.urlsafe_b64encode(json.dumps(d).encode()).decode().rstrip("=")
+    return f"{enc({'alg': 'HS256', 'typ': 'JWT'})}.{enc(claims)}.bench"
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _rss_kb(pid: int) -> dict:
+    """VmRSS / VmHWM (pico) del proceso, en KiB (sólo Linux)"""
+    out = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, val = line.split(":", 1)
+                    out[key] = int(val.split()[0])
+    except OSError:
+        pass
+    return out
+
+def _percentile(sorted_vals: list[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, int(round(p / 100 * (len(sorted_vals) - 1))))
+    return sorted_vals[idx]
+
+def _build_request(scenario: str, i: int, unique: int) -> tuple[str, str, dict, object]:
+    """(method, path, headers, json_body) para el request i del escenario"""
+    k = i % unique
+    if scenario == "search":
+        return "GET", f"/api/music/search?q=bench+query+{k}", {}, None
+    if scenario == "artist":
+        return "GET", f"/api/music/artist/UCbenchartist{k:06d}", {}, None
+    if scenario == "album":
+        return "GET", f"/api/music/album/MPREb_bench{k:05d}", {}, None
+    if scenario == "play":
+        return "GET", f"/api/music/play?id=benchvid{k:03d}", {"Range": "bytes=0-262143"}, None
+    if scenario == "prefetch":
+        ids = [f"benchvid{(k + j) % unique:03d}" for j in range(5)]
+        return "POST", "/api/music/prefetch", {}, {"ids": ids}
+    if scenario == "playlists":
+        return "GET", "/api/playlists/", {}, None
+    if scenario == "playlist":
+        return "GET", f"/api/playlists/pl-{k % 20:04d}", {}, None
+    raise ValueError(scenario)
+
+async def _run_scenario(base_url: str, scenario: str, total: int, concurrency: int, unique: int, token: str) -> dict:
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    bytes_in = 0
+    counter = iter(range(total))
+    auth = {"Authorization": f"Bearer {token}"} if scenario.startswith("playlist") else {}
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal bytes_in
+            for i in counter:
+                method, path, headers, body = _build_request(scenario, i, unique)
+                t0 = time.perf_counter()
+                try:
+                    resp = await client.request(method, path, headers={**headers, **auth}, json=body)
+                    bytes_in += len(resp.content)
+                    statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+                except httpx.HTTPError:
+                    statuses[0] = statuses.get(0, 0) + 1
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    ok = sum(n for s, n in statuses.items() if 200 <= s < 400)
+    return {
+        "scenario": scenario,
+        "requests": total,
+        "concurrency": concurrency,
+        "ok": ok,
+        "errors": total - ok,
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 1) if elapsed else 0,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "bytes_in": bytes_in,
+    }
+
+def _wait_ready(base_url: str, proc: subprocess.Popen, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"el server terminó con código {proc.returncode}")
+        try:
+            if httpx.get(f"{base_url}/api/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("el server no respondió a tiempo")
+
+def start_server(args, cdn: FakeCDN, supa: FakeSupabase, tmpdir: str, extra_env: dict | None = None):
+    """Lanza bench/server.py como subproceso; devuelve (proc, base_url)"""
+    port = _free_port()
+    anon_key = _fake_jwt({"role": "anon"})
+    env = {
+        **os.environ,
+        "NODE_ENV": "production",
+        "SUPABASE_URL": supa.url,
+        "SUPABASE_ANON_KEY": anon_key,
+        "SUPABASE_SERVICE_ROLE_KEY": _fake_jwt({"role": "service_role"}),
+        "CACHE_VERSIONS_PATH": os.path.join(tmpdir, "versions.sqlite3"),
+        "ACCESS_LOG": os.getenv("ACCESS_LOG", "0"),
+        "WARMUP": os.getenv("WARMUP", "0"),
+        "POT_PROVIDER": "none",  # FakeYDL no necesita PO tokens
+        # Todo el load test sale de la misma IP: con admisión por cliente
+        # mediríamos 429s en vez de capacidad (se puede pisar con extra_env)
+        "ADMISSION": os.getenv("ADMISSION", "0"),
+        # Idem los token buckets de services/upstream_governor: el upstream es
+        # falso, así que medimos la API y no el rate limit
+        "GOV_EXTRACT_RATE": os.getenv("GOV_EXTRACT_RATE", "1000"),
+        "GOV_EXTRACT_BURST": os.getenv("GOV_EXTRACT_BURST", "1000"),
+        "GOV_INNERTUBE_RATE": os.getenv("GOV_INNERTUBE_RATE", "1000"),
+        "GOV_INNERTUBE_BURST": os.getenv("GOV_INNERTUBE_BURST", "1000"),
+        "CACHE_SNAPSHOT_PATH": os.path.join(tmpdir, "cache_snapshot.json.gz"),
+        **(extra_env or {}),
+    }
+    cmd = [
+        sys.executable, "-m", "bench.server",
+        "--port", str(port),
+        "--cdn-url", cdn.url,
+        "--extract-latency", str(args.extract_latency),
+        "--innertube-latency", str(args.innertube_latency),
+    ]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(base_url, proc)
+    except Exception:
+        proc.kill()
+        raise
+    return proc, base_url
+
+def _print_table(results: list[dict]):
+    cols = ("scenario", "requests", "concurrency", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "rss_mb")
+    print(" ".join(f"{c:>11}" for c in cols))
+    for r in results:
+        print(" ".join(f"{str(r.get(c, '')):>11}" for c in cols))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-c", "--concurrency", type=int, default=16)
+    ap.add_argument("-n", "--requests", type=int, default=400, help="requests por escenario")
+    ap.add_argument("--unique", type=int, default=50, help="ids/queries distintos por escenario (define el hit ratio)")
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--extract-latency", type=float, default=0.3, help="segundos por extracción yt-dlp falsa")
+    ap.add_argument("--innertube-latency", type=float, default=0.15, help="segundos por llamada InnerTube falsa")
+    ap.add_argument("--audio-size", type=int, default=4 * 1024 * 1024)
+    ap.add_argument("--cdn-throttle", type=int, default=0, help="bytes/s por conexión del CDN falso (0 = sin límite)")
+    ap.add_argument("--json", help="guardar resultados en este archivo")
+    args = ap.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    for s in scenarios:
+        if s not in SCENARIOS:
+            ap.error(f"escenario desconocido: {s}")
+
+    cdn = FakeCDN(size=args.audio_size, throttle_bps=args.cdn_throttle).start()
+    supa = FakeSupabase().start()
+    token = _fake_jwt({"sub": BENCH_USER_ID, "role": "authenticated"})
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        proc, base_url = start_server(args, cdn, supa, tmpdir)
+        try:
+            startup_rss = _rss_kb(proc.pid)
+            for scenario in scenarios:
+                res = asyncio.run(_run_scenario(base_url, scenario, args.requests, args.concurrency, args.unique, token))
+                rss = _rss_kb(proc.pid)
+                res["rss_mb"] = round(rss.get("VmRSS", 0) / 1024, 1)
+                res["peak_rss_mb"] = round(rss.get("VmHWM", 0) / 1024, 1)
+                results.append(res)
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            cdn.stop()
+            supa.stop()
+
+    print(f"RSS al arrancar: {round(startup_rss.get('VmRSS', 0) / 1024, 1)} MB")
+    _print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
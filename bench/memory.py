@@ -0,0 +1,188 @@
+# bench/memory.py
+"""
+Benchmark de memoria del cache de metadata (services/cache_service).
+
+Arma payloads reales con utils/artist_parser.py y utils/album_parser.py sobre
+las respuestas grabadas de bench/fixtures (BENCH_FIXTURES_DIR/browse; si no
+hay, las sintéticas), los guarda en cache_service como lo hace la app y mide
+con tracemalloc cuánto queda retenido por artista / álbum:
+
+    artist          las 5 secciones parseadas de /artist, una entrada cada una
+                    (artist:<id>:s:<name>, con cuerpos vía cache_fill: es lo
+                    único que se cachea de un artista)
+    artist:section  una sección parseada (topSongs, con cuerpos)
+    album           payload de /album (con cuerpos, vía cache_fill)
+
+Modos:
+    objects         sólo el objeto Python, sin cuerpos (antes de user-045)
+    objects+bodies  objeto + cuerpos identity/gzip[/br] (CACHE_COMPACT=0)
+    compact         representación compacta (default)
+
+Reporta bytes por entrada, entradas por GB y cuánto cuesta materializar el
+objeto en modo compacto (get_cached).
+
+En modo compacto una entrada con gzip no guarda el JSON plano: cada hit de un
+cliente sin gzip (y cada respuesta compuesta de /artist, que pega los JSON de
+las secciones) lo descomprime. identity_us mide ese costo por entrada.
+
+Uso (desde la raíz del repo):
+    python -m bench.memory
+    python -m bench.memory -n 500 --json memory.json
+"""
+import argparse
+import gc
+import json
+import os
+import time
+import tracemalloc
+
+from bench.fixtures import FIXTURES_DIR, browse_response, fake_id
+from services import cache_service
+from services.http_cache import encode_bodies, make_etag
+from utils.album_parser import parse_album_info, parse_album_tracks
+from utils.artist_parser import (
+    index_artist_sections, parse_albums, parse_related_artists, parse_singles_eps, parse_top_songs,
+)
+from routes.music import _parse_artist_header
+
+GB = 1024 ** 3
+
+MODES = [
+    ("objects", False, False),
+    ("objects+bodies", False, True),
+    ("compact", True, True),
+]
+
+def _recorded_ids(prefix: str) -> list[str]:
+    """IDs con respuesta grabada en FIXTURES_DIR/browse (artistas UC..., álbumes MPREb_...)"""
+    try:
+        names = os.listdir(os.path.join(FIXTURES_DIR, "browse"))
+    except FileNotFoundError:
+        return []
+    ids = [n.split(".json")[0] for n in names]
+    return sorted(i for i in ids if i.startswith(prefix))
+
+def _ids(prefix: str, n: int) -> list[str]:
+    recorded = _recorded_ids(prefix)
+    if recorded:
+        return [recorded[i % len(recorded)] for i in range(n)]
+    length = 22 if prefix == "UC" else 11
+    return [fake_id(f"bench-memory-{i}", prefix, length) for i in range(n)]
+
+def _response(browse_id: str) -> dict:
+    # Copia fresca: las grabadas vuelven del mismo archivo y no queremos
+    # compartir strings entre entradas
+    return json.loads(json.dumps(browse_response(browse_id)))
+
+def _artist_raw(response: dict) -> dict:
+    """Igual que routes/music._artist_raw_sections, sin upstream"""
+    tabs = response.get("contents", {}).get("singleColumnBrowseResultsRenderer", {}).get("tabs", [])
+    contents = (
+        tabs[0].get("tabRenderer", {}).get("content", {}).get("sectionListRenderer", {}).get("contents", [])
+    ) if tabs else []
+    return {"header": response.get("header", {}), **index_artist_sections(contents)}
+
+_ARTIST_SECTIONS = {
+    "header": _parse_artist_header,
+    "topSongs": parse_top_songs,
+    "albums": parse_albums,
+    "singles_eps": parse_singles_eps,
+    "related": parse_related_artists,
+}
+
+def _artist_sections(key: str, raw: dict) -> dict:
+    """Igual que routes/music._artist_sections: {clave de sección: sección parseada}"""
+    return {f"{key}:s:{name}": parser(raw[name]) if name in raw else []
+            for name, parser in _ARTIST_SECTIONS.items()}
+
+def _album_payload(album_id: str, response: dict) -> dict:
+    return {"id": album_id, "info": parse_album_info(response), "tracks": parse_album_tracks(response)}
+
+def _builders(n: int) -> dict:
+    """kind -> [build() -> {key: payload}]; build() parsea recién al llamarse"""
+    artists, albums = _ids("UC", n), _ids("MPREb_", n)
+    return {
+        "artist": [lambda a=a, i=i: _artist_sections(f"artist:{a}:{i}", _artist_raw(_response(a)))
+                   for i, a in enumerate(artists)],
+        "artist:section": [lambda a=a, i=i: {f"artist:{a}:{i}:s:topSongs":
+                                             parse_top_songs(_artist_raw(_response(a)).get("topSongs", {}))}
+                           for i, a in enumerate(artists)],
+        "album": [lambda b=b, i=i: {f"album:{b}:{i}": _album_payload(b, _response(b))}
+                  for i, b in enumerate(albums)],
+    }
+
+def measure(kind: str, builders: list, compact: bool, with_bodies: bool) -> dict:
+    cache_service.clear_cache()
+    cache_service.COMPACT = compact
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    json_bytes = 0
+    keys = []
+    for build in builders:
+        for key, data in build().items():
+            bodies = encode_bodies(data) if with_bodies else None
+            json_bytes += len(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            cache_service.set_cached(key, data, etag=make_etag(data), bodies=bodies)
+            keys.append(key)
+            del data, bodies
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    t0 = time.perf_counter()
+    for key in keys:
+        cache_service.get_cached(key)
+    materialize = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for key in keys:
+        entry = cache_service.get_entry(key)
+        if entry.bodies is not None:
+            entry.bodies["identity"]
+    identity = time.perf_counter() - t0
+
+    n = len(builders)
+    per_entry = retained / n
+    return {
+        "kind": kind,
+        "bytes_per_entry": round(per_entry),
+        "entries_per_gb": int(GB / per_entry) if per_entry > 0 else None,
+        "json_bytes": json_bytes // n,
+        "materialize_us": round(materialize / n * 1e6, 1),
+        "identity_us": round(identity / n * 1e6, 1),
+    }
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-n", "--entries", type=int, default=200, help="entradas por tipo")
+    ap.add_argument("--json", help="guardar resultados en este archivo")
+    args = ap.parse_args(argv)
+
+    source = "grabadas" if _recorded_ids("UC") or _recorded_ids("MPREb_") else "sintéticas"
+    print(f"respuestas {source}, {args.entries} entradas por tipo")
+    results = []
+    for kind, builders in _builders(args.entries).items():
+        for mode, compact, with_bodies in MODES:
+            results.append({"mode": mode, **measure(kind, builders, compact, with_bodies)})
+    cache_service.clear_cache()
+
+    cols = ("kind", "mode", "bytes_per_entry", "entries_per_gb", "json_bytes", "materialize_us", "identity_us")
+    print(" ".join(f"{c:>16}" for c in cols))
+    for r in results:
+        print(" ".join(f"{str(r[c]):>16}" for c in cols))
+
+    by_kind = {}
+    for r in results:
+        by_kind.setdefault(r["kind"], {})[r["mode"]] = r["entries_per_gb"]
+    print("\nentradas por GB (objects+bodies -> compact):")
+    for kind, modes in by_kind.items():
+        before, after = modes["objects+bodies"], modes["compact"]
+        print(f"  {kind:>16}: {before:>10} -> {after:>10} (x{after / before:.1f})")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "source": source, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
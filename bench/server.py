@@ -0,0 +1,80 @@
+# bench/server.py
+"""
+Levanta la app real con los upstreams reemplazados por fakes. Lo lanza
+bench/loadtest.py como subproceso (así el RSS medido es sólo del server).
+
+Se reemplaza lo mínimo para no saltear la instrumentación propia:
+- innertube_service._client -> FakeInnerTube (fixtures grabados/sintéticos)
+- music._ydl_for           -> FakeYDL (latencia configurable, URL al FakeCDN)
+"""
+import argparse
+import time
+
+from bench import fixtures
+
+class FakeInnerTube:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def search(self, query=None, params=None, continuation=None):
+        time.sleep(self.latency)
+        return fixtures.search_response(query, params, continuation)
+
+    def browse(self, browse_id=None, params=None, continuation=None):
+        time.sleep(self.latency)
+        return fixtures.browse_response(browse_id or continuation or "", params)
+
+    def next(self, video_id=None, playlist_id=None, params=None, index=None, continuation=None):
+        time.sleep(self.latency)
+        return fixtures.next_response(video_id or "")
+
+class FakeYDL:
+    def __init__(self, cdn_url: str, latency: float, client: str):
+        self.cdn_url = cdn_url
+        self.latency = latency
+        self.client = client
+
+    def get_info_extractor(self, ie_key: str):
+        return None
+
+    def extract_info(self, url: str, download: bool = False):
+        time.sleep(self.latency)
+        video_id = url.rsplit("v=", 1)[-1]
+        expire = int(time.time()) + 6 * 3600
+        formats = [
+            {
+                "format_id": itag, "ext": ext, "acodec": acodec, "vcodec": "none", "abr": abr,
+                "url": f"{self.cdn_url}/videoplayback?id={video_id}&itag={itag}&expire={expire}",
+            }
+            for itag, ext, acodec, abr in (
+                ("249", "webm", "opus", 50), ("250", "webm", "opus", 70),
+                ("140", "m4a", "mp4a.40.2", 129), ("251", "webm", "opus", 160),
+            )
+        ]
+        best = formats[2]
+        return {"id": video_id, "title": f"Bench {video_id}", "url": best["url"], "ext": best["ext"],
+                "abr": best["abr"], "format_id": best["format_id"], "formats": formats}
+
+def patch_upstreams(cdn_url: str, extract_latency: float, innertube_latency: float):
+    from services import innertube_service
+    from routes import music
+
+    innertube_service._client = lambda: FakeInnerTube(innertube_latency)
+    music._ydl_for = lambda client: FakeYDL(cdn_url, extract_latency, client)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, required=True)
+    ap.add_argument("--cdn-url", required=True)
+    ap.add_argument("--extract-latency", type=float, default=0.3)
+    ap.add_argument("--innertube-latency", type=float, default=0.15)
+    args = ap.parse_args()
+
+    patch_upstreams(args.cdn_url, args.extract_latency, args.innertube_latency)
+
+    import uvicorn
+    from app import app
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# bench/startup.py
+"""
+Benchmark de arranque en frío.
+
+Mide, en subprocesos nuevos:
+- cuánto tarda `import app` (mediana de N corridas) y qué módulos pesados
+  quedaron cargados (yt_dlp, innertube, supabase, requests deberían NO estar)
+- los imports más caros según `python -X importtime`
+- el tiempo hasta el primer 200 de GET /api/ con uvicorn
+
+Uso (desde la raíz del repo):
+    python -m bench.startup
+    python -m bench.startup --runs 10 --top 20
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("yt_dlp", "innertube", "supabase", "requests", "httpx")
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+dt = time.perf_counter() - t0
+print(json.dumps({"import_s": dt, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY,)
+
+def _env() -> dict:
+    # Sin red: credenciales falsas alcanzan porque los clientes son lazy
+    return {
+        **os.environ,
+        "SUPABASE_URL": os.getenv("SUPABASE_URL", "http://127.0.0.1:9"),
+        "SUPABASE_ANON_KEY": os.getenv("SUPABASE_ANON_KEY", "e30.e30.bench"),
+        "SUPABASE_SERVICE_ROLE_KEY": os.getenv("SUPABASE_SERVICE_ROLE_KEY", "e30.e30.bench"),
+        "ACCESS_LOG": "0",
+        "WARMUP": os.getenv("WARMUP", "0"),
+    }
+
+def measure_import(runs: int) -> dict:
+    times, loaded = [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _PROBE], cwd=ROOT, env=_env(),
+                             capture_output=True, text=True, check=True)
+        data = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(data["import_s"])
+        loaded = data["loaded"]
+    return {"median_ms": round(statistics.median(times) * 1000, 1),
+            "min_ms": round(min(times) * 1000, 1), "heavy_loaded": loaded}
+
+def top_imports(top: int) -> list[tuple[str, float]]:
+    """Paquetes de primer nivel con mayor tiempo acumulado de import"""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=ROOT,
+                         env=_env(), capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum_us, name = (p.strip() for p in line.split(":", 1)[1].split("|"))
+        if "." not in name:
+            rows.append((name, int(cum_us) / 1000))
+    return sorted(rows, key=lambda r: -r[1])[:top]
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def time_to_first_response(timeout: float = 60) -> float:
+    port = _free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=_env(),
+    )
+    try:
+        while time.perf_counter() - t0 < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn terminó con código {proc.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/", timeout=1) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - t0
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError("sin respuesta de /api/")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=15)
+    args = ap.parse_args(argv)
+
+    imp = measure_import(args.runs)
+    print(f"import app: mediana {imp['median_ms']} ms (mín {imp['min_ms']} ms)")
+    print(f"módulos pesados cargados al importar: {imp['heavy_loaded'] or 'ninguno'}")
+
+    print("\nimports más caros (acumulado, ms):")
+    for name, ms in top_imports(args.top):
+        print(f"  {ms:9.1f}  {name}")
+
+    ttfr = time_to_first_response()
+    print(f"\nprimer 200 de GET /api/: {ttfr * 1000:.0f} ms desde el spawn de uvicorn")
+
+if __name__ == "__main__":
+    main()
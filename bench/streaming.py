@@ -0,0 +1,113 @@
+# bench/streaming.py
+"""
+Benchmark del proxy de audio contra un CDN falso con throughput limitado por
+conexión (como googlevideo). Para cada cantidad de conexiones levanta la app
+con STREAM_CONNECTIONS_BY_ABR="0:N", baja el audio completo por /play y un
+rango del medio, verifica byte a byte contra el CDN y reporta MB/s.
+
+Con throttle por conexión el throughput debería escalar ~lineal con N hasta
+que el read-ahead (STREAM_READ_AHEAD segmentos en vuelo) o la red del cliente
+se vuelvan el límite. Ojo con archivos chicos: con el default de 4 MiB hay 8
+segmentos de 512 KiB y el primero va directo, así que con 8 conexiones no
+pasa de ~4x; para ver el tope del read-ahead usar --audio-size 16777216.
+
+Uso (desde la raíz del repo):
+    python -m bench.streaming
+    python -m bench.streaming --connections 1,2,4,8 --cdn-throttle 262144 --audio-size 8388608
+"""
+import argparse
+import json
+import subprocess
+import tempfile
+import time
+
+import httpx
+
+from bench.fakes import FakeCDN, FakeSupabase
+from bench.loadtest import start_server
+
+def _fetch(base_url: str, video_id: str, range_header: str | None) -> tuple[bytes, float, float]:
+    """(body, segundos totales, TTFB)"""
+    headers = {"Range": range_header} if range_header else {}
+    t0 = time.perf_counter()
+    ttfb = None
+    body = bytearray()
+    with httpx.stream("GET", f"{base_url}/api/music/play", params={"id": video_id},
+                      headers=headers, timeout=120) as r:
+        if r.status_code not in (200, 206):
+            raise RuntimeError(f"/play devolvió {r.status_code}")
+        for chunk in r.iter_bytes():
+            if ttfb is None:
+                ttfb = time.perf_counter() - t0
+            body += chunk
+    return bytes(body), time.perf_counter() - t0, ttfb or 0.0
+
+def run(args, connections: int, cdn: FakeCDN, supa: FakeSupabase) -> dict:
+    env = {
+        "STREAM_CONNECTIONS_BY_ABR": f"0:{connections}",
+        "STREAM_SEGMENT_BYTES": str(args.segment_bytes),
+        "STREAM_READ_AHEAD": str(args.read_ahead),
+    }
+    with tempfile.TemporaryDirectory() as tmpdir:
+        proc, base_url = start_server(args, cdn, supa, tmpdir, extra_env=env)
+        try:
+            # La primera llamada paga la extracción falsa: la dejamos afuera
+            _fetch(base_url, "streambench", "bytes=0-1")
+
+            full, full_s, ttfb = _fetch(base_url, "streambench", None)
+            if full != cdn.read(0, cdn.size):
+                raise RuntimeError(f"{connections} conexiones: el cuerpo completo no coincide con el CDN")
+
+            start, end = cdn.size // 3, cdn.size // 3 + cdn.size // 2
+            part, part_s, _ = _fetch(base_url, "streambench", f"bytes={start}-{end}")
+            if part != cdn.read(start, end - start + 1):
+                raise RuntimeError(f"{connections} conexiones: el rango no coincide con el CDN")
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    mb = 1024 * 1024
+    return {
+        "connections": connections,
+        "full_mb_s": round(len(full) / full_s / mb, 2),
+        "range_mb_s": round(len(part) / part_s / mb, 2),
+        "ttfb_ms": round(ttfb * 1000, 1),
+    }
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--connections", default="1,2,4,8")
+    ap.add_argument("--cdn-throttle", type=int, default=256 * 1024, help="bytes/s por conexión del CDN falso")
+    ap.add_argument("--audio-size", type=int, default=4 * 1024 * 1024)
+    ap.add_argument("--segment-bytes", type=int, default=512 * 1024)
+    ap.add_argument("--read-ahead", type=int, default=6)
+    ap.add_argument("--extract-latency", type=float, default=0.05)
+    ap.add_argument("--innertube-latency", type=float, default=0.05)
+    ap.add_argument("--json", help="guardar resultados en este archivo")
+    args = ap.parse_args(argv)
+
+    cdn = FakeCDN(size=args.audio_size, throttle_bps=args.cdn_throttle).start()
+    supa = FakeSupabase().start()
+    results = []
+    try:
+        for n in (int(c) for c in args.connections.split(",") if c.strip()):
+            res = run(args, n, cdn, supa)
+            results.append(res)
+            print(f"{res['connections']:>3} conexiones: completo {res['full_mb_s']:>6} MB/s, "
+                  f"rango {res['range_mb_s']:>6} MB/s, TTFB {res['ttfb_ms']} ms")
+    finally:
+        cdn.stop()
+        supa.stop()
+
+    base = results[0]["full_mb_s"] if results else 0
+    if base:
+        print("escala vs 1ra fila: " + ", ".join(f"{r['connections']}x -> {r['full_mb_s'] / base:.2f}" for r in results))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 # main.py
+# Desarrollo (un proceso, autoreload). En producción: python serve.py
 import uvicorn
 from app import app
 
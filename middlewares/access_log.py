@@ -0,0 +1,59 @@
+# middlewares/access_log.py
+import time
+from services import access_log
+from services.metrics import HTTP_REQUEST_SECONDS
+from services.request_context import phase_ms, start_request
+
+class AccessLogMiddleware:
+    """
+    Middleware ASGI puro (sin BaseHTTPMiddleware): mide latencia, status y
+    bytes enviados envolviendo `send`, y emite un registro por request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        t0 = time.perf_counter()
+        stats = start_request()
+        state = {"status": 500, "bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            latency_ms = (time.perf_counter() - t0) * 1000
+            # FastAPI deja la ruta matcheada en el scope -> template (/album/{id})
+            route = getattr(scope.get("route"), "path", None)
+            HTTP_REQUEST_SECONDS.observe(
+                latency_ms / 1000,
+                method=scope.get("method"),
+                route=route or "<unmatched>",
+                status=state["status"],
+            )
+            if access_log.should_log(state["status"], latency_ms):
+                record = {
+                    "ts": round(time.time(), 3),
+                    "method": scope.get("method"),
+                    "route": route,
+                    "path": scope.get("path"),
+                    "status": state["status"],
+                    "latency_ms": round(latency_ms, 2),
+                    "bytes": state["bytes"],
+                    "cache": stats["cache"],
+                    "upstream_ms": round(phase_ms(stats, "upstream"), 2),
+                }
+                record.update(stats["extra"])
+                access_log.emit(record)
+
+def add_access_log_middleware(app):
+    app.add_middleware(AccessLogMiddleware)
@@ -13,6 +13,7 @@ def add_cors_middleware(app):
         allow_origins=allow_origins,
         allow_credentials=False,  # ✅ nada de cookies
         allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
-        allow_headers=["Authorization", "Content-Type", "Accept", "Origin"],
+        allow_headers=["Authorization", "Content-Type", "Accept", "Origin", "If-None-Match"],
+        expose_headers=["ETag", "Server-Timing"],
         max_age=86400,
     )
\ No newline at end of file
@@ -0,0 +1,102 @@
+# middlewares/profiling.py
+import os
+import time
+from urllib.parse import parse_qs
+from starlette.datastructures import Headers
+from services.profiler import SamplingProfiler
+from services.request_context import current
+
+ENV = os.getenv("NODE_ENV", "development")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# Server-Timing en todos los requests (default: sólo fuera de producción)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0" if ENV == "production" else "1") == "1"
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "1")) / 1000
+
+PHASES = ("upstream", "parse", "cache", "serialize")
+
+def _is_admin(headers: Headers) -> bool:
+    """Fuera de producción siempre; en producción sólo con X-Admin-Token válido"""
+    if ENV != "production":
+        return True
+    return bool(ADMIN_TOKEN) and headers.get("x-admin-token") == ADMIN_TOKEN
+
+def _server_timing(t0: float) -> str:
+    stats = current() or {"phases": {}}
+    parts = [f"{name};dur={stats['phases'][name]:.1f}" for name in PHASES if name in stats["phases"]]
+    parts.append(f"app;dur={(time.perf_counter() - t0) * 1000:.1f}")
+    return ", ".join(parts)
+
+class ProfilingMiddleware:
+    """
+    - Header Server-Timing con las fases upstream / parse / cache / serialize
+      (las anotan los servicios vía services/request_context) + app (hasta
+      que arranca la respuesta).
+    - Con `?__profile=1` o `X-Profile: 1` (y permiso de admin) corre el request
+      bajo SamplingProfiler y devuelve los stacks en formato collapsed en vez
+      de la respuesta original (flamegraph.pl / speedscope).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = Headers(scope=scope)
+        admin = _is_admin(headers)
+        timing = SERVER_TIMING or (ENV == "production" and admin)
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        profile = admin and (headers.get("x-profile") == "1" or query.get("__profile") == ["1"])
+
+        t0 = time.perf_counter()
+        if profile:
+            return await self._profile(scope, receive, send, t0)
+
+        if not timing:
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"server-timing", _server_timing(t0).encode("latin-1"))
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _profile(self, scope, receive, send, t0: float):
+        original = {"status": None, "bytes": 0}
+
+        async def swallow(message):
+            # Descartamos la respuesta real: sólo nos interesa cuánto costó
+            if message["type"] == "http.response.start":
+                original["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                original["bytes"] += len(message.get("body", b""))
+
+        prof = SamplingProfiler(interval=PROFILE_INTERVAL).start()
+        try:
+            await self.app(scope, receive, swallow)
+        finally:
+            prof.stop()
+
+        body = prof.collapsed().encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+                (b"cache-control", b"no-store"),
+                (b"server-timing", _server_timing(t0).encode("latin-1")),
+                (b"x-profile-samples", str(prof.samples).encode()),
+                (b"x-profile-original-status", str(original["status"]).encode()),
+                (b"x-profile-original-bytes", str(original["bytes"]).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+def add_profiling_middleware(app):
+    app.add_middleware(ProfilingMiddleware)
@@ -2,7 +2,7 @@
 import os
 from fastapi import Request
 from fastapi.responses import JSONResponse
-from services.supabase_service import supabase_anon
+from services.supabase_service import get_supabase_anon
 from services.jwt_utils import decode_jwt
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -16,6 +16,9 @@ PUBLIC_PREFIXES = (
   # dejalas pasar sin token
 PUBLIC_ROUTES = {
     ("GET", "/api"),        # ejemplo de ping público
+    ("GET", "/api/"),       # el ping en sí (/api redirige acá); lo usan los bench
+    ("GET", "/metrics"),    # scrape de Prometheus (METRICS_TOKEN; sin token, sólo fuera de producción)
+    ("GET", "/metrics/upstream"),
     # ("GET", "/api/health"),
 }
 
@@ -52,7 +55,7 @@ async def supa_auth(request: Request, call_next):
     # Validar token con Supabase
     try:
         # supabase-py v2: get_user(token) -> objeto con atributo .user
-        resp = supabase_anon.auth.get_user(token)
+        resp = get_supabase_anon().auth.get_user(token)
         user_obj = getattr(resp, "user", None)
     except Exception as e:
         # 401 (no 500) si el token no es válido o expiró
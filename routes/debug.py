@@ -1,6 +1,7 @@
 # routes/debug.py
 from fastapi import APIRouter, Query
-from innertube import InnerTube
+from fastapi.responses import JSONResponse
+from services import innertube_service, upstream_store
 from services.cache_service import get_cached, set_cached
 
 
@@ -18,8 +19,7 @@ def search_debug(q: str = Query(..., description="Texto a buscar")):
     Sirve para debug y ver toda la estructura.
     """
     try:
-        yt = InnerTube("WEB_REMIX")
-        response = yt.search(q)
+        response = innertube_service.search(q)
         return response   # 🔴 devolvemos TODO, sin filtrar
     except Exception as e:
         return {"error": "search_error", "detail": str(e)}
@@ -27,8 +27,7 @@ def search_debug(q: str = Query(..., description="Texto a buscar")):
 @router.get("/artist_debug")
 def artist_debug(id: str = Query(..., description="Artist browseId")):
     try:
-        yt = InnerTube("WEB_REMIX")
-        response = yt.browse(id)   # 👈 browse con el browseId del artista
+        response = innertube_service.browse(id)   # 👈 browse con el browseId del artista
         return response
     except Exception as e:
         return {"error": "artist_debug_error", "detail": str(e), "id": id}
@@ -36,8 +35,7 @@ def artist_debug(id: str = Query(..., description="Artist browseId")):
 @router.get("/artist_debug_contents")
 def artist_debug_contents(id: str = Query(..., description="Artist browseId")):
     try:
-        yt = InnerTube("WEB_REMIX")
-        response = yt.browse(id)
+        response = innertube_service.browse(id)
 
         # navegar directo a contents
         contents = (
@@ -60,6 +58,34 @@ def album_debug(id: str = Query(..., description="Album browseId")):
     """
     Devuelve la respuesta completa de un álbum desde YouTube Music.
     """
-    yt = InnerTube("WEB_REMIX")
-    response = yt.browse(id)
-    return response
\ No newline at end of file
+    response = innertube_service.browse(id)
+    return response
+
+@router.get("/upstream_store")
+def upstream_store_list(kind: str | None = Query(None, description="search | browse | ytdlp/<client>")):
+    """
+    Lista las respuestas grabadas. Con UPSTREAM_MODE=record, cada llamada a
+    los endpoints de arriba (o de /api/music) queda grabada para replay.
+    """
+    try:
+        entries = upstream_store.list_entries(kind)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {
+        "mode": upstream_store.MODE,
+        "dir": upstream_store.STORE_DIR,
+        "total": len(entries),
+        "bytes": sum(e["bytes"] for e in entries),
+        "entries": entries,
+    }
+
+@router.get("/upstream_store/entry")
+def upstream_store_entry(kind: str = Query(...), key: str = Query(...)):
+    """Devuelve una respuesta grabada tal cual"""
+    try:
+        data = upstream_store.load(kind, key)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    if data is None:
+        return {"error": "not_recorded", "kind": kind, "key": key}
+    return data
\ No newline at end of file
@@ -0,0 +1,31 @@
+# routes/metrics.py
+import os
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse, JSONResponse
+from services import admission, metrics, po_token, upstream_governor
+
+router = APIRouter()
+
+# Si está seteado, Prometheus tiene que mandar "Authorization: Bearer <token>".
+# Sin token configurado, /metrics y /metrics/upstream sólo se sirven fuera de
+# producción (como /debug): exponen rutas, colas, caches y latencias upstream.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+ENV = os.getenv("NODE_ENV", "development")
+
+def _authorized(request: Request) -> bool:
+    if not METRICS_TOKEN:
+        return ENV != "production"
+    return request.headers.get("Authorization", "") == f"Bearer {METRICS_TOKEN}"
+
+@router.get("")
+def get_metrics(request: Request):
+    if not _authorized(request):
+        return JSONResponse(status_code=401, content={"error": "invalid metrics token"})
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/upstream")
+def get_upstream_stats(request: Request):
+    """Estado de token buckets (tokens, cola por carril), circuit breakers, PO tokens y colas de admisión"""
+    if not _authorized(request):
+        return JSONResponse(status_code=401, content={"error": "invalid metrics token"})
+    return {**upstream_governor.stats(), "po_token": po_token.stats(), "admission": admission.stats()}
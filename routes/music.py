@@ -2,41 +2,116 @@
 from fastapi import APIRouter, Query, Path, Body, Request
 from fastapi.responses import StreamingResponse, JSONResponse, RedirectResponse
 import time
-import requests
-import yt_dlp
-from innertube import InnerTube
 import os
+import json
+import queue
+import threading
+import contextvars
 import urllib.parse  # <- NUEVO
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
 
-from services.cache_service import get_cached, set_cached
+from services import (
+    admission, catalog, innertube_service, negative_cache, po_token, range_fetcher, up_next, upstream_governor,
+    upstream_store,
+)
+from services.cache_service import get_cached
+from services.http_cache import (
+    admission_rejected_response, cache_fill, cached_or_fill, composed_or_fill, conditional_json,
+    negative_cached_response, upstream_unavailable_response,
+)
+from services.supabase_service import db_as_user, execute
+from services.metrics import CACHE_REQUESTS, UPSTREAM_SECONDS, Counter, Gauge
+from services.request_context import annotate, mark_cache, phase_timer, upstream_timer
 from utils.artist_parser import (
     parse_top_songs,
     parse_albums,
     parse_singles_eps,
     parse_related_artists,
+    index_artist_sections,
+    more_endpoint,
+    parse_release_grid,
+    parse_release_items,
 )
 from utils.album_parser import parse_album_info, parse_album_tracks
+from utils.watch_parser import parse_watch_next
+from utils.search_parser import parse_album_items, parse_artist_items, parse_search_shelf, parse_song_items
+
+# yt_dlp y requests se importan recién al primer uso (arranque en frío rápido)
+if TYPE_CHECKING:
+    import requests
+    import yt_dlp
 
 router = APIRouter()
 
 # --- CONFIG ---
 CACHE_TTL = 30 * 60    # metadata: 30 min
 URL_TTL   = 15 * 60    # fallback si no podemos leer expire (antes 120s era muy corto)
+# Escalera de calidades (kbps máximo) para /play?quality=
+QUALITY_CAPS = {"low": 64, "medium": 128, "high": None}
+LADDER_MAX = 8  # formatos de audio que guardamos por video
+# Con el breaker abierto servimos la URL cacheada hasta su expire real
+# (el TTL ya descuenta 120s de margen)
+URL_STALE_GRACE = 120
 _cache = {}
 
+# --- METRICS ---
+Gauge("stream_url_cache_entries", "Entradas en el cache de URLs de audio", fn=lambda: len(_cache))
+PROBE_RESULTS = Counter("googlevideo_probe_total", "Resultados de _probe_url", ("outcome",))
+FORMAT_SELECTIONS = Counter("play_format_selected_total", "Formato servido por /play", ("quality", "ext"))
+ACTIVE_STREAMS = Gauge("proxy_active_streams", "Streams de audio proxyeados en curso")
+STREAMED_BYTES = Counter("proxy_streamed_bytes_total", "Bytes de audio enviados por el proxy")
+
 cookies_path = os.path.join(os.path.dirname(__file__), "..", "cookies.txt")
 
-# Reusamos sesión HTTP para que no se corte el keep-alive
-_SESSION = requests.Session()
-_SESSION.headers.update({
-    "User-Agent": "Mozilla/5.0",
-    "Accept": "*/*",
-    "Connection": "keep-alive",
-})
+# Reusamos sesión HTTP para que no se corte el keep-alive (se crea al primer uso)
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "64"))
+
+def _session() -> "requests.Session":
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                # Varias conexiones por stream (services/range_fetcher): pool más grande
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({
+                    "User-Agent": "Mozilla/5.0",
+                    "Accept": "*/*",
+                    "Connection": "keep-alive",
+                })
+                _SESSION = session
+    return _SESSION
 
-def _ydl_for(client: str) -> yt_dlp.YoutubeDL:
+def _uses_cookies(client: str) -> bool:
     # Clientes "mobile" NO soportan cookies en yt-dlp
     mobile_client = client.lower() in ("android", "ios")
+    return not mobile_client and os.path.exists(cookies_path)
+
+def _visitor_data_for(client: str) -> str | None:
+    """Visitor data cacheado (sólo sin cookies: con cookies manda la sesión)"""
+    return None if _uses_cookies(client) else po_token.cached_visitor_data()
+
+def _ydl_for(client: str) -> "yt_dlp.YoutubeDL":
+    import yt_dlp
+
+    youtube_args = {"player_client": [client]}
+    visitor_data = _visitor_data_for(client)
+    if visitor_data:
+        youtube_args["visitor_data"] = [visitor_data]
+
+    extractor_args = {"youtube": youtube_args}
+    if po_token.enabled():
+        # PO tokens vía proxy local con cache (services/po_token), no un
+        # round trip al provider por cada extracción
+        extractor_args["youtubepot-bgutilhttp"] = {"base_url": [po_token.local_base_url()]}
 
     opts = {
         # Preferí bestaudio y dejá m4a como preferencia, no como requisito duro
@@ -44,26 +119,51 @@ def _ydl_for(client: str) -> yt_dlp.YoutubeDL:
         "quiet": True,
         "skip_download": True,
         "noplaylist": True,
-        "extractor_args": {
-            "youtube": {
-                "player_client": [client],
-            },
-            # Si usás este provider, dejalo; si android/ios ya resuelve bien, podés quitarlo
-            "youtubepot-bgutilhttp": {
-                "base_url": ["https://bgutil-ytdlp-pot-provider-latest.onrender.com"],  # LOCAL http://127.0.0.1:4416
-            },
-        },
+        "extractor_args": extractor_args,
         # Opcional: menos retries si querés respuestas más rápidas ante SABR
         "retries": 1,
         "extractor_retries": 1,
     }
 
     # 👇 Sólo pasamos cookies para web/mweb (NO para android/ios)
-    if not mobile_client and os.path.exists(cookies_path):
+    if _uses_cookies(client):
         opts["cookiefile"] = cookies_path
 
     return yt_dlp.YoutubeDL(opts)
 
+# Pool de instancias YoutubeDL por player client: construirlas (opciones,
+# cookies, registro de extractores) no es gratis y se puede hacer en el warm-up
+YDL_POOL_MAX = 4  # instancias ociosas por cliente
+_YDL_POOL: dict[str, list] = {}
+_YDL_POOL_LOCK = threading.Lock()
+
+@contextmanager
+def _ydl_lease(client: str):
+    """Presta una instancia del pool (o crea una); si la extracción falla se descarta"""
+    visitor_data = _visitor_data_for(client)
+    with _YDL_POOL_LOCK:
+        idle = _YDL_POOL.setdefault(client, [])
+        ydl = idle.pop() if idle else None
+    if ydl is not None and getattr(ydl, "_visitor_data", None) != visitor_data:
+        ydl = None  # el visitor data rotó: la instancia tiene las opciones viejas
+    if ydl is None:
+        ydl = _ydl_for(client)
+        ydl._visitor_data = visitor_data
+    yield ydl
+    with _YDL_POOL_LOCK:
+        if len(idle) < YDL_POOL_MAX:
+            idle.append(ydl)
+
+def warm_up():
+    """Warm-up post-arranque: yt-dlp + extractor de YouTube, y TLS a googlevideo"""
+    for client in ("web_music", "mweb", "web"):
+        with _ydl_lease(client) as ydl:
+            ydl.get_info_extractor("Youtube")
+    try:
+        _session().head("https://redirector.googlevideo.com/", timeout=(3, 5))
+    except Exception:
+        pass
+
 def _ttl_from_url(u: str) -> int:
     """Deriva TTL real de la URL googlevideo leyendo 'expire' o 'x-goog-expires'."""
     try:
@@ -81,39 +181,145 @@ def _ttl_from_url(u: str) -> int:
         pass
     return URL_TTL
 
+# Errores de yt-dlp que son del video, no de YouTube: no abren el breaker
+_PERMANENT_EXTRACT_ERRORS = (
+    "video unavailable",
+    "private video",
+    "has been removed",
+    "is not available",
+    "confirm your age",
+)
+
+def _is_extract_outage(exc: Exception) -> bool:
+    msg = str(exc).lower()
+    return not any(m in msg for m in _PERMANENT_EXTRACT_ERRORS)
+
+def _extract_with(client: str, video_id: str) -> dict:
+    """Extracción gobernada: rate limit "extract" + breaker por player client"""
+    return upstream_governor.call(
+        f"ytdlp:{client}", _run_extraction, client, video_id,
+        bucket="extract", is_failure=_is_extract_outage,
+    )
+
+def _run_extraction(client: str, video_id: str) -> dict:
+    """Una extracción yt-dlp con un player client (medida como upstream)"""
+    with _ydl_lease(client) as ydl, upstream_timer(), \
+            UPSTREAM_SECONDS.time(upstream="ytdlp", op=client, outcome="ok") as labels:
+        try:
+            info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
+        except Exception:
+            labels["outcome"] = "error"
+            raise
+        direct_url = info.get("url")
+        if not (direct_url and direct_url.startswith("http")):
+            labels["outcome"] = "no_url"
+    return info
+
 def _extract_best_url(video_id: str):
     """
     Intenta con clientes que suelen traer URL directa rápido.
     Orden por desempeño/estabilidad: ANDROID -> IOS -> WEB
     """
+    governed, permanent = [], []
     for client in ("web_music", "mweb", "web"):
         try:
-            ydl = _ydl_for(client)
-            info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
+            # record/replay según UPSTREAM_MODE (services/upstream_store.py)
+            info = upstream_store.through(
+                f"ytdlp/{client}", video_id, lambda: _extract_with(client, video_id)
+            )
             direct_url = info.get("url")
             if direct_url and direct_url.startswith("http"):
                 return info, direct_url, client
-        except Exception:
+        except upstream_governor.UpstreamUnavailable as e:
+            # Breaker abierto / sin tokens: probamos el siguiente cliente
+            governed.append(e)
+        except Exception as e:
+            if not _is_extract_outage(e):
+                permanent.append(e)
             continue
+    if len(governed) == 3:
+        # Ningún cliente llegó a intentarse: no es culpa del video
+        raise min(governed, key=lambda e: e.retry_after)
+    if len(permanent) == 3:
+        # Los tres dicen lo mismo del video (privado, borrado...): el cache
+        # negativo lo toma como permanente por el mensaje
+        raise RuntimeError(f"no_audio_format: {permanent[0]}")
     raise RuntimeError("no_audio_format")
 
-def get_audio_info(video_id: str):
+def _audio_ladder(info: dict) -> list[dict]:
+    """
+    Formatos sólo-audio con URL directa de la misma extracción (todas vencen
+    juntas), ordenados por bitrate: permiten cambiar de calidad sin re-extraer.
+    """
+    ladder = []
+    for f in info.get("formats") or []:
+        url = f.get("url") or ""
+        if f.get("vcodec") not in (None, "none") or f.get("acodec") in (None, "none"):
+            continue
+        if not url.startswith("http") or "m3u8" in (f.get("protocol") or ""):
+            continue
+        ladder.append({
+            "format_id": f.get("format_id"),
+            "ext": f.get("ext"),
+            "acodec": f.get("acodec"),
+            "abr": f.get("abr") or f.get("tbr") or 0,
+            "url": url,
+        })
+    ladder.sort(key=lambda f: f["abr"])
+    return ladder[-LADDER_MAX:]
+
+def select_format(data: dict, max_kbps: float | None, ext: str | None) -> dict:
+    """El de mayor bitrate <= max_kbps (o el más bajo si ninguno entra)"""
+    ladder = data.get("formats") or []
+    if ext:
+        ladder = [f for f in ladder if f["ext"] == ext] or ladder
+    if not ladder:
+        info = data.get("info") or {}
+        return {"format_id": info.get("format_id"), "ext": info.get("ext"),
+                "abr": info.get("abr"), "url": data["direct_url"]}
+    if max_kbps is None:
+        return ladder[-1]
+    fitting = [f for f in ladder if f["abr"] <= max_kbps]
+    return fitting[-1] if fitting else ladder[0]
+
+def get_audio_info(video_id: str, refresh: bool = False):
     """
     Devuelve info cacheada; si la URL no está o venció, re-extrae.
     Usa TTL derivado de la URL para evitar re-extracciones innecesarias.
+    refresh=True fuerza la re-extracción (la URL cacheada dejó de andar).
     """
     now = time.time()
     cached = _cache.get(video_id)
 
-    if cached and cached.get("direct_url"):
+    if cached and cached.get("direct_url") and not refresh:
         ttl = cached.get("ttl", URL_TTL)
         if now - cached["ts"] < ttl:
+            mark_cache(True)
+            CACHE_REQUESTS.inc(cache="stream_url", result="hit")
             return cached
 
-    info, direct_url, client = _extract_best_url(video_id)
+    mark_cache(False)
+    CACHE_REQUESTS.inc(cache="stream_url", result="miss")
+
+    try:
+        # Un id que falló hace poco no vuelve a pagar las 3 extracciones; si
+        # no, la extracción espera su turno en la cola del cliente
+        with negative_cache.guard("video", video_id, _PERMANENT_EXTRACT_ERRORS), admission.extraction():
+            info, direct_url, client = _extract_best_url(video_id)
+    except admission.AdmissionRejected:
+        # Cuota del cliente, no del upstream: sin stale, el handler responde 429
+        raise
+    except upstream_governor.UpstreamUnavailable:
+        # YouTube nos está frenando: si la URL vieja todavía no expiró, sirve
+        if cached and cached.get("direct_url") and \
+                now < cached["ts"] + cached.get("ttl", URL_TTL) + URL_STALE_GRACE:
+            annotate(stale=True)
+            return cached
+        raise
     data = {
         "info": info,
         "direct_url": direct_url,
+        "formats": _audio_ladder(info),
         "client": client,
         "ts": now,
         "ttl": _ttl_from_url(direct_url),
@@ -121,29 +327,106 @@ def get_audio_info(video_id: str):
     _cache[video_id] = data
     return data
 
+# --- SNAPSHOT (services/cache_snapshot) ---
+# Del 'info' de yt-dlp (enorme) sólo persistimos lo que usan las rutas
+_SNAPSHOT_INFO_FIELDS = ("id", "title", "duration", "ext", "abr", "acodec", "format_id")
+SNAPSHOT_MIN_REMAINING = 120  # no vale la pena restaurar URLs a punto de vencer
+
+def export_cache() -> list[dict]:
+    now = time.time()
+    out = []
+    for video_id, data in list(_cache.items()):
+        expires_at = data["ts"] + data.get("ttl", URL_TTL)
+        if not data.get("direct_url") or expires_at - now < SNAPSHOT_MIN_REMAINING:
+            continue
+        entry = {k: v for k, v in data.items() if k != "info"}
+        info = data.get("info") or {}
+        entry["info"] = {k: info[k] for k in _SNAPSHOT_INFO_FIELDS if k in info}
+        entry["video_id"] = video_id
+        entry["expires_at"] = expires_at
+        out.append(entry)
+    return out
+
+def import_cache(entries: list[dict]) -> int:
+    now = time.time()
+    restored = 0
+    for entry in entries:
+        video_id = entry.pop("video_id")
+        expires_at = entry.pop("expires_at")
+        if video_id in _cache or expires_at - now < SNAPSHOT_MIN_REMAINING:
+            continue
+        _cache[video_id] = entry  # ts/ttl originales (epoch): el vencimiento se mantiene
+        restored += 1
+    return restored
+
 def _probe_url(url: str) -> bool:
     """
     Sonda rápida: pide el primer byte (Range 0-1) para validar 200/206.
     """
     headers = {"Range": "bytes=0-1"}
+    upstream_governor.check("googlevideo")
     try:
-        r = _SESSION.get(url, headers=headers, stream=True, timeout=(2, 5), allow_redirects=True)
+        with upstream_timer(), UPSTREAM_SECONDS.time(upstream="googlevideo", op="probe", outcome="ok") as labels:
+            try:
+                r = _session().get(url, headers=headers, stream=True, timeout=(2, 5), allow_redirects=True)
+            except Exception:
+                labels["outcome"] = "error"
+                upstream_governor.record("googlevideo", ok=False)
+                raise
         ok = r.status_code in (200, 206)
         r.close()
+        upstream_governor.record("googlevideo", ok=not _is_cdn_outage(r.status_code))
+        PROBE_RESULTS.inc(outcome="ok" if ok else f"http_{r.status_code}")
         return ok
     except Exception:
+        PROBE_RESULTS.inc(outcome="error")
         return False
 
-def _stream_from_url(url: str, range_header: str | None) -> StreamingResponse:
+def _is_cdn_outage(status: int) -> bool:
+    """403/404 = URL vencida o revocada (se re-extrae); 429/5xx = googlevideo caído"""
+    return status == 429 or status >= 500
+
+def _count_stream(chunks):
+    """Envuelve el iterador upstream para medir streams activos y bytes enviados"""
+    ACTIVE_STREAMS.inc()
+    try:
+        for chunk in chunks:
+            STREAMED_BYTES.inc(len(chunk))
+            yield chunk
+    finally:
+        ACTIVE_STREAMS.dec()
+
+def _stream_from_url(url: str, range_header: str | None, abr: float | None = None,
+                     slot: "admission.StreamSlot | None" = None) -> StreamingResponse:
     """
     Crea un StreamingResponse pasándole Range si el cliente lo pidió.
     Propaga Content-Type, Content-Length / Content-Range y status (200/206).
+    Según el bitrate, el rango se baja con varias conexiones en paralelo
+    (ver services/range_fetcher). `slot` (admisión) se libera al terminar el body.
     """
+    connections = range_fetcher.connections_for(abr)
+    requested = range_fetcher.parse_range(range_header) if connections > 1 else None
+
     headers = {}
-    if range_header:
+    if requested is not None:
+        # Sólo el primer segmento: el resto lo baja el SegmentReader
+        start, end = requested
+        first_end = start + range_fetcher.SEGMENT_BYTES - 1
+        if end is not None:
+            first_end = min(first_end, end)
+        headers["Range"] = f"bytes={start}-{first_end}"
+    elif range_header:
         headers["Range"] = range_header
 
-    r = _SESSION.get(url, headers=headers, stream=True, timeout=(5, 30), allow_redirects=True)
+    upstream_governor.check("googlevideo")
+    with upstream_timer(), UPSTREAM_SECONDS.time(upstream="googlevideo", op="stream", outcome="ok") as labels:
+        try:
+            r = _session().get(url, headers=headers, stream=True, timeout=(5, 30), allow_redirects=True)
+        except Exception:
+            labels["outcome"] = "error"
+            upstream_governor.record("googlevideo", ok=False)
+            raise
+    upstream_governor.record("googlevideo", ok=not _is_cdn_outage(r.status_code))
 
     resp_headers = {
         "Accept-Ranges": "bytes",
@@ -154,19 +437,42 @@ def _stream_from_url(url: str, range_header: str | None) -> StreamingResponse:
     ct = r.headers.get("Content-Type")
     media_type = ct if ct else "audio/webm"
 
-    cl = r.headers.get("Content-Length")
-    if cl:
-        resp_headers["Content-Length"] = cl
+    body = r.iter_content(chunk_size=1024 * 256)
+    status = r.status_code
+    got = range_fetcher.parse_content_range(r.headers.get("Content-Range")) \
+        if requested is not None and r.status_code == 206 else None
 
-    cr = r.headers.get("Content-Range")
-    if cr:
-        resp_headers["Content-Range"] = cr
+    if got:
+        start, end = requested
+        _, got_end, total = got
+        last = total - 1 if end is None else min(end, total - 1)
+        reader = None
+        if last > got_end:
+            reader = range_fetcher.SegmentReader(_session(), url, got_end + 1, last, connections).start()
+        body = range_fetcher.chain(r, reader)
+        annotate(stream_connections=connections if reader else 1)
 
+        # Al cliente le respondemos el rango que pidió, no el del primer segmento
+        resp_headers["Content-Length"] = str(last - start + 1)
+        if range_header:
+            resp_headers["Content-Range"] = f"bytes {start}-{last}/{total}"
+        else:
+            status = 200
+    else:
+        cl = r.headers.get("Content-Length")
+        if cl:
+            resp_headers["Content-Length"] = cl
+
+        cr = r.headers.get("Content-Range")
+        if cr:
+            resp_headers["Content-Range"] = cr
+
+    body = _count_stream(body)
     return StreamingResponse(
-        r.iter_content(chunk_size=1024 * 256),
+        slot.bind(body) if slot else body,
         media_type=media_type,
         headers=resp_headers,
-        status_code=r.status_code,
+        status_code=status,
     )
 
 # --- AUDIO ENDPOINTS ---
@@ -175,37 +481,71 @@ def _stream_from_url(url: str, range_header: str | None) -> StreamingResponse:
 def play_song(
     request: Request,
     id: str = Query(..., description="YouTube video ID"),
-    redir: int = Query(0, description="Si 1, redirige al CDN en vez de proxyear")
+    redir: int = Query(0, description="Si 1, redirige al CDN en vez de proxyear"),
+    quality: str | None = Query(None, description="low | medium | high (ej: low en datos móviles)"),
+    maxbitrate: int | None = Query(None, description="Bitrate máximo en kbps"),
+    ext: str | None = Query(None, description="Contenedor preferido: m4a | webm"),
 ):
     """
     Devuelve stream de audio con soporte Range y refresh de URL si expiró.
     Si redir=1, devuelve 307 Redirect al CDN (menos latencia).
+    quality / maxbitrate / ext eligen entre los formatos de la misma
+    extracción (sin llamada extra a YouTube); sin ellos, el default de siempre.
     """
+    if quality is not None and quality not in QUALITY_CAPS:
+        return JSONResponse(status_code=400, content={"error": "invalid quality", "allowed": list(QUALITY_CAPS)})
+    caps = [c for c in (QUALITY_CAPS.get(quality), maxbitrate) if c]
+    selecting = quality is not None or maxbitrate is not None or ext is not None
+
+    slot = None
     try:
-        data = get_audio_info(id)
-        audio_url = data["direct_url"]
+        # Tope de streams del cliente antes de gastar una extracción
+        slot = admission.acquire_stream(request) if redir != 1 else None
+        # Si up-next lo está resolviendo, esperamos eso en vez de extraer de nuevo
+        up_next.claim(id)
+        with admission.client_scope(request):
+            data = get_audio_info(id)
+        fmt = select_format(data, min(caps) if caps else None, ext) if selecting else None
+        audio_url = fmt["url"] if fmt else data["direct_url"]
 
         # Si la URL cayó (403/404/expired), refrescamos una vez
         if not _probe_url(audio_url):
-            data = get_audio_info(id)  # re-extrae y actualiza cache
-            audio_url = data["direct_url"]
+            with admission.client_scope(request):
+                data = get_audio_info(id, refresh=True)  # re-extrae y actualiza cache
+            fmt = select_format(data, min(caps) if caps else None, ext) if selecting else None
+            audio_url = fmt["url"] if fmt else data["direct_url"]
 
         approx_ttl = data.get("ttl", URL_TTL)
-        print(f"[play] id={id} via client={data.get('client')} ttl≈{approx_ttl}s")
+        abr = fmt["abr"] if fmt else (data.get("info") or {}).get("abr")
+        annotate(video_id=id, yt_client=data.get("client"), url_ttl=approx_ttl,
+                 format_id=fmt["format_id"] if fmt else (data.get("info") or {}).get("format_id"), abr=abr)
+        FORMAT_SELECTIONS.inc(quality=quality or ("custom" if selecting else "default"),
+                              ext=(fmt or data.get("info") or {}).get("ext") or "unknown")
 
         if redir == 1:
             return RedirectResponse(url=audio_url, status_code=307)
 
         range_hdr = request.headers.get("Range")
-        return _stream_from_url(audio_url, range_hdr)
+        response = _stream_from_url(audio_url, range_hdr, abr, slot)
+        slot = None  # ahora lo libera el body
+        return response
+    except admission.AdmissionRejected as e:
+        return admission_rejected_response(e, id=id)
+    except upstream_governor.UpstreamUnavailable as e:
+        return upstream_unavailable_response(e, id=id)
+    except negative_cache.NegativeCached as e:
+        return negative_cached_response(e)
     except Exception as e:
         return JSONResponse(
             status_code=502,
             content={"error": "no_stream", "detail": str(e), "id": id},
         )
+    finally:
+        if slot is not None:
+            slot.release()
 
 @router.post("/prefetch")
-def prefetch_songs(payload: dict = Body(...)):
+def prefetch_songs(request: Request, payload: dict = Body(...)):
     """
     Precarga info + direct_url de varias canciones.
     Nunca deja en cache un 'info' sin URL.
@@ -218,13 +558,21 @@ def prefetch_songs(payload: dict = Body(...)):
 
     warmed_info = 0
     errors = 0
-    for vid in ids:
-        try:
-            data = get_audio_info(vid)
-            if data.get("direct_url"):
-                warmed_info += 1
-        except Exception:
-            errors += 1
+    # Carril PREFETCH: si falta capacidad, /play pasa primero. Las
+    # extracciones cuentan para la cuota del cliente (services/admission)
+    with upstream_governor.priority_scope(upstream_governor.PREFETCH), admission.client_scope(request):
+        for i, vid in enumerate(ids):
+            try:
+                data = get_audio_info(vid)
+                if data.get("direct_url"):
+                    warmed_info += 1
+            except admission.AdmissionRejected as e:
+                # Cola del cliente llena: cortamos acá, el resto que lo reintente después
+                return admission_rejected_response(
+                    e, total=len(ids), warmed_info=warmed_info, errors=errors, skipped=len(ids) - i,
+                )
+            except Exception:
+                errors += 1
 
     return {
         "ok": True,
@@ -233,17 +581,192 @@ def prefetch_songs(payload: dict = Body(...)):
         "errors": errors,
     }
 
+# --- UP NEXT ---
+
+def _album_queue(album_id: str) -> list[str]:
+    key = f"album:{album_id}"
+    payload = get_cached(key)
+    if payload is None:
+        payload = _album_payload(album_id)
+        cache_fill(key, payload, CACHE_TTL)  # de paso queda listo para /album
+    return [t.get("videoId") for t in payload.get("tracks", [])]
+
+def _playlist_queue(request: Request, playlist_id: str) -> list[str]:
+    jwt = request.headers.get("Authorization", "").replace("Bearer ", "")
+    resp = execute(
+        db_as_user(jwt).table("playlist_tracks")
+        .select("position,tracks(track_id)")
+        .eq("playlist_id", playlist_id)
+        .order("position"),
+        "playlist_tracks.queue",
+    )
+    return [(row.get("tracks") or {}).get("track_id") for row in (resp.data or [])]
+
+def _radio_queue(video_id: str) -> list[str]:
+    key = f"next:{video_id}"
+    tracks = get_cached(key)
+    if tracks is None:
+        response = innertube_service.watch_next(video_id, f"RDAMVM{video_id}")
+        with phase_timer("parse"):
+            tracks = parse_watch_next(response)
+        cache_fill(key, tracks, CACHE_TTL)
+    return [t["videoId"] for t in tracks]
+
+@router.get("/next")
+def warm_up_next(
+    request: Request,
+    id: str = Query(..., description="Video que está sonando"),
+    album: str | None = Query(None, description="Álbum en reproducción"),
+    playlist: str | None = Query(None, description="Playlist en reproducción (requiere Authorization)"),
+    n: int = Query(up_next.UPNEXT_COUNT, ge=1, le=10, description="Cuántos tracks resolver"),
+):
+    """
+    Agenda en background la URL de audio de los próximos n tracks (del álbum,
+    la playlist o, si no se indica ninguno, la radio de InnerTube) para que el
+    próximo /play no espere la extracción.
+    """
+    if playlist and not request.headers.get("Authorization"):
+        return JSONResponse(status_code=401, content={"error": "unauthorized"})
+    try:
+        if album:
+            source, queue = "album", _album_queue(album)
+        elif playlist:
+            source, queue = "playlist", _playlist_queue(request, playlist)
+        else:
+            source, queue = "radio", _radio_queue(id)
+    except upstream_governor.UpstreamUnavailable as e:
+        return upstream_unavailable_response(e, id=id)
+    except negative_cache.NegativeCached as e:
+        return negative_cached_response(e)
+    except Exception as e:
+        return JSONResponse(status_code=502, content={"error": "no_queue", "detail": str(e), "id": id})
+
+    following = up_next.following(queue, id, n)
+    # Las extracciones en background se le cobran a quien pidió /next
+    scheduled = up_next.schedule(following, get_audio_info, source, client=admission.client_of(request))
+    annotate(upnext_source=source, upnext_scheduled=len(scheduled))
+    return {"id": id, "source": source, "next": following, "scheduled": scheduled}
+
 # --- SEARCH ---
 
+# params de InnerTube para las búsquedas filtradas (los chips de la web)
+SEARCH_FILTERS = {
+    "songs": "EgWKAQIIAWoMEA4QChADEAQQCRAF",
+    "albums": "EgWKAQIYAWoMEA4QChADEAQQCRAF",
+    "artists": "EgWKAQIgAWoMEA4QChADEAQQCRAF",
+}
+_SEARCH_PARSERS = {"songs": parse_song_items, "albums": parse_album_items, "artists": parse_artist_items}
+# Clave de dedupe de cada tipo (las tarjetas usan artistId / videoId)
+_SEARCH_IDS = {"songs": "videoId", "albums": "id", "artists": "artistId"}
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "8"))
+EMPTY_SEARCH_TTL = int(os.getenv("EMPTY_SEARCH_TTL", "120"))  # sin resultados: se reintenta antes
+
+_search_executor: ThreadPoolExecutor | None = None
+_search_executor_lock = threading.Lock()
+
+def _search_pool() -> ThreadPoolExecutor:
+    global _search_executor
+    if _search_executor is None:
+        with _search_executor_lock:
+            if _search_executor is None:
+                _search_executor = ThreadPoolExecutor(SEARCH_WORKERS, thread_name_prefix="search")
+    return _search_executor
+
 @router.get("/search")
-def search_music(q: str = Query(..., description="Texto a buscar")):
-    cached = get_cached(f"search:{q}")
-    if cached:
-        return cached
+def search_music(
+    request: Request,
+    q: str | None = Query(None, description="Texto a buscar"),
+    type: str = Query("all", description="all | songs | albums | artists"),
+    continuation: str | None = Query(None, description="Token de la página anterior (requiere type)"),
+):
+    """
+    type=all: resultado principal + búsquedas filtradas de canciones, álbumes
+    y artistas en paralelo, mezcladas y sin duplicados. Con type=songs|albums|
+    artists sólo esa búsqueda, paginable con `continuation`.
+    """
+    if type != "all" and type not in SEARCH_FILTERS:
+        return JSONResponse(status_code=400, content={"error": "unknown_type", "type": type,
+                                                      "allowed": ["all", *SEARCH_FILTERS]})
+    if continuation:
+        if type == "all":
+            return JSONResponse(status_code=400, content={"error": "continuation_requires_type"})
+        return cached_or_fill(request, f"search:{type}:cont:{_key_part(continuation)}",
+                              lambda: _filtered_search(type, continuation=continuation), _search_ttl)
+    if not q:
+        return JSONResponse(status_code=400, content={"error": "missing_query"})
+    if type == "all":
+        return cached_or_fill(request, f"search:{_key_part(q)}", lambda: _search_payload(q), _search_ttl)
+    return cached_or_fill(request, f"search:{_key_part(q)}:{type}", lambda: _filtered_search(type, q), _search_ttl)
+
+def _key_part(text: str) -> str:
+    """
+    Query / token para claves de cache: sin ':' crudos, así "songs:x" no pisa
+    la clave de la búsqueda filtrada de "x" ni una de continuación
+    """
+    return urllib.parse.quote(text, safe="")
+
+def _search_ttl(data: dict) -> int:
+    """Las búsquedas vacías se cachean poco: puede ser un hipo de YouTube"""
+    return CACHE_TTL if any(data.get(kind) for kind in _SEARCH_IDS) else EMPTY_SEARCH_TTL
 
-    yt = InnerTube("WEB_REMIX")
-    response = yt.search(q)
+def _top_search(q: str):
+    """Tarjetas de resultado principal (búsqueda sin filtro)"""
+    with negative_cache.guard("query", _key_part(q)):
+        response = innertube_service.search(q)
+    with phase_timer("parse"):
+        return _parse_search(q, response)
+
+def _filtered_search(kind: str, q: str | None = None, continuation: str | None = None):
+    """Una búsqueda filtrada (o su página siguiente): {kind: [...], "continuation"}"""
+    guard_key = f"{kind}:cont:{_key_part(continuation)}" if continuation else f"{kind}:{_key_part(q)}"
+    with negative_cache.guard("query", guard_key):
+        if continuation:
+            response = innertube_service.search(continuation=continuation)
+        else:
+            response = innertube_service.search(q, params=SEARCH_FILTERS[kind])
+    with phase_timer("parse"):
+        items, next_token = parse_search_shelf(response)
+        payload = {"query": q, kind: _SEARCH_PARSERS[kind](items), "continuation": next_token}
+    catalog.record_search(payload)
+    return payload
+
+def _sub_search(key: str, producer):
+    """Sub-resultado cacheado por separado: queries que se solapan comparten trabajo"""
+    data = get_cached(key)
+    if data is None:
+        data = producer()
+        cache_fill(key, data, _search_ttl(data))
+    return data
+
+def _search_payload(q: str):
+    qk = _key_part(q)
+    jobs = {"top": (f"search:{qk}:top", lambda: _top_search(q))}
+    for kind in SEARCH_FILTERS:
+        jobs[kind] = (f"search:{qk}:{kind}", lambda kind=kind: _filtered_search(kind, q))
+
+    pool = _search_pool()
+    futures = {
+        name: pool.submit(contextvars.copy_context().run, _sub_search, key, producer)
+        for name, (key, producer) in jobs.items()
+    }
+    # Si alguna falla se propaga: las que sí llegaron ya quedaron en cache
+    results = {name: fut.result() for name, fut in futures.items()}
+
+    payload = {"query": q, "continuations": {}}
+    top = results["top"]
+    for kind, id_key in _SEARCH_IDS.items():
+        merged, seen = [], set()
+        for item in top.get(kind, []) + results[kind][kind]:
+            item_id = item.get(id_key)
+            if item_id and item_id not in seen:
+                seen.add(item_id)
+                merged.append(item)
+        payload[kind] = merged
+        payload["continuations"][kind] = results[kind]["continuation"]
+    catalog.record_search(top)
+    return payload
 
+def _parse_search(q: str, response: dict):
     artists, songs = [], []
 
     tabs = (
@@ -320,17 +843,14 @@ def search_music(q: str = Query(..., description="Texto a buscar")):
                     }
                 )
 
-    result = {"query": q, "artists": artists, "songs": songs}
-    set_cached(f"search:{q}", result)
-    return result
+    return {"query": q, "artists": artists, "songs": songs}
 
 # --- ARTIST ---
 
-def _artist_payload(artist_id: str):
-    yt = InnerTube("WEB_REMIX")
-    response = yt.browse(artist_id)
+ARTIST_SECTIONS = ("header", "topSongs", "albums", "singles_eps", "related")
 
-    header = response.get("header", {}).get("musicImmersiveHeaderRenderer", {})
+def _parse_artist_header(header_raw: dict):
+    header = header_raw.get("musicImmersiveHeaderRenderer", {})
     name = header.get("title", {}).get("runs", [{}])[0].get("text")
     desc = "".join(run.get("text", "") for run in header.get("description", {}).get("runs", []))
     thumbs = (
@@ -340,61 +860,299 @@ def _artist_payload(artist_id: str):
         .get("thumbnails", [])
     )
     listeners = header.get("monthlyListenerCount", {}).get("runs", [{}])[0].get("text")
-
-    contents = (
-        response.get("contents", {})
-        .get("singleColumnBrowseResultsRenderer", {})
-        .get("tabs", [])[0]
-        .get("tabRenderer", {})
-        .get("content", {})
-        .get("sectionListRenderer", {})
-        .get("contents", [])
-    )
-
     return {
-        "header": {
-            "name": name,
-            "description": desc,
-            "thumbnails": thumbs,
-            "monthlyListeners": listeners,
-        },
-        "topSongs": parse_top_songs(contents[0]) if len(contents) > 0 else [],
-        "albums": parse_albums(contents[1]) if len(contents) > 1 else [],
-        "singles_eps": parse_singles_eps(contents[2]) if len(contents) > 2 else [],
-        "related": parse_related_artists(contents[7]) if len(contents) > 7 else [],
+        "name": name,
+        "description": desc,
+        "thumbnails": thumbs,
+        "monthlyListeners": listeners,
     }
 
+_SECTION_PARSERS = {
+    "header": _parse_artist_header,
+    "topSongs": parse_top_songs,
+    "albums": parse_albums,
+    "singles_eps": parse_singles_eps,
+    "related": parse_related_artists,
+}
+
+def _artist_raw_sections(artist_id: str) -> dict:
+    """Browse de la página del artista: secciones crudas indexadas por nombre (sin cache)"""
+    with negative_cache.guard("artist", artist_id):
+        response = innertube_service.browse(artist_id)
+        if not response.get("header") and not response.get("contents"):
+            raise negative_cache.NotFound("artist_not_found")
+    with phase_timer("parse"):
+        tabs = (
+            response.get("contents", {})
+            .get("singleColumnBrowseResultsRenderer", {})
+            .get("tabs", [])
+        )
+        contents = (
+            tabs[0].get("tabRenderer", {})
+            .get("content", {})
+            .get("sectionListRenderer", {})
+            .get("contents", [])
+        ) if tabs else []
+        return {"header": response.get("header", {}), **index_artist_sections(contents)}
+
+def _section_key(artist_id: str, name: str) -> str:
+    return f"artist:{artist_id}:s:{name}"
+
+def _artist_sections(artist_id: str) -> dict:
+    """
+    Un browse parsea TODAS las secciones ({clave: sección parseada}): pedir
+    otra más tarde sale del cache, sin guardar la respuesta cruda.
+    """
+    raw = _artist_raw_sections(artist_id)
+    with phase_timer("parse"):
+        parsed = {name: parser(raw[name]) if name in raw else [] for name, parser in _SECTION_PARSERS.items()}
+    catalog.record_artist(artist_id, parsed)
+    return {_section_key(artist_id, name): part for name, part in parsed.items()}
+
+def _artist_response(request: Request, artist_id: str, sections: str | None):
+    wanted = ARTIST_SECTIONS
+    if sections:
+        wanted = tuple(dict.fromkeys(s.strip() for s in sections.split(",") if s.strip()))
+        unknown = [s for s in wanted if s not in ARTIST_SECTIONS]
+        if unknown or not wanted:
+            return JSONResponse(status_code=400, content={"error": "invalid sections", "unknown": unknown,
+                                                          "allowed": list(ARTIST_SECTIONS)})
+    # Sólo se cachean las secciones parseadas; la respuesta se arma con ellas
+    keys = {name: _section_key(artist_id, name) for name in wanted}
+    return composed_or_fill(request, keys, lambda: _artist_sections(artist_id), CACHE_TTL)
+
+_SECTIONS_DOC = "Secciones separadas por coma: " + ", ".join(ARTIST_SECTIONS) + " (default: todas)"
+
 @router.get("/artist")
-def get_artist_q(id: str = Query(...)):
-    return _artist_payload(id)
+def get_artist_q(request: Request, id: str = Query(...), sections: str | None = Query(None, description=_SECTIONS_DOC)):
+    return _artist_response(request, id, sections)
 
 @router.get("/artist/{id}")
-def get_artist_p(id: str = Path(...)):
-    return _artist_payload(id)
+def get_artist_p(request: Request, id: str = Path(...), sections: str | None = Query(None, description=_SECTIONS_DOC)):
+    return _artist_response(request, id, sections)
+
+# --- DISCOGRAPHY ---
+
+DISCOGRAPHY_FANOUT = int(os.getenv("DISCOGRAPHY_FANOUT", "4"))  # browses en paralelo por request
+DISCOGRAPHY_MAX_PAGES = 20  # continuaciones por grid (corta loops raros)
+# Con álbumes que fallaron (timeout, error puntual) la discografía está
+# incompleta: se cachea poco para reintentar pronto (ver _discography_ttl)
+DISCOGRAPHY_PARTIAL_TTL = int(os.getenv("DISCOGRAPHY_PARTIAL_TTL", "30"))
+_DISCOGRAPHY_KINDS = (("albums", parse_albums), ("singles_eps", parse_singles_eps))
+
+class _FanOut:
+    """Pool acotado + cola de eventos: los resultados salen a medida que llegan"""
+    _TASK_DONE = object()
+
+    def __init__(self, workers: int):
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="discography")
+        self.events: queue.Queue = queue.Queue()
+        self.pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        with self._lock:
+            self.pending += 1
+        ctx = contextvars.copy_context()  # timers del request también en los workers
+        self.pool.submit(ctx.run, self._run, fn, *args)
+
+    def _run(self, fn, *args):
+        try:
+            fn(*args)
+        except upstream_governor.UpstreamUnavailable as e:
+            self.events.put({"type": "error", "detail": str(e), "retryAfter": e.retry_after})
+        except Exception as e:
+            self.events.put({"type": "error", "detail": str(e)})
+        finally:
+            self.events.put(self._TASK_DONE)
+
+    def __iter__(self):
+        while True:
+            with self._lock:
+                if self.pending == 0:
+                    return
+            ev = self.events.get()
+            if ev is self._TASK_DONE:
+                with self._lock:
+                    self.pending -= 1
+                continue
+            yield ev
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+def _discography_events(artist_id: str, with_tracks: bool, raw: dict | None = None):
+    """
+    Eventos {"type": "albums"|"singles_eps", "items": [...]} por página y, con
+    with_tracks, {"type": "tracks", "albumId", "tracks"} por álbum. Cada grid
+    sigue sus continuaciones en orden; grids y álbumes van en paralelo.
+    raw: la página del artista si ya se bajó (si no, hace el browse).
+    """
+    if raw is None:
+        raw = _artist_raw_sections(artist_id)
+    fan = _FanOut(DISCOGRAPHY_FANOUT)
+    seen: set[str] = set()
+    seen_lock = threading.Lock()
+
+    def publish(kind: str, releases: list):
+        with seen_lock:
+            fresh = [r for r in releases if r.get("id") and r["id"] not in seen]
+            seen.update(r["id"] for r in fresh)
+        if not fresh:
+            return
+        fan.events.put({"type": kind, "items": fresh})
+        if with_tracks:
+            for r in fresh:
+                fan.submit(album_tracks, r["id"])
+
+    def album_tracks(album_id: str):
+        key = f"album:{album_id}"
+        payload = get_cached(key)
+        if payload is None:
+            payload = _album_payload(album_id)
+            cache_fill(key, payload, CACHE_TTL)
+        fan.events.put({"type": "tracks", "albumId": album_id, "tracks": payload.get("tracks", [])})
+
+    def follow_grid(kind: str, endpoint: dict):
+        response = innertube_service.browse(endpoint["browseId"], params=endpoint.get("params"))
+        for _ in range(DISCOGRAPHY_MAX_PAGES):
+            with phase_timer("parse"):
+                items, continuation = parse_release_grid(response)
+                releases = parse_release_items(items)
+            publish(kind, releases)
+            if not continuation:
+                return
+            response = innertube_service.browse(continuation=continuation)
+
+    try:
+        for kind, parse_carousel in _DISCOGRAPHY_KINDS:
+            section = raw.get(kind)
+            if section is None:
+                continue
+            endpoint = more_endpoint(section)
+            if endpoint:
+                fan.submit(follow_grid, kind, endpoint)
+            else:
+                # Sin "Más": el carrusel ya es la discografía completa
+                publish(kind, parse_carousel(section))
+        yield from fan
+    finally:
+        fan.close()
+
+def _assemble_discography(artist_id: str, events) -> dict:
+    payload = {"artistId": artist_id, "albums": [], "singles_eps": [], "errors": []}
+    tracks = {}
+    for ev in events:
+        if ev["type"] == "tracks":
+            tracks[ev["albumId"]] = ev["tracks"]
+        elif ev["type"] == "error":
+            payload["errors"].append(ev)
+        else:
+            payload[ev["type"]].extend(ev["items"])
+    if tracks:
+        for release in payload["albums"] + payload["singles_eps"]:
+            release["tracks"] = tracks.get(release["id"], [])
+    return payload
+
+def _discography_payload(artist_id: str, with_tracks: bool) -> dict:
+    payload = _assemble_discography(artist_id, _discography_events(artist_id, with_tracks))
+    throttled = [e for e in payload["errors"] if "retryAfter" in e]
+    if throttled:
+        # Discografía a medias por el gobernador: no se cachea, va por stale / 503
+        raise upstream_governor.UpstreamUnavailable(throttled[0]["detail"], throttled[0]["retryAfter"])
+    payload["errors"] = [e["detail"] for e in payload["errors"]]
+    catalog.record_artist(artist_id, {"albums": payload["albums"], "singles_eps": payload["singles_eps"]})
+    return payload
+
+def _discography_ttl(payload: dict) -> int:
+    """Discografía completa: CACHE_TTL; con errores: DISCOGRAPHY_PARTIAL_TTL"""
+    return DISCOGRAPHY_PARTIAL_TTL if payload["errors"] else CACHE_TTL
+
+def _stream_discography(artist_id: str, with_tracks: bool, key: str, raw: dict):
+    """NDJSON: una línea por evento; al final guarda el resultado armado en cache"""
+    events = []
+    for ev in _discography_events(artist_id, with_tracks, raw):
+        events.append(ev)
+        yield json.dumps(ev, ensure_ascii=False, separators=(",", ":")) + "\n"
+    payload = _assemble_discography(artist_id, events)
+    if not payload["errors"]:
+        cache_fill(key, payload, CACHE_TTL)
+        catalog.record_artist(artist_id, {"albums": payload["albums"], "singles_eps": payload["singles_eps"]})
+    yield json.dumps({"type": "done", "albums": len(payload["albums"]),
+                      "singles_eps": len(payload["singles_eps"])}) + "\n"
+
+@router.get("/artist/{id}/discography")
+def get_artist_discography(
+    request: Request,
+    id: str = Path(...),
+    tracks: int = Query(0, description="Si 1, incluye el listado de tracks de cada álbum"),
+    stream: int = Query(0, description="Si 1, NDJSON con resultados parciales a medida que llegan"),
+):
+    """
+    Discografía completa: sigue el "Más" de álbumes y singles y sus
+    continuaciones en paralelo (DISCOGRAPHY_FANOUT). Cacheada como un todo.
+    """
+    key = f"artist:{id}:discography{':tracks' if tracks else ''}"
+    if not stream:
+        return cached_or_fill(request, key, lambda: _discography_payload(id, bool(tracks)), _discography_ttl)
+
+    cached = get_cached(key)
+    if cached is not None:
+        lines = [json.dumps({"type": kind, "items": cached[kind]}, ensure_ascii=False) + "\n"
+                 for kind in ("albums", "singles_eps")]
+        lines.append(json.dumps({"type": "done", "albums": len(cached["albums"]),
+                                 "singles_eps": len(cached["singles_eps"])}) + "\n")
+        return StreamingResponse(iter(lines), media_type="application/x-ndjson")
+    try:
+        # El browse de la página del artista va antes de arrancar el stream
+        # para poder responder 503 si el upstream no está disponible
+        raw = _artist_raw_sections(id)
+    except upstream_governor.UpstreamUnavailable as e:
+        return upstream_unavailable_response(e, id=id)
+    except negative_cache.NegativeCached as e:
+        return negative_cached_response(e)
+    return StreamingResponse(_stream_discography(id, bool(tracks), key, raw), media_type="application/x-ndjson")
 
 # --- ALBUM ---
 
 def _album_payload(album_id: str):
-    yt = InnerTube("WEB_REMIX")
-    response = yt.browse(album_id)
-    payload = {
-        "id": album_id,
-        "info": parse_album_info(response),
-        "tracks": parse_album_tracks(response),
-    }
-    set_cached(f"album:{album_id}", payload, 30 * 60)
+    with negative_cache.guard("album", album_id):
+        response = innertube_service.browse(album_id)
+        with phase_timer("parse"):
+            payload = {
+                "id": album_id,
+                "info": parse_album_info(response),
+                "tracks": parse_album_tracks(response),
+            }
+        if not payload["info"] and not payload["tracks"]:
+            raise negative_cache.NotFound("album_not_found")
+    catalog.record_album(album_id, payload)
     return payload
 
 @router.get("/album")
-def get_album_q(id: str = Query(...)):
-    cached = get_cached(f"album:{id}")
-    if cached:
-        return cached
-    return _album_payload(id)
+def get_album_q(request: Request, id: str = Query(...)):
+    return cached_or_fill(request, f"album:{id}", lambda: _album_payload(id), CACHE_TTL)
 
 @router.get("/album/{id}")
-def get_album_p(id: str = Path(...)):
-    cached = get_cached(f"album:{id}")
-    if cached:
-        return cached
-    return _album_payload(id)
\ No newline at end of file
+def get_album_p(request: Request, id: str = Path(...)):
+    return cached_or_fill(request, f"album:{id}", lambda: _album_payload(id), CACHE_TTL)
+
+# --- CATALOG (local, sin YouTube) ---
+
+def _catalog_json(request: Request, data: dict | None, kind: str, id: str):
+    if data is None:
+        return JSONResponse(status_code=404, content={"error": "not_in_catalog", "kind": kind, "id": id})
+    return conditional_json(request, data)
+
+@router.get("/track/{videoId}")
+def get_track(request: Request, videoId: str = Path(...)):
+    """Metadata de un track desde el catálogo local (lo que ya vimos en search/artist/album)"""
+    return _catalog_json(request, catalog.get_track(videoId), "track", videoId)
+
+@router.get("/catalog/album/{id}")
+def get_catalog_album(request: Request, id: str = Path(...)):
+    return _catalog_json(request, catalog.get_album(id), "album", id)
+
+@router.get("/catalog/artist/{id}")
+def get_catalog_artist(request: Request, id: str = Path(...)):
+    return _catalog_json(request, catalog.get_artist(id), "artist", id)
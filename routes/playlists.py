@@ -1,11 +1,20 @@
 # routes/playlists.py
-from fastapi import APIRouter, Request, Body
-from services.supabase_service import db_as_user, supabase_service
-from services.cache_service import get_cached, set_cached, del_cached, del_many
+from fastapi import APIRouter, Request, Body, Query
+from services import catalog
+from services.supabase_service import db_as_user, get_supabase_service, execute
+from services.cache_service import get_cached, set_cached
+from services.http_cache import cache_fill, cached_json, conditional_json, fill_response
+from services.cache_versions import bump_version, versioned_key
 from services.jwt_utils import decode_jwt
+import os
 
 router = APIRouter(tags=["playlists"])
 
+# Las claves llevan la generación del owner / playlist (services/cache_versions),
+# así una escritura invalida en todos los workers y el TTL puede ser largo.
+PLAYLIST_CACHE_TTL = int(os.getenv("PLAYLIST_CACHE_TTL", 6 * 60 * 60))  # 6 h
+OWNER_CACHE_TTL = 24 * 60 * 60  # el owner de una playlist no cambia
+
 def _get_user_id(request: Request) -> str | None:
     # 1) si tu middleware ya puso user, usalo
     user = getattr(request.state, "user", None)
@@ -17,6 +26,43 @@ def _get_user_id(request: Request) -> str | None:
     claims = decode_jwt(token) or {}
     return claims.get("sub")
 
+def _detail_key(playlist_id: str, viewer_id: str | None) -> str | None:
+    """
+    El detalle se cachea por quien lo ve: el hit se sirve sin la query con RLS,
+    así que una clave compartida le mostraría playlists privadas a cualquiera
+    que tenga el id. La versión sigue siendo la de la playlist.
+    """
+    return versioned_key(f"pl:detail:{playlist_id}:{viewer_id or 'anon'}", f"pl:{playlist_id}")
+
+def _playlist_owner(db, playlist_id: str) -> str | None:
+    """owner_id de la playlist (cacheado; lo necesitamos para invalidar su listado)"""
+    cache_key = f"pl:owner:{playlist_id}"
+    owner_id = get_cached(cache_key)
+    if owner_id:
+        return owner_id
+    try:
+        resp = execute(
+            db.table("playlists").select("owner_id").eq("id", playlist_id).single(), "playlists.owner"
+        )
+        owner_id = (resp.data or {}).get("owner_id")
+    except Exception:
+        return None
+    if owner_id:
+        set_cached(cache_key, owner_id, OWNER_CACHE_TTL)
+    return owner_id
+
+def _invalidate_playlist(db, playlist_id: str, *user_ids: str | None):
+    """
+    Incrementa la versión del detalle y del listado del owner (y de quien
+    escribió, si es otro colaborador). No depende de que el JWT traiga 'sub'.
+    """
+    scopes = {f"pl:{playlist_id}"}
+    owner_id = _playlist_owner(db, playlist_id)
+    for uid in (owner_id, *user_ids):
+        if uid:
+            scopes.add(f"owner:{uid}")
+    bump_version(*scopes)
+
 # POST /api/playlists
 @router.post("/")
 async def create_playlist(request: Request, body: dict = Body(...)):
@@ -35,20 +81,41 @@ async def create_playlist(request: Request, body: dict = Body(...)):
         return {"error": "unauthorized"}
 
     try:
-        resp = db.table("playlists").insert({
+        resp = execute(db.table("playlists").insert({
             "title": title,
             "description": description,
             "is_public": is_public,
             "owner_id": owner_id,
-        }).execute()
-        del_cached(f"pl:list:{owner_id}")
-        return resp.data[0]
+        }), "playlists.insert")
+        playlist = resp.data[0]
+        bump_version(f"owner:{owner_id}")
+
+        # Write-through: la playlist recién creada ya queda lista para el detalle
+        set_cached(f"pl:owner:{playlist['id']}", owner_id, OWNER_CACHE_TTL)
+        detail_key = _detail_key(playlist["id"], owner_id)
+        if detail_key:
+            cache_fill(detail_key, {**playlist, "tracks": []}, PLAYLIST_CACHE_TTL)
+        return playlist
     except Exception as e:
         return {"error": "db_error", "detail": str(e)}
 
 # GET /api/playlists
+# Por defecto, el formato de siempre: todas las playlists con todos sus tracks.
+# summary=1 devuelve un resumen liviano: cantidad de tracks + las primeras
+# COVER_TRACKS portadas, resuelto por PostgREST (count + limit sobre el embed),
+# paginado (SUMMARY_PAGE_DEFAULT por página si no viene limit), así el home no
+# baja todos los tracks de cada playlist.
+COVER_TRACKS = 4
+SUMMARY_PAGE_DEFAULT = 50
+PLAYLISTS_PAGE_MAX = 100
+
 @router.get("/")
-async def get_playlists(request: Request):
+async def get_playlists(
+    request: Request,
+    summary: int = Query(0, description="Si 1, track_count + primeras portadas en vez de todos los tracks"),
+    limit: int | None = Query(None, ge=1, le=PLAYLISTS_PAGE_MAX, description="Sin limit: todas (en summary, 50); offset sólo aplica con limit"),
+    offset: int = Query(0, ge=0),
+):
     jwt = request.headers.get("Authorization", "").replace("Bearer ", "")
     db = db_as_user(jwt)
 
@@ -56,28 +123,54 @@ async def get_playlists(request: Request):
     if not owner_id:
         return {"error": "unauthorized"}
 
-    cache_key = f"pl:list:{owner_id}"
-    cached = get_cached(cache_key)
-    if cached:
+    mode = "summary" if summary == 1 else "full"
+    if limit is None and mode == "summary":
+        limit = SUMMARY_PAGE_DEFAULT
+    if limit is None:
+        offset = 0  # sin limit no hay paginado: offset se ignora
+    cache_key = versioned_key(f"pl:list:{owner_id}:{mode}:{offset}:{limit}", f"owner:{owner_id}")
+    cached = cached_json(request, cache_key) if cache_key else None
+    if cached is not None:
         return cached
 
     try:
-        resp = db.table("playlists").select(
-            "id,title,description,is_public,created_at,"
-            "playlist_tracks(position,tracks(thumbnail_url))"
-        ).eq("owner_id", owner_id) \
-         .order("created_at", desc=True) \
-         .execute()
+        if mode == "full":
+            query = db.table("playlists").select(
+                "id,title,description,is_public,created_at,"
+                "playlist_tracks(position,tracks(thumbnail_url))"
+            )
+        else:
+            # Dos embeds de la misma tabla con alias: uno sólo cuenta filas,
+            # el otro trae las primeras portadas ordenadas y limitadas en la DB
+            query = db.table("playlists").select(
+                "id,title,description,is_public,created_at,"
+                "track_count:playlist_tracks(count),"
+                "playlist_tracks(position,tracks(thumbnail_url))"
+            ) \
+                .order("position", foreign_table="playlist_tracks") \
+                .limit(COVER_TRACKS, foreign_table="playlist_tracks")
+
+        query = query.eq("owner_id", owner_id).order("created_at", desc=True)
+        if limit is not None:
+            query = query.range(offset, offset + limit - 1)
+        resp = execute(query, f"playlists.list_{mode}")
 
         payload = resp.data or []
 
-        # 🔀 Ordenar manualmente los tracks por posición
-        for pl in payload:
-            if "playlist_tracks" in pl and pl["playlist_tracks"]:
-                pl["playlist_tracks"].sort(key=lambda t: t.get("position") or 0)
+        if mode == "full":
+            # 🔀 Ordenar manualmente los tracks por posición
+            for pl in payload:
+                if "playlist_tracks" in pl and pl["playlist_tracks"]:
+                    pl["playlist_tracks"].sort(key=lambda t: t.get("position") or 0)
+        else:
+            # PostgREST devuelve el count como [{"count": N}]
+            for pl in payload:
+                counts = pl.get("track_count") or [{}]
+                pl["track_count"] = counts[0].get("count", 0)
 
-        set_cached(cache_key, payload, 30)
-        return payload
+        if cache_key is None:  # versión ilegible: sin cache
+            return conditional_json(request, payload)
+        return fill_response(request, cache_key, payload, PLAYLIST_CACHE_TTL)
     except Exception as e:
         return {"error": "db_error", "detail": str(e)}
 
@@ -87,18 +180,22 @@ async def get_playlist_by_id(request: Request, playlist_id: str):
     jwt = request.headers.get("Authorization", "").replace("Bearer ", "")
     db = db_as_user(jwt)
 
-    cache_key = f"pl:detail:{playlist_id}"
-    cached = get_cached(cache_key)
-    if cached:
+    cache_key = _detail_key(playlist_id, _get_user_id(request))
+    cached = cached_json(request, cache_key) if cache_key else None
+    if cached is not None:
         return cached
 
     try:
-        playlist_resp = db.table("playlists").select("*").eq("id", playlist_id).single().execute()
-        ptracks_resp = db.table("playlist_tracks") \
-            .select("position,added_at,tracks(*)") \
-            .eq("playlist_id", playlist_id) \
-            .order("position") \
-            .execute()
+        playlist_resp = execute(
+            db.table("playlists").select("*").eq("id", playlist_id).single(), "playlists.detail"
+        )
+        ptracks_resp = execute(
+            db.table("playlist_tracks")
+            .select("position,added_at,tracks(*)")
+            .eq("playlist_id", playlist_id)
+            .order("position"),
+            "playlist_tracks.list",
+        )
 
         payload = {
             **(playlist_resp.data or {}),
@@ -108,14 +205,45 @@ async def get_playlist_by_id(request: Request, playlist_id: str):
             ]
         }
 
-        set_cached(cache_key, payload, 30)
-        return payload
+        if payload.get("owner_id"):
+            set_cached(f"pl:owner:{playlist_id}", payload["owner_id"], OWNER_CACHE_TTL)
+        if cache_key is None:  # versión ilegible: sin cache
+            return conditional_json(request, payload)
+        return fill_response(request, cache_key, payload, PLAYLIST_CACHE_TTL)
     except Exception as e:
         return {"error": "db_error", "detail": str(e)}
 
+def _track_metadata(track_id: str, body: dict) -> dict:
+    row = {
+        "track_id": track_id,
+        "title": body.get("title"),
+        "artist": body.get("artist"),
+        "artist_id": body.get("artist_id"),
+        "album": body.get("album"),
+        "duration_ms": body.get("duration_ms"),
+        "thumbnail_url": body.get("thumbnail_url"),
+        "extra": body.get("extra"),
+    }
+    known = catalog.get_track(track_id)
+    if not known:
+        return row
+    artist = (known["artists"] or [{}])[0]
+    from_catalog = {
+        "title": known["title"],
+        "artist": ", ".join(a["name"] for a in known["artists"] if a.get("name")) or None,
+        "artist_id": artist.get("id"),
+        "album": known["album"],
+        "duration_ms": known["durationSeconds"] * 1000 if known["durationSeconds"] else None,
+        "thumbnail_url": known["thumbnail"],
+    }
+    row.update({k: v for k, v in from_catalog.items() if v is not None})
+    return row
+
 # POST /api/playlists/:id/tracks
+# def (no async): _track_metadata lee el catálogo SQLite y los execute() de
+# supabase son bloqueantes; FastAPI corre el handler en el threadpool
 @router.post("/{playlist_id}/tracks")
-async def add_track_to_playlist(request: Request, playlist_id: str, body: dict = Body(...)):
+def add_track_to_playlist(request: Request, playlist_id: str, body: dict = Body(...)):
     jwt = request.headers.get("Authorization", "").replace("Bearer ", "")
     db = db_as_user(jwt)
 
@@ -128,35 +256,31 @@ async def add_track_to_playlist(request: Request, playlist_id: str, body: dict =
         return {"error": "unauthorized"}
 
     try:
-        # Upsert track (service role)
-        track_resp = supabase_service.table("tracks").upsert({
-            "track_id": track_id,
-            "title": body.get("title"),
-            "artist": body.get("artist"),
-            "artist_id": body.get("artist_id"),
-            "album": body.get("album"),
-            "duration_ms": body.get("duration_ms"),
-            "thumbnail_url": body.get("thumbnail_url"),
-            "extra": body.get("extra"),
-        }, on_conflict="track_id").execute()
+        # Upsert track (service role); la metadata sale del catálogo local si
+        # lo conocemos, el body del cliente sólo completa lo que falte
+        track_resp = execute(get_supabase_service().table("tracks").upsert(
+            _track_metadata(track_id, body), on_conflict="track_id"
+        ), "tracks.upsert")
 
         # Calcular posición
         pos = body.get("position")
         if pos is None:
-            count_resp = db.table("playlist_tracks") \
-                .select("*", count="exact", head=True) \
-                .eq("playlist_id", playlist_id) \
-                .execute()
+            count_resp = execute(
+                db.table("playlist_tracks")
+                .select("*", count="exact", head=True)
+                .eq("playlist_id", playlist_id),
+                "playlist_tracks.count",
+            )
             pos = (count_resp.count or 0) + 1
 
-        link_resp = db.table("playlist_tracks").insert({
+        link_resp = execute(db.table("playlist_tracks").insert({
             "playlist_id": playlist_id,
             "track_id": track_resp.data[0]["id"],
             "position": pos,
             "added_by": added_by,
-        }).execute()
+        }), "playlist_tracks.insert")
 
-        del_many([f"pl:list:{added_by}", f"pl:detail:{playlist_id}"])
+        _invalidate_playlist(db, playlist_id, added_by)
         return {"ok": True, "track": track_resp.data[0], "link": link_resp.data[0]}
     except Exception as e:
         return {"error": "db_error", "detail": str(e)}
@@ -168,12 +292,13 @@ async def remove_track_from_playlist(request: Request, playlist_id: str, track_i
     db = db_as_user(jwt)
 
     try:
-        db.table("playlist_tracks") \
-            .delete().eq("playlist_id", playlist_id).eq("track_id", track_id).execute()
+        execute(
+            db.table("playlist_tracks")
+            .delete().eq("playlist_id", playlist_id).eq("track_id", track_id),
+            "playlist_tracks.delete",
+        )
 
-        owner_id = _get_user_id(request)
-        if owner_id:
-            del_many([f"pl:list:{owner_id}", f"pl:detail:{playlist_id}"])
+        _invalidate_playlist(db, playlist_id, _get_user_id(request))
 
         return {"ok": True}
     except Exception as e:
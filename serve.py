@@ -0,0 +1,102 @@
+# serve.py
+"""
+Entry point de producción (main.py queda para desarrollo, con reload).
+
+    python serve.py
+
+- Workers: WEB_CONCURRENCY o, si no está, los CPUs disponibles para el proceso.
+- uvloop / httptools si están instalados (pip install uvloop httptools); si
+  no, asyncio / h11.
+- Keep-alive más largo que el idle timeout del balanceador (KEEP_ALIVE, 75 s
+  por defecto; los LB suelen cortar a los 60) y backlog de accept (BACKLOG).
+- Shutdown (SIGTERM / deploy): deja de aceptar conexiones, cierra las
+  keep-alive ociosas y espera hasta DRAIN_TIMEOUT segundos a que terminen los
+  requests en curso, /play incluido. Los streams que sigan abiertos después se
+  cortan; el cliente reanuda con Range. Recién después corre el shutdown de
+  la app (snapshot de caches).
+
+Estado por worker: cada worker es un proceso con su propia copia de
+- cache_service (metadata), el cache de URLs de audio y los pools de yt-dlp
+- up-next, buckets / breakers de services/upstream_governor y PO tokens en memoria
+- las métricas de /metrics (cada scrape ve sólo el worker que lo atendió)
+Lo compartido entre workers del host va por SQLite (versiones de cache para
+invalidar, catálogo, PO tokens, snapshot). Un request puede no aprovechar lo
+que otro worker ya resolvió: con N workers el hit ratio del primer minuto
+baja, y por eso el snapshot restaura en todos.
+"""
+import logging
+import os
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+PORT = int(os.getenv("PORT", "3000"))
+HOST = os.getenv("HOST", "0.0.0.0")
+KEEP_ALIVE = int(os.getenv("KEEP_ALIVE", "75"))
+BACKLOG = int(os.getenv("BACKLOG", "2048"))
+DRAIN_TIMEOUT = int(os.getenv("DRAIN_TIMEOUT", "30"))
+# Reciclar workers cada N requests (0 = nunca): acota fragmentación de memoria
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "0"))
+
+logger = logging.getLogger("uvicorn.error")
+
+def _workers() -> int:
+    if os.getenv("WEB_CONCURRENCY"):
+        return max(1, int(os.environ["WEB_CONCURRENCY"]))
+    try:
+        return max(1, len(os.sched_getaffinity(0)))  # respeta cpusets / taskset
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def _available(module: str) -> bool:
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn.Server que loguea cuántos streams de audio quedan al apagar"""
+
+    async def shutdown(self, sockets=None):
+        from routes.music import ACTIVE_STREAMS
+
+        streams = int(ACTIVE_STREAMS.value())
+        if streams:
+            logger.info(f"⏳ Drenando {streams} stream(s) de /play (hasta {DRAIN_TIMEOUT}s)")
+        await super().shutdown(sockets=sockets)
+        left = int(ACTIVE_STREAMS.value())
+        if left:
+            logger.warning(f"✂️ {left} stream(s) cortados al vencer DRAIN_TIMEOUT")
+        elif streams:
+            logger.info("✅ Streams drenados")
+
+def main():
+    os.environ.setdefault("NODE_ENV", "production")
+    loop = "uvloop" if _available("uvloop") else "asyncio"
+    http = "httptools" if _available("httptools") else "h11"
+    config = uvicorn.Config(
+        "app:app",
+        host=HOST,
+        port=PORT,
+        workers=_workers(),
+        loop=loop,
+        http=http,
+        backlog=BACKLOG,
+        timeout_keep_alive=KEEP_ALIVE,
+        timeout_graceful_shutdown=DRAIN_TIMEOUT,
+        limit_max_requests=MAX_REQUESTS or None,
+        proxy_headers=True,  # confía en X-Forwarded-For de FORWARDED_ALLOW_IPS (default 127.0.0.1)
+        access_log=False,  # tenemos el nuestro (middlewares/access_log.py)
+    )
+    logger.info(f"🚀 {config.workers} worker(s), loop={loop}, http={http}, keep-alive={KEEP_ALIVE}s")
+
+    server = DrainingServer(config=config)
+    if config.workers > 1:
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# services/access_log.py
+"""
+Access log estructurado (una línea JSON por request).
+
+El event loop sólo hace un put_nowait() de un dict; la serialización y la
+escritura a stdout ocurren en un thread aparte, en lotes. Si la cola se llena
+(stdout trabado) se descartan registros en vez de frenar requests.
+
+Variables de entorno:
+- ACCESS_LOG=0             -> deshabilita el log
+- ACCESS_LOG_SAMPLE=0.1    -> loguea ~10% de los requests normales
+- ACCESS_LOG_SLOW_MS=1000  -> requests más lentos que esto se loguean siempre
+  (los status >= 500 también se loguean siempre)
+"""
+import atexit
+import json
+import os
+import queue
+import random
+import sys
+import threading
+
+ENABLED = os.getenv("ACCESS_LOG", "1") != "0"
+SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE", "1"))
+SLOW_MS = float(os.getenv("ACCESS_LOG_SLOW_MS", "1000"))
+QUEUE_MAX = 10_000
+
+_queue: queue.Queue = queue.Queue(maxsize=QUEUE_MAX)
+_dropped = 0
+_writer: threading.Thread | None = None
+_lock = threading.Lock()
+_STOP = object()
+
+def should_log(status: int, latency_ms: float) -> bool:
+    if not ENABLED:
+        return False
+    if status >= 500 or latency_ms >= SLOW_MS:
+        return True
+    return SAMPLE_RATE >= 1 or random.random() < SAMPLE_RATE
+
+def emit(record: dict):
+    """Encola un registro (no bloquea nunca)"""
+    global _dropped
+    _ensure_writer()
+    try:
+        _queue.put_nowait(record)
+    except queue.Full:
+        _dropped += 1
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run, name="access-log", daemon=True)
+            _writer.start()
+            atexit.register(_stop)
+
+def _run():
+    global _dropped
+    out = sys.stdout
+    while True:
+        item = _queue.get()
+        batch = [item]
+        # Drenamos lo que ya esté encolado para hacer un solo write+flush
+        while len(batch) < 512:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        lines = []
+        stop = False
+        for rec in batch:
+            if rec is _STOP:
+                stop = True
+                continue
+            lines.append(json.dumps(rec, ensure_ascii=False, separators=(",", ":"), default=str))
+        if _dropped:
+            lines.append(json.dumps({"event": "access_log_dropped", "count": _dropped}))
+            _dropped = 0
+        try:
+            if lines:
+                out.write("\n".join(lines) + "\n")
+                out.flush()
+        except Exception:
+            pass
+        if stop:
+            return
+
+def _stop():
+    """Vacía la cola al salir del proceso"""
+    if _writer is None:
+        return
+    try:
+        _queue.put(_STOP, timeout=1)
+        _writer.join(timeout=2)
+    except Exception:
+        pass
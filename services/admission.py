@@ -0,0 +1,279 @@
+# services/admission.py
+"""
+Control de admisión por cliente para /play y /prefetch.
+
+/api/music es público, así que sin esto un solo cliente tirando /prefetch
+con 50 ids en paralelo se queda con toda la capacidad de extracción y los
+/play reales esperan detrás. Acá:
+
+- Extracciones (sólo los miss del cache de URLs): como mucho EXTRACT_SLOTS
+  en curso por worker y EXTRACT_PER_CLIENT por cliente. El resto espera en
+  una cola POR CLIENTE (ordenada por carril y llegada); cuando se libera un slot pasa la cabeza de la cola
+  que tenga (prioridad, extracciones en curso del cliente, llegada) más baja:
+  /play antes que /prefetch y, a igual carril, el cliente que menos está
+  usando. Así un cliente con 40 pedidos encolados no frena al que pide 1.
+- Streams proxyeados: como mucho STREAMS_PER_CLIENT en paralelo por cliente
+  (un stream dura minutos: no se encola, se rechaza).
+- Se rechaza temprano con AdmissionRejected (429 + Retry-After) si la cola
+  del cliente está llena o si la espera supera la del carril.
+
+Cliente = "sub" del JWT si viene Authorization (sin verificar: /api/music
+no pasa por supa_auth) + IP. Para que inventar subs no multiplique la cuota,
+la IP tiene además un tope de IP_FACTOR veces el del cliente (varios
+usuarios detrás del mismo NAT siguen entrando).
+
+El cliente del request se fija con client_scope() (ContextVar). El trabajo de
+fondo que dispara un cliente (up-next) corre con client_context() y se le
+cobra a ese cliente; el que no es de nadie (warm-up) no pasa por acá. Es por
+worker.
+"""
+import hashlib
+import itertools
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from services.jwt_utils import decode_jwt
+from services.metrics import Counter, Gauge, Histogram
+from services.upstream_governor import (
+    BACKGROUND, INTERACTIVE, PREFETCH, PRIORITY_NAMES, UpstreamUnavailable, current_priority,
+)
+
+ENABLED = os.getenv("ADMISSION", "1") != "0"
+EXTRACT_SLOTS = int(os.getenv("ADMISSION_EXTRACT_SLOTS", "8"))
+EXTRACT_PER_CLIENT = int(os.getenv("ADMISSION_EXTRACT_PER_CLIENT", "2"))
+QUEUE_PER_CLIENT = int(os.getenv("ADMISSION_QUEUE_PER_CLIENT", "6"))
+STREAMS_PER_CLIENT = int(os.getenv("ADMISSION_STREAMS_PER_CLIENT", "4"))
+IP_FACTOR = int(os.getenv("ADMISSION_IP_FACTOR", "4"))
+# Cuánto espera cada carril en la cola antes de 429 (s)
+MAX_WAIT = {INTERACTIVE: 10.0, PREFETCH: 3.0, BACKGROUND: 1.0}
+
+class AdmissionRejected(UpstreamUnavailable):
+    """El cliente superó su cuota (cola llena / espera vencida): 429"""
+
+def _label(client: str) -> str:
+    """Cliente anonimizado para stats (no exponemos IPs ni user ids)"""
+    kind, _, value = client.partition(":")
+    return f"{kind}:{hashlib.sha1(value.encode()).hexdigest()[:10]}"
+
+_client: ContextVar[tuple[str, str] | None] = ContextVar("admission_client", default=None)
+
+def client_of(request) -> tuple[str, str]:
+    """(cliente, ip) del request"""
+    ip = request.client.host if request.client else "unknown"
+    user = getattr(request.state, "user", None)
+    if isinstance(user, dict) and user.get("id"):
+        return f"user:{user['id']}", ip
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    sub = (decode_jwt(token) or {}).get("sub") if token else None
+    return (f"user:{sub}" if sub else f"ip:{ip}"), ip
+
+@contextmanager
+def client_context(client: tuple[str, str] | None):
+    """Las extracciones dentro del bloque cuentan para `client` (ej: un job en background)"""
+    token = _client.set(client)
+    try:
+        yield
+    finally:
+        _client.reset(token)
+
+def client_scope(request):
+    """Las extracciones dentro del bloque cuentan para el cliente del request"""
+    return client_context(client_of(request))
+
+# --- METRICS ---
+REJECTIONS = Counter("admission_rejections_total", "Requests rechazados por admisión (429)", ("kind", "reason"))
+QUEUE_WAIT = Histogram("admission_queue_wait_seconds", "Espera en la cola de extracción", ("lane",))
+
+class _Waiter:
+    __slots__ = ("client", "ip", "priority", "seq", "event", "granted")
+
+    def __init__(self, client: str, ip: str, priority: int, seq: int):
+        self.client = client
+        self.ip = ip
+        self.priority = priority
+        self.seq = seq
+        self.event = threading.Event()
+        self.granted = False
+
+class FairLimiter:
+    """Slots globales + tope por cliente / IP, con una cola por cliente (carril, llegada)"""
+
+    def __init__(self, slots: int, per_client: int, per_ip: int, queue_per_client: int):
+        self.slots = slots
+        self.per_client = per_client
+        self.per_ip = per_ip
+        self.queue_per_client = queue_per_client
+        self.inflight = 0
+        self._by_client: dict[str, int] = {}
+        self._by_ip: dict[str, int] = {}
+        self._queues: dict[str, deque[_Waiter]] = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._hold_avg = 1.0  # EWMA de cuánto dura un slot (para Retry-After)
+
+    def _eligible(self, client: str, ip: str) -> bool:
+        return (self.inflight < self.slots
+                and self._by_client.get(client, 0) < self.per_client
+                and self._by_ip.get(ip, 0) < self.per_ip)
+
+    def _grant(self, client: str, ip: str):
+        self.inflight += 1
+        self._by_client[client] = self._by_client.get(client, 0) + 1
+        self._by_ip[ip] = self._by_ip.get(ip, 0) + 1
+
+    def _dispatch(self):
+        """Con el lock tomado: reparte slots libres entre las cabezas de cola"""
+        while self.inflight < self.slots:
+            heads = [q[0] for q in self._queues.values() if q and self._eligible(q[0].client, q[0].ip)]
+            if not heads:
+                return
+            w = min(heads, key=lambda w: (w.priority, self._by_client.get(w.client, 0), w.seq))
+            self._queues[w.client].popleft()
+            if not self._queues[w.client]:
+                del self._queues[w.client]
+            self._grant(w.client, w.ip)
+            w.granted = True
+            w.event.set()
+
+    def _retry_after(self, depth: int) -> float:
+        return max(1.0, self._hold_avg * (depth + 1) / max(1, self.per_client))
+
+    def acquire(self, client: str, ip: str, priority: int):
+        lane = PRIORITY_NAMES.get(priority, str(priority))
+        with self._lock:
+            queue = self._queues.get(client)
+            if not queue and self._eligible(client, ip):
+                self._grant(client, ip)
+                QUEUE_WAIT.observe(0, lane=lane)
+                return
+            depth = len(queue or ())
+            if depth >= self.queue_per_client:
+                REJECTIONS.inc(kind="extract", reason="queue_full")
+                raise AdmissionRejected(f"demasiadas extracciones en cola ({depth})", self._retry_after(depth))
+            waiter = _Waiter(client, ip, priority, next(self._seq))
+            queue = self._queues.setdefault(client, deque())
+            queue.append(waiter)
+            if len(queue) > 1 and queue[-2].priority > priority:
+                # Un /play del cliente no espera detrás de sus propios prefetch
+                self._queues[client] = deque(sorted(queue, key=lambda w: (w.priority, w.seq)))
+
+        t0 = time.monotonic()
+        waiter.event.wait(MAX_WAIT.get(priority, 5.0))
+        with self._lock:
+            if not waiter.granted:
+                queue = self._queues.get(client)
+                if queue and waiter in queue:
+                    queue.remove(waiter)
+                    if not queue:
+                        del self._queues[client]
+                    # Sin este waiter puede haber otra cabeza de cola elegible
+                    self._dispatch()
+                REJECTIONS.inc(kind="extract", reason="timeout")
+                raise AdmissionRejected("sin capacidad de extracción", self._retry_after(len(queue or ())))
+        QUEUE_WAIT.observe(time.monotonic() - t0, lane=lane)
+
+    def release(self, client: str, ip: str, held: float):
+        with self._lock:
+            self.inflight -= 1
+            for counts, key in ((self._by_client, client), (self._by_ip, ip)):
+                counts[key] -= 1
+                if counts[key] <= 0:
+                    del counts[key]
+            self._hold_avg = 0.8 * self._hold_avg + 0.2 * held
+            self._dispatch()
+
+    def queued(self) -> int:
+        with self._lock:
+            return sum(len(q) for q in self._queues.values())
+
+    def stats(self, top: int = 10) -> dict:
+        with self._lock:
+            lanes: dict[str, int] = {}
+            for q in self._queues.values():
+                for w in q:
+                    name = PRIORITY_NAMES.get(w.priority, str(w.priority))
+                    lanes[name] = lanes.get(name, 0) + 1
+            deepest = sorted(((len(q), c) for c, q in self._queues.items()), reverse=True)[:top]
+            return {
+                "slots": self.slots,
+                "inflight": self.inflight,
+                "queued": lanes,
+                "clients_waiting": len(self._queues),
+                "top_queues": [{"client": _label(c), "depth": d, "inflight": self._by_client.get(c, 0)} for d, c in deepest],
+                "avg_hold_s": round(self._hold_avg, 3),
+            }
+
+_extractions = FairLimiter(EXTRACT_SLOTS, EXTRACT_PER_CLIENT, EXTRACT_PER_CLIENT * IP_FACTOR, QUEUE_PER_CLIENT)
+_streams: dict[str, int] = {}
+_streams_by_ip: dict[str, int] = {}
+_streams_lock = threading.Lock()
+
+Gauge("admission_extract_inflight", "Extracciones admitidas en curso", fn=lambda: _extractions.inflight)
+Gauge("admission_extract_queued", "Extracciones esperando en las colas por cliente", fn=lambda: _extractions.queued())
+Gauge("admission_streams_clients", "Clientes con streams proxyeados en curso", fn=lambda: len(_streams))
+
+@contextmanager
+def extraction():
+    """Slot de extracción para el cliente actual (sin cliente: no se limita)"""
+    client = _client.get()
+    if not ENABLED or client is None:
+        yield
+        return
+    _extractions.acquire(*client, current_priority())
+    t0 = time.monotonic()
+    try:
+        yield
+    finally:
+        _extractions.release(*client, time.monotonic() - t0)
+
+class StreamSlot:
+    """Lugar de un stream proxyeado; release() es idempotente"""
+
+    def __init__(self, client: tuple[str, str] | None):
+        self._client = client
+        self._released = client is None
+
+    def release(self):
+        with _streams_lock:
+            if self._released:
+                return
+            self._released = True
+            for counts, key in ((_streams, self._client[0]), (_streams_by_ip, self._client[1])):
+                counts[key] -= 1
+                if counts[key] <= 0:
+                    del counts[key]
+
+    def bind(self, body):
+        """Libera el slot cuando el body termina, se corta o se descarta sin empezar"""
+        def wrapper():
+            try:
+                yield from body
+            finally:
+                self.release()
+        gen = wrapper()
+        weakref.finalize(gen, self.release)
+        return gen
+
+def acquire_stream(request) -> StreamSlot:
+    """Reserva un stream para el cliente o AdmissionRejected (no se encola)"""
+    if not ENABLED:
+        return StreamSlot(None)
+    client, ip = client_of(request)
+    with _streams_lock:
+        if _streams.get(client, 0) >= STREAMS_PER_CLIENT or \
+                _streams_by_ip.get(ip, 0) >= STREAMS_PER_CLIENT * IP_FACTOR:
+            REJECTIONS.inc(kind="stream", reason="concurrency")
+            raise AdmissionRejected(f"demasiados streams en paralelo (máx {STREAMS_PER_CLIENT})", 5.0)
+        _streams[client] = _streams.get(client, 0) + 1
+        _streams_by_ip[ip] = _streams_by_ip.get(ip, 0) + 1
+    return StreamSlot((client, ip))
+
+def stats() -> dict:
+    with _streams_lock:
+        streams = {"clients": len(_streams), "active": sum(_streams.values()), "per_client_max": STREAMS_PER_CLIENT}
+    return {"enabled": ENABLED, "extract": _extractions.stats(), "streams": streams}
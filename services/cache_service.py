@@ -1,32 +1,226 @@
 # services/cache_service.py
+"""
+Cache de metadata en memoria (por worker).
+
+Representación compacta (CACHE_COMPACT=0 la desactiva): los payloads de
+search / artist / album son árboles de dicts chicos con strings muy
+repetidos, y en Python ocupan varias veces lo que pesan serializados. Así que
+las entradas con cuerpo HTTP ya codificado (ver http_cache.cache_fill) sólo
+guardan las variantes comprimidas, y el resto de los dict/list se guarda como
+JSON + zlib. El objeto Python se materializa recién cuando alguien lo pide
+(get_cached / entry.data): los hits HTTP mandan los bytes directo.
+
+Sin el JSON plano, cada hit identity (clientes sin gzip, respuestas
+compuestas de http_cache) hace un gunzip: por eso los cuerpos de hasta
+CACHE_COMPACT_IDENTITY_MAX bytes lo conservan (las secciones chicas de /artist,
+por ejemplo). bench/memory.py mide las dos cosas (identity_us).
+
+Ver bench/memory.py para entradas por GB antes / después.
+
+Limpieza: una entrada vencida se sigue guardando STALE_GRACE segundos más
+(http_cache la sirve como stale si el upstream no responde) y después se
+borra: al leerla, en un barrido cada SWEEP_INTERVAL segundos (lo dispara
+set_cached) o, si igual se pasa de MAX_ENTRIES, desalojando la menos usada
+(LRU). Así las claves huérfanas de services/cache_versions no se acumulan.
+"""
+import gzip
+import json
+import os
+import threading
 import time
+import zlib
+from services.metrics import CACHE_REQUESTS, Counter, Gauge
 
 _cache = {}
+_lock = threading.Lock()
+_last_sweep = 0.0
 DEFAULT_TTL = 30 * 60  # 30 minutos
+COMPACT = os.getenv("CACHE_COMPACT", "1") != "0"
+STALE_GRACE = int(os.getenv("CACHE_STALE_GRACE", "3600"))
+SWEEP_INTERVAL = int(os.getenv("CACHE_SWEEP_INTERVAL", "60"))
+MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "50000"))
+COMPACT_IDENTITY_MAX = int(os.getenv("CACHE_COMPACT_IDENTITY_MAX", "2048"))
+IMPORT_BATCH = 500  # import_entries toma el lock de a tandas: no frena a los requests
 
-def get_cached(key: str):
-    """Devuelve valor cacheado si no expiró"""
+Gauge("metadata_cache_entries", "Entradas en cache_service (incluye expiradas)", fn=lambda: len(_cache))
+EVICTIONS = Counter("metadata_cache_evictions_total", "Entradas borradas de cache_service", ("reason",))
+
+class CompactBodies:
+    """
+    Variantes de un cuerpo HTTP sin guardar el JSON plano cuando hay gzip
+    (salvo que sea chico: ver COMPACT_IDENTITY_MAX): soporta `enc in bodies`
+    y `bodies[enc]` como el dict de http_cache.
+    """
+    __slots__ = ("_bodies",)
+
+    def __init__(self, bodies: dict[str, bytes]):
+        if "gzip" in bodies and len(bodies["identity"]) > COMPACT_IDENTITY_MAX:
+            bodies = {enc: body for enc, body in bodies.items() if enc != "identity"}
+        self._bodies = bodies
+
+    def __contains__(self, encoding: str) -> bool:
+        return encoding == "identity" or encoding in self._bodies
+
+    def __getitem__(self, encoding: str) -> bytes:
+        if encoding == "identity" and "identity" not in self._bodies:
+            return gzip.decompress(self._bodies["gzip"])
+        return self._bodies[encoding]
+
+    def nbytes(self) -> int:
+        return sum(len(b) for b in self._bodies.values())
+
+class CacheEntry:
+    """Entrada del cache: data (materializada a pedido), ts, ttl, etag, bodies"""
+    __slots__ = ("ts", "ttl", "etag", "bodies", "_data", "_blob")
+
+    def __init__(self, data, ttl: float, etag: str | None = None, bodies=None, ts: float | None = None):
+        self.ts = time.time() if ts is None else ts
+        self.ttl = ttl
+        self.etag = etag
+        self.bodies = None
+        self._data = data
+        self._blob = None
+        if bodies is not None:
+            self.set_bodies(bodies)
+        elif COMPACT and isinstance(data, (dict, list)):
+            self._blob = zlib.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            self._data = None
+
+    def set_bodies(self, bodies: dict[str, bytes]):
+        """Guarda el cuerpo codificado; en modo compacto pasa a ser la única copia"""
+        if not COMPACT:
+            self.bodies = bodies
+            return
+        self.bodies = CompactBodies(bodies)
+        self._data = None
+        self._blob = None
+
+    @property
+    def data(self):
+        if self._blob is not None:
+            return json.loads(zlib.decompress(self._blob))
+        if self._data is None and self.bodies is not None:
+            return json.loads(self.bodies["identity"])
+        return self._data
+
+    @property
+    def expires_at(self) -> float:
+        return self.ts + self.ttl
+
+def _drop_if_dead(key: str, entry: CacheEntry | None, now: float) -> CacheEntry | None:
+    """Borra la entrada si ya pasó STALE_GRACE desde que venció"""
+    if entry is not None and now >= entry.expires_at + STALE_GRACE:
+        with _lock:
+            if _cache.get(key) is entry:
+                del _cache[key]
+                EVICTIONS.inc(reason="expired")
+        return None
+    return entry
+
+def get_entry(key: str) -> CacheEntry | None:
+    """Devuelve la entrada completa (data, ts, ttl, etag, bodies) si no expiró"""
     now = time.time()
-    if key in _cache:
-        entry = _cache[key]
-        if now - entry["ts"] < entry.get("ttl", DEFAULT_TTL):
-            return entry["data"]
+    entry = _drop_if_dead(key, _cache.get(key), now)
+    if entry and now < entry.expires_at:
+        CACHE_REQUESTS.inc(cache="metadata", result="hit")
+        with _lock:
+            if _cache.get(key) is entry:
+                _cache[key] = _cache.pop(key)  # al final: la más recientemente usada
+        return entry
+    CACHE_REQUESTS.inc(cache="metadata", result="miss")
     return None
 
-def set_cached(key: str, data, ttl: int = DEFAULT_TTL):
-    """Guarda valor en cache"""
-    _cache[key] = {"data": data, "ts": time.time(), "ttl": ttl}
+def get_stale(key: str) -> CacheEntry | None:
+    """Entrada aunque esté vencida, dentro de STALE_GRACE (para servir stale si el upstream no responde)"""
+    return _drop_if_dead(key, _cache.get(key), time.time())
+
+def sweep(now: float | None = None) -> int:
+    """Borra las entradas vencidas hace más de STALE_GRACE; devuelve cuántas"""
+    global _last_sweep
+    now = time.time() if now is None else now
+    with _lock:
+        _last_sweep = now
+        dead = [k for k, e in _cache.items() if now >= e.expires_at + STALE_GRACE]
+        for k in dead:
+            del _cache[k]
+    if dead:
+        EVICTIONS.inc(len(dead), reason="expired")
+    return len(dead)
+
+def _evict_lru():
+    """Con el cache por encima de MAX_ENTRIES, saca las menos usadas (el orden del dict)"""
+    with _lock:
+        evicted = 0
+        while len(_cache) > MAX_ENTRIES:
+            del _cache[next(iter(_cache))]
+            evicted += 1
+    if evicted:
+        EVICTIONS.inc(evicted, reason="lru")
+
+def get_cached(key: str):
+    """Devuelve valor cacheado si no expiró"""
+    entry = get_entry(key)
+    return entry.data if entry else None
+
+def set_cached(key: str, data, ttl: int = DEFAULT_TTL, etag: str | None = None,
+               bodies: dict[str, bytes] | None = None) -> CacheEntry:
+    """
+    Guarda valor en cache (opcionalmente con su ETag ya calculado y el cuerpo
+    HTTP ya codificado: {"identity"|"gzip"|"br": bytes}, ver http_cache)
+    """
+    entry = CacheEntry(data, ttl, etag, bodies)
+    with _lock:
+        _cache.pop(key, None)
+        _cache[key] = entry
+    if entry.ts - _last_sweep >= SWEEP_INTERVAL:
+        sweep(entry.ts)
+    if len(_cache) > MAX_ENTRIES:
+        _evict_lru()
+    return entry
 
 def del_cached(key: str):
     """Elimina una clave del cache"""
-    if key in _cache:
-        del _cache[key]
+    with _lock:
+        _cache.pop(key, None)
 
 def del_many(keys: list[str]):
     """Elimina varias claves del cache"""
-    for k in keys:
-        _cache.pop(k, None)
+    with _lock:
+        for k in keys:
+            _cache.pop(k, None)
 
 def clear_cache():
     """Vacía todo el cache"""
-    _cache.clear()
\ No newline at end of file
+    with _lock:
+        _cache.clear()
+
+def export_entries() -> list[dict]:
+    """Entradas vigentes con su vencimiento absoluto (para services/cache_snapshot)"""
+    now = time.time()
+    out = []
+    with _lock:
+        items = list(_cache.items())
+    for key, entry in items:
+        if entry.expires_at > now:
+            out.append({"key": key, "data": entry.data, "etag": entry.etag, "expires_at": entry.expires_at})
+    return out
+
+def import_entries(entries: list[dict]) -> int:
+    """Restaura entradas con el TTL que les quedaba; no pisa lo ya cacheado"""
+    now = time.time()
+    restored = 0
+    for i in range(0, len(entries), IMPORT_BATCH):
+        # Las entradas se arman (y comprimen) fuera del lock; adentro sólo el
+        # chequeo + insert, así no compite con sweep() ni con los requests
+        batch = [
+            (e["key"], CacheEntry(e["data"], e["expires_at"] - now, e.get("etag"), ts=now))
+            for e in entries[i:i + IMPORT_BATCH]
+            if e["expires_at"] > now and e["key"] not in _cache
+        ]
+        with _lock:
+            for key, entry in batch:
+                if key not in _cache:
+                    _cache[key] = entry
+                    restored += 1
+    _evict_lru()
+    return restored
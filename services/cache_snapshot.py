@@ -0,0 +1,118 @@
+# services/cache_snapshot.py
+"""
+Snapshot periódico de los caches en memoria a un archivo local y restore
+tibio al arrancar, para que un deploy/restart no mande todo upstream.
+
+Cada cache se registra como (nombre, export_fn, import_fn):
+- export_fn() -> lista de entradas JSON-serializables con "expires_at" (epoch)
+- import_fn(entradas) -> cuántas se restauraron (debe saltear lo vencido y no
+  pisar entradas que ya se llenaron después de arrancar)
+
+El archivo es JSON + gzip (nivel 1: rápido) escrito de forma atómica. El
+restore corre en un thread: el server atiende mientras tanto.
+
+CACHE_SNAPSHOT=0 lo deshabilita; CACHE_SNAPSHOT_INTERVAL (s) controla cada
+cuánto se escribe. Con varios workers todos escriben el mismo archivo (gana el
+último rename) y todos restauran de él.
+"""
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+ENABLED = os.getenv("CACHE_SNAPSHOT", "1") != "0"
+SNAPSHOT_PATH = os.getenv(
+    "CACHE_SNAPSHOT_PATH",
+    os.path.join(tempfile.gettempdir(), "beatly_cache_snapshot.json.gz"),
+)
+SNAPSHOT_INTERVAL = int(os.getenv("CACHE_SNAPSHOT_INTERVAL", "300"))
+FORMAT_VERSION = 1
+
+logger = logging.getLogger("uvicorn.error")
+
+_caches: list[tuple[str, callable, callable]] = []
+_stop = threading.Event()
+_write_lock = threading.Lock()
+
+def save_snapshot() -> int:
+    """Escribe todas las entradas vigentes; devuelve cuántas guardó"""
+    payload = {"version": FORMAT_VERSION, "saved_at": time.time(), "caches": {}}
+    total = 0
+    for name, export_fn, _ in _caches:
+        try:
+            entries = export_fn()
+        except Exception as e:
+            logger.warning(f"⚠️ snapshot {name}: export falló: {e}")
+            continue
+        payload["caches"][name] = entries
+        total += len(entries)
+
+    directory = os.path.dirname(SNAPSHOT_PATH) or "."
+    with _write_lock:
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=1) as f:
+                f.write(json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8"))
+            os.replace(tmp, SNAPSHOT_PATH)
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+    return total
+
+def restore_snapshot() -> dict[str, int]:
+    """Carga el snapshot (si existe) en los caches registrados"""
+    try:
+        with gzip.open(SNAPSHOT_PATH, "rb") as f:
+            payload = json.loads(f.read())
+    except FileNotFoundError:
+        return {}
+    if payload.get("version") != FORMAT_VERSION:
+        return {}
+
+    restored = {}
+    now = time.time()
+    for name, _, import_fn in _caches:
+        entries = [e for e in payload["caches"].get(name, []) if e.get("expires_at", 0) > now]
+        try:
+            restored[name] = import_fn(entries)
+        except Exception as e:
+            logger.warning(f"⚠️ snapshot {name}: restore falló: {e}")
+    return restored
+
+def _run():
+    t0 = time.perf_counter()
+    try:
+        restored = restore_snapshot()
+        if restored:
+            logger.info(f"♻️ cache restaurado {restored} en {(time.perf_counter() - t0) * 1000:.0f} ms")
+    except Exception as e:
+        logger.warning(f"⚠️ no se pudo restaurar el snapshot de cache: {e}")
+
+    while not _stop.wait(SNAPSHOT_INTERVAL):
+        try:
+            save_snapshot()
+        except Exception as e:
+            logger.warning(f"⚠️ no se pudo guardar el snapshot de cache: {e}")
+
+def start_snapshots(caches: list[tuple[str, callable, callable]]):
+    """Registra los caches, restaura en background y agenda snapshots periódicos"""
+    if not ENABLED:
+        return
+    _caches.extend(caches)
+    threading.Thread(target=_run, name="cache-snapshot", daemon=True).start()
+
+def stop_snapshots():
+    """Snapshot final al apagar (lo llama el shutdown de la app)"""
+    if not ENABLED or not _caches:
+        return
+    _stop.set()
+    try:
+        save_snapshot()
+    except Exception as e:
+        logger.warning(f"⚠️ no se pudo guardar el snapshot de cache: {e}")
@@ -0,0 +1,81 @@
+# services/cache_versions.py
+"""
+Contadores de generación compartidos entre workers.
+
+En vez de buscar y borrar claves del cache, cada escritura incrementa la
+versión de su scope (ej: "pl:<id>", "owner:<id>") y las claves de lectura
+incluyen esa versión. Las entradas viejas quedan huérfanas: nadie las vuelve
+a leer, y cache_service las borra cuando vencen (TTL + STALE_GRACE, al
+leerlas o en su barrido periódico) o antes, si el cache llega a
+CACHE_MAX_ENTRIES (LRU).
+
+Los contadores viven en un SQLite local (WAL), así todos los workers del mismo
+host ven el bump al instante sin depender de un servicio externo.
+"""
+import os
+import logging
+import sqlite3
+import tempfile
+import threading
+
+VERSIONS_PATH = os.getenv(
+    "CACHE_VERSIONS_PATH",
+    os.path.join(tempfile.gettempdir(), "beatly_cache_versions.sqlite3"),
+)
+
+logger = logging.getLogger("uvicorn.error")
+
+_local = threading.local()
+
+def _conn() -> sqlite3.Connection:
+    """Una conexión por thread (sqlite3 no comparte conexiones entre threads)"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(VERSIONS_PATH, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS versions (scope TEXT PRIMARY KEY, gen INTEGER NOT NULL)"
+        )
+        _local.conn = conn
+    return conn
+
+def get_version(scope: str) -> int | None:
+    """
+    Generación actual del scope (0 si nunca se escribió). None si no se pudo
+    leer (lock / I/O): no hay que usar el cache, porque con la generación 0
+    se servirían datos de antes de la última escritura durante todo el TTL.
+    """
+    try:
+        row = _conn().execute("SELECT gen FROM versions WHERE scope = ?", (scope,)).fetchone()
+        return row[0] if row else 0
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ No se pudo leer versión de cache {scope}: {e}")
+        return None
+
+def bump_version(*scopes: str):
+    """Incrementa la generación de uno o más scopes (invalida sus claves)"""
+    try:
+        conn = _conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for scope in scopes:
+                conn.execute(
+                    "INSERT INTO versions (scope, gen) VALUES (?, 1) "
+                    "ON CONFLICT(scope) DO UPDATE SET gen = gen + 1",
+                    (scope,),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ No se pudo incrementar versión de cache {scopes}: {e}")
+
+def versioned_key(base: str, scope: str) -> str | None:
+    """
+    Arma la clave de cache con la generación del scope: '<base>:v<gen>'.
+    None si la versión no se pudo leer: el caller saltea el cache.
+    """
+    gen = get_version(scope)
+    return None if gen is None else f"{base}:v{gen}"
@@ -0,0 +1,343 @@
+# services/catalog.py
+"""
+Catálogo local (SQLite) de tracks, álbumes y artistas.
+
+Todo lo que parsean utils/ desde search / artist / album queda guardado acá
+además del cache con TTL, indexado por videoId, albumId y artistId. Con eso:
+- /api/music/track/{videoId} y los lookups por id se responden sin YouTube
+- add_track_to_playlist completa la metadata del track del lado del server
+
+Las escrituras se encolan y las hace un thread aparte en lotes (una sola
+transacción): el request nunca espera al disco. Si la cola se llena se
+descartan (el catálogo es best-effort, se vuelve a llenar con el uso).
+
+Los upserts no pisan un dato conocido con NULL: search trae menos campos que
+album, y el orden en que llegan no importa.
+
+CATALOG=0 lo deshabilita; CATALOG_PATH es el archivo (compartido por los
+workers del host, WAL).
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+
+ENABLED = os.getenv("CATALOG", "1") != "0"
+CATALOG_PATH = os.getenv(
+    "CATALOG_PATH",
+    os.path.join(tempfile.gettempdir(), "beatly_catalog.sqlite3"),
+)
+QUEUE_MAX = 10_000
+
+logger = logging.getLogger("uvicorn.error")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    video_id TEXT PRIMARY KEY,
+    title TEXT,
+    artist_id TEXT,
+    artist_name TEXT,
+    artists TEXT,
+    album_id TEXT,
+    album_title TEXT,
+    track_no INTEGER,
+    duration TEXT,
+    duration_seconds INTEGER,
+    thumbnail TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tracks_album ON tracks(album_id, track_no);
+CREATE INDEX IF NOT EXISTS tracks_artist ON tracks(artist_id);
+
+CREATE TABLE IF NOT EXISTS albums (
+    album_id TEXT PRIMARY KEY,
+    title TEXT,
+    type TEXT,
+    year TEXT,
+    artist_id TEXT,
+    artist_name TEXT,
+    description TEXT,
+    thumbnail TEXT,
+    track_count INTEGER,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS albums_artist ON albums(artist_id);
+
+CREATE TABLE IF NOT EXISTS artists (
+    artist_id TEXT PRIMARY KEY,
+    name TEXT,
+    description TEXT,
+    monthly_listeners TEXT,
+    thumbnail TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+_COLUMNS = {
+    "tracks": ("video_id", "title", "artist_id", "artist_name", "artists", "album_id", "album_title",
+               "track_no", "duration", "duration_seconds", "thumbnail"),
+    "albums": ("album_id", "title", "type", "year", "artist_id", "artist_name", "description",
+               "thumbnail", "track_count"),
+    "artists": ("artist_id", "name", "description", "monthly_listeners", "thumbnail"),
+}
+
+def _upsert_sql(table: str) -> str:
+    cols = _COLUMNS[table]
+    key = cols[0]
+    updates = ", ".join(f"{c} = COALESCE(excluded.{c}, {c})" for c in cols[1:])
+    return (
+        f"INSERT INTO {table} ({', '.join(cols)}, updated_at) VALUES ({', '.join('?' * (len(cols) + 1))}) "
+        f"ON CONFLICT({key}) DO UPDATE SET {updates}, updated_at = excluded.updated_at"
+    )
+
+_UPSERTS = {table: _upsert_sql(table) for table in _COLUMNS}
+
+_local = threading.local()
+
+def _conn() -> sqlite3.Connection:
+    """Una conexión por thread (sqlite3 no comparte conexiones entre threads)"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(CATALOG_PATH, timeout=5, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+# --- HELPERS DE PARSEO ---
+
+def duration_seconds(text: str | None) -> int | None:
+    """'3:21' / '1:02:03' -> segundos"""
+    if not text or ":" not in text:
+        return None
+    try:
+        total = 0
+        for part in text.strip().split(":"):
+            total = total * 60 + int(part)
+        return total
+    except ValueError:
+        return None
+
+def _thumb(thumbs) -> str | None:
+    """La miniatura más grande (las de InnerTube vienen de menor a mayor)"""
+    if isinstance(thumbs, str):
+        return thumbs
+    return thumbs[-1].get("url") if thumbs else None
+
+def _int(value) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _track_row(video_id, title=None, artists=None, album_id=None, album_title=None,
+               track_no=None, duration=None, thumbnail=None, artist_id=None, artist_name=None):
+    artists = [a for a in (artists or []) if a.get("id") or a.get("name")]
+    first = artists[0] if artists else {}
+    return ("tracks", (
+        video_id, title, artist_id or first.get("id"), artist_name or first.get("name"),
+        json.dumps(artists) if artists else None, album_id, album_title, _int(track_no),
+        duration, duration_seconds(duration), thumbnail,
+    ))
+
+# --- ESCRITURA (en background) ---
+
+_queue: queue.Queue = queue.Queue(maxsize=QUEUE_MAX)
+_writer: threading.Thread | None = None
+_lock = threading.Lock()
+_STOP = object()
+
+def _enqueue(rows: list[tuple[str, tuple]]):
+    if not ENABLED or not rows:
+        return
+    _ensure_writer()
+    try:
+        _queue.put_nowait(rows)
+    except queue.Full:
+        pass
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run, name="catalog", daemon=True)
+            _writer.start()
+            atexit.register(_stop)
+
+def _run():
+    while True:
+        batch = [_queue.get()]
+        while len(batch) < 256:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        stop = _STOP in batch
+        _write([rows for rows in batch if rows is not _STOP])
+        if stop:
+            return
+
+def _write(batches: list[list[tuple[str, tuple]]]):
+    now = time.time()
+    try:
+        conn = _conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for rows in batches:
+                for table, values in rows:
+                    conn.execute(_UPSERTS[table], (*values, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ catálogo: no se pudo escribir el lote: {e}")
+
+def _stop():
+    """Vacía la cola al salir del proceso"""
+    if _writer is None:
+        return
+    try:
+        _queue.put(_STOP, timeout=1)
+        _writer.join(timeout=2)
+    except Exception:
+        pass
+
+def record_search(payload: dict):
+    rows = []
+    for a in payload.get("artists", []):
+        if a.get("artistId"):
+            rows.append(("artists", (a["artistId"], a.get("name"), None, None, _thumb(a.get("thumbnails")))))
+    for s in payload.get("songs", []):
+        if s.get("videoId"):
+            album = s.get("album") or {}
+            rows.append(_track_row(s["videoId"], s.get("title"), s.get("artists"),
+                                   album_id=album.get("id"), album_title=album.get("title"),
+                                   duration=s.get("duration"), thumbnail=_thumb(s.get("thumbnails"))))
+    for a in payload.get("albums", []):
+        if a.get("id"):
+            artist = (a.get("artists") or [{}])[0]
+            rows.append(("albums", (
+                a["id"], a.get("title"), a.get("type"), a.get("year"), artist.get("id"),
+                artist.get("name"), None, _thumb(a.get("thumbnails")), None,
+            )))
+    _enqueue(rows)
+
+def record_artist(artist_id: str, payload: dict):
+    header = payload.get("header", {})
+    rows = [("artists", (
+        artist_id, header.get("name"), header.get("description") or None,
+        header.get("monthlyListeners"), _thumb(header.get("thumbnails")),
+    ))]
+    for s in payload.get("topSongs", []):
+        if s.get("id"):
+            rows.append(_track_row(s["id"], s.get("title"), album_id=s.get("albumId"),
+                                   thumbnail=s.get("thumbnail"), artist_id=s.get("artistId") or artist_id,
+                                   artist_name=s.get("artistName") or header.get("name")))
+    for release_type, items in (("Album", payload.get("albums", [])), (None, payload.get("singles_eps", []))):
+        for a in items:
+            if a.get("id"):
+                rows.append(("albums", (
+                    a["id"], a.get("title"), a.get("type") or release_type, a.get("year"),
+                    artist_id, header.get("name"), None, _thumb(a.get("thumbnails")), None,
+                )))
+    for r in payload.get("related", []):
+        if r.get("id"):
+            rows.append(("artists", (r["id"], r.get("name"), None, None, _thumb(r.get("thumbnails")))))
+    _enqueue(rows)
+
+def record_album(album_id: str, payload: dict):
+    info = payload.get("info") or {}
+    tracks = payload.get("tracks") or []
+    thumbnail = _thumb(info.get("thumbnails"))
+    # El artista del álbum: el primero del primer track que lo tenga
+    artist = next((t["artists"][0] for t in tracks if t.get("artists")), {})
+    rows = [("albums", (
+        album_id, info.get("title"), None, None, artist.get("id"), artist.get("name"),
+        info.get("description") or None, thumbnail, len(tracks) or None,
+    ))]
+    for t in tracks:
+        if t.get("videoId"):
+            rows.append(_track_row(t["videoId"], t.get("title"), t.get("artists"), album_id=album_id,
+                                   album_title=info.get("title"), track_no=t.get("index"),
+                                   duration=t.get("duration"), thumbnail=thumbnail))
+    _enqueue(rows)
+
+# --- LECTURA ---
+
+def _track_dict(row: sqlite3.Row) -> dict:
+    return {
+        "videoId": row["video_id"],
+        "title": row["title"],
+        "artists": json.loads(row["artists"]) if row["artists"] else (
+            [{"id": row["artist_id"], "name": row["artist_name"]}] if row["artist_id"] or row["artist_name"] else []
+        ),
+        "albumId": row["album_id"],
+        "album": row["album_title"],
+        "trackNumber": row["track_no"],
+        "duration": row["duration"],
+        "durationSeconds": row["duration_seconds"],
+        "thumbnail": row["thumbnail"],
+    }
+
+def _album_dict(row: sqlite3.Row) -> dict:
+    return {
+        "id": row["album_id"],
+        "title": row["title"],
+        "type": row["type"],
+        "year": row["year"],
+        "artistId": row["artist_id"],
+        "artistName": row["artist_name"],
+        "description": row["description"],
+        "thumbnail": row["thumbnail"],
+        "trackCount": row["track_count"],
+    }
+
+def _query(sql: str, params: tuple) -> list[sqlite3.Row]:
+    if not ENABLED:
+        return []
+    try:
+        return _conn().execute(sql, params).fetchall()
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ catálogo: lectura falló: {e}")
+        return []
+
+def get_track(video_id: str) -> dict | None:
+    rows = _query("SELECT * FROM tracks WHERE video_id = ?", (video_id,))
+    return _track_dict(rows[0]) if rows else None
+
+def get_album(album_id: str) -> dict | None:
+    rows = _query("SELECT * FROM albums WHERE album_id = ?", (album_id,))
+    tracks = _query("SELECT * FROM tracks WHERE album_id = ? ORDER BY track_no IS NULL, track_no", (album_id,))
+    if not rows and not tracks:
+        return None
+    album = _album_dict(rows[0]) if rows else {"id": album_id}
+    album["tracks"] = [_track_dict(r) for r in tracks]
+    return album
+
+def get_artist(artist_id: str) -> dict | None:
+    rows = _query("SELECT * FROM artists WHERE artist_id = ?", (artist_id,))
+    albums = _query("SELECT * FROM albums WHERE artist_id = ? ORDER BY year DESC", (artist_id,))
+    tracks = _query("SELECT * FROM tracks WHERE artist_id = ? ORDER BY updated_at DESC LIMIT 50", (artist_id,))
+    if not rows and not albums and not tracks:
+        return None
+    # Puede que sólo lo conozcamos como artista de un álbum / track
+    row = dict(rows[0]) if rows else {"name": (albums or tracks)[0]["artist_name"]}
+    return {
+        "id": artist_id,
+        "name": row.get("name"),
+        "description": row.get("description"),
+        "monthlyListeners": row.get("monthly_listeners"),
+        "thumbnail": row.get("thumbnail"),
+        "albums": [_album_dict(r) for r in albums],
+        "tracks": [_track_dict(r) for r in tracks],
+    }
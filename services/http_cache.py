@@ -0,0 +1,293 @@
+# services/http_cache.py
+"""
+ETags fuertes + GET condicional (If-None-Match -> 304).
+
+El ETag se calcula UNA vez al llenar el cache (hash del JSON) y se guarda en
+la entrada de cache_service; los hits sólo comparan strings. Cada variante
+codificada es otra representación, así que lleva su propio ETag fuerte
+("<hash>-gz" / "<hash>-br"); If-None-Match acepta cualquiera de las variantes
+(el contenido es el mismo). Toda respuesta con cuerpos negociados, 304
+incluido, manda Vary: Accept-Encoding.
+
+Cuerpos precomprimidos: al llenar el cache también se guarda el JSON ya
+serializado y sus variantes gzip / brotli (brotli sólo si el paquete está
+instalado). Un hit elige la variante según Accept-Encoding y la manda tal
+cual: no se vuelve a serializar ni a comprimir. Cuerpos de menos de
+COMPRESS_MIN_BYTES sólo se guardan sin comprimir. CACHE_PRECOMPRESS=0 vuelve
+a serializar en cada hit (sin compresión), para comparar en bench/compression.
+
+Respuestas compuestas (composed_or_fill): un objeto {nombre: parte} armado
+con varias entradas de cache, sin guardar el objeto completo. Se pegan los
+cuerpos JSON de las partes y el ETag sale de los ETags de las partes; la
+variante comprimida sí se genera en cada 200 (los 304 no cuestan nada) y
+sólo si alguna parte es lo bastante grande como para tener una.
+"""
+import gzip
+import hashlib
+import json
+import math
+import os
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import brotli  # opcional (pip install brotli)
+except ImportError:
+    brotli = None
+
+from services.cache_service import CacheEntry, get_entry, get_stale, set_cached, DEFAULT_TTL
+from services.metrics import Counter
+from services.negative_cache import NegativeCached
+from services.upstream_governor import UpstreamUnavailable
+from services.request_context import mark_cache, phase_timer
+
+PRECOMPRESS = os.getenv("CACHE_PRECOMPRESS", "1") != "0"
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+# Preferencia del server cuando el cliente acepta varias con el mismo q
+_ENCODING_PREFERENCE = ("br", "gzip", "identity")
+_ETAG_SUFFIX = {"gzip": "-gz", "br": "-br"}
+_COMPRESSED = ("gzip", "br") if brotli is not None else ("gzip",)
+
+# --- METRICS ---
+BODY_BYTES = Counter("cached_body_bytes_total", "Bytes de cuerpos servidos desde cuerpos precodificados", ("encoding",))
+
+def make_etag(data) -> str:
+    """ETag fuerte a partir del contenido (JSON canónico)"""
+    with phase_timer("serialize"):
+        body = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+
+def _variant_etag(etag: str, encoding: str) -> str:
+    """ETag de la variante codificada ("<hash>-gz" / "<hash>-br"); identity: el base"""
+    suffix = _ETAG_SUFFIX.get(encoding)
+    return etag[:-1] + suffix + '"' if suffix and etag.endswith('"') else etag
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match contra el ETag base o cualquiera de sus variantes codificadas"""
+    inm = request.headers.get("If-None-Match")
+    if not inm or not etag:
+        return False
+    if inm.strip() == "*":
+        return True
+    # If-None-Match usa comparación débil: ignoramos el prefijo W/
+    candidates = {c.strip().removeprefix("W/") for c in inm.split(",")}
+    variants = {etag, *(_variant_etag(etag, enc) for enc in _ETAG_SUFFIX)}
+    return not candidates.isdisjoint(variants)
+
+def _compressed_encodings(body: bytes) -> tuple:
+    return () if len(body) < COMPRESS_MIN_BYTES else _COMPRESSED
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    with phase_timer("compress"):
+        if encoding == "gzip":
+            return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+
+def encode_bodies(data) -> dict[str, bytes]:
+    """JSON serializado como lo haría JSONResponse + sus variantes comprimidas"""
+    with phase_timer("serialize"):
+        body = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    bodies = {"identity": body}
+    for encoding in _compressed_encodings(body):
+        bodies[encoding] = _compress(body, encoding)
+    return bodies
+
+def negotiate_encoding(accept_encoding: str | None, available) -> str:
+    """Mejor encoding de `available` según Accept-Encoding (q-values, "*")"""
+    if not accept_encoding:
+        return "identity"
+    q = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        q[name.strip()] = weight
+
+    def weight(enc: str) -> float:
+        if enc == "identity":
+            # Siempre aceptable salvo "identity;q=0"; sin mención pierde
+            # contra cualquier compresión aceptada
+            return q.get("identity", 0.001)
+        return q.get(enc, q.get("*", 0.0))
+
+    # Mayor q primero; a igual q, el orden de _ENCODING_PREFERENCE
+    ranked = [
+        (weight(enc), -i, enc)
+        for i, enc in enumerate(_ENCODING_PREFERENCE)
+        if enc in available or enc == "identity"
+    ]
+    w, _, best = max(ranked)
+    return best if w > 0 else "identity"
+
+def _negotiated_headers(etag: str, encoding: str) -> dict:
+    """Headers de la variante elegida (también en el 304)"""
+    headers = {"ETag": _variant_etag(etag, encoding), "Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return headers
+
+def _encoded_response(request: Request, body: bytes, encoding: str, headers: dict, status_code: int) -> Response:
+    BODY_BYTES.inc(len(body), encoding=encoding)
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
+
+def _not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers={k: v for k, v in headers.items() if k != "Content-Encoding"})
+
+def conditional_json(request: Request, data, etag: str | None = None, status_code: int = 200,
+                     bodies: dict[str, bytes] | None = None) -> Response:
+    """JSONResponse con ETag, o 304 vacío si el cliente ya tiene esa versión"""
+    if etag is None:
+        etag = make_etag(data)
+    if bodies is not None:
+        encoding = negotiate_encoding(request.headers.get("Accept-Encoding"), bodies)
+        headers = _negotiated_headers(etag, encoding)
+        if _etag_matches(request, etag):
+            return _not_modified(headers)
+        return _encoded_response(request, bodies[encoding], encoding, headers, status_code)
+    headers = {"ETag": etag}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    with phase_timer("serialize"):
+        return JSONResponse(content=data, status_code=status_code, headers=headers)
+
+def _fill(key: str, data, ttl: int) -> CacheEntry:
+    etag = make_etag(data)
+    bodies = encode_bodies(data) if PRECOMPRESS else None
+    with phase_timer("cache"):
+        return set_cached(key, data, ttl, etag=etag, bodies=bodies)
+
+def cache_fill(key: str, data, ttl: int = DEFAULT_TTL) -> str:
+    """Guarda en cache junto con su ETag y los cuerpos ya codificados; devuelve el ETag"""
+    return _fill(key, data, ttl).etag
+
+def fill_response(request: Request, key: str, data, ttl: int = DEFAULT_TTL) -> Response:
+    """cache_fill + respuesta con el cuerpo recién codificado (sin serializar de nuevo)"""
+    return entry_response(request, _fill(key, data, ttl))
+
+def _entry_bodies(entry: CacheEntry):
+    if entry.bodies is None and PRECOMPRESS:
+        # Entradas restauradas del snapshot o guardadas con set_cached: se
+        # codifican en el primer hit y quedan para los siguientes
+        entry.set_bodies(encode_bodies(entry.data))
+    return entry.bodies
+
+def entry_response(request: Request, entry: CacheEntry) -> Response:
+    """Responde una entrada de cache con su variante precomprimida"""
+    bodies = _entry_bodies(entry)
+    # Con cuerpo y ETag no hace falta materializar data (ver cache_service)
+    data = entry.data if bodies is None or entry.etag is None else None
+    return conditional_json(request, data, entry.etag, bodies=bodies)
+
+def cached_or_fill(request: Request, key: str, producer, ttl=DEFAULT_TTL) -> Response:
+    """
+    Hit -> responde desde cache; miss -> producer(), llena cache+ETag y responde.
+    ttl puede ser una función ttl(data) (ej: resultados vacíos duran menos).
+    """
+    hit = cached_json(request, key)
+    if hit is not None:
+        return hit
+    try:
+        data = producer()
+    except UpstreamUnavailable as e:
+        # Breaker abierto / sin capacidad: mejor stale que nada
+        stale = get_stale(key)
+        if stale is not None:
+            resp = entry_response(request, stale)
+            resp.headers["Warning"] = '110 - "Response is Stale"'
+            return resp
+        return upstream_unavailable_response(e)
+    except NegativeCached as e:
+        return negative_cached_response(e)
+    return fill_response(request, key, data, ttl(data) if callable(ttl) else ttl)
+
+def _composed_response(request: Request, parts: dict[str, CacheEntry]) -> Response:
+    """{nombre: parte} pegando los cuerpos JSON de cada entrada; ETag derivado de los de las partes"""
+    etags = [f"{name}={entry.etag or make_etag(entry.data)}" for name, entry in parts.items()]
+    etag = '"' + hashlib.sha1(",".join(etags).encode("utf-8")).hexdigest() + '"'
+    part_bodies = {name: _entry_bodies(entry) for name, entry in parts.items()}
+    # Se decide antes de armar el cuerpo (el 304 lleva el ETag de la variante)
+    compressible = any(b is not None and "gzip" in b for b in part_bodies.values())
+    available = _COMPRESSED if compressible else ()
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding"), available)
+    headers = _negotiated_headers(etag, encoding)
+    if _etag_matches(request, etag):
+        return _not_modified(headers)
+    with phase_timer("serialize"):
+        chunks = []
+        for name, entry in parts.items():
+            bodies = part_bodies[name]
+            part = bodies["identity"] if bodies is not None else encode_bodies(entry.data)["identity"]
+            chunks.append(json.dumps(name).encode("utf-8") + b":" + part)
+        body = b"{" + b",".join(chunks) + b"}"
+    if encoding != "identity":
+        body = _compress(body, encoding)
+    return _encoded_response(request, body, encoding, headers, 200)
+
+def composed_or_fill(request: Request, keys: dict[str, str], producer, ttl=DEFAULT_TTL) -> Response:
+    """
+    Objeto {nombre: data} con una entrada de cache por nombre (keys: nombre ->
+    clave). Si falta alguna, producer() devuelve {clave: data} para llenar
+    (puede traer más claves que las pedidas: se cachean todas). Sin upstream,
+    las partes que falten salen de stale; si alguna no está, 503.
+    """
+    with phase_timer("cache"):
+        parts = {name: get_entry(key) for name, key in keys.items()}
+    missing = [name for name, entry in parts.items() if entry is None]
+    mark_cache(not missing)
+    if not missing:
+        return _composed_response(request, parts)
+    try:
+        fresh = producer()
+    except UpstreamUnavailable as e:
+        stale = {name: get_stale(keys[name]) for name in missing}
+        if any(entry is None for entry in stale.values()):
+            return upstream_unavailable_response(e)
+        resp = _composed_response(request, {**parts, **stale})
+        resp.headers["Warning"] = '110 - "Response is Stale"'
+        return resp
+    except NegativeCached as e:
+        return negative_cached_response(e)
+    filled = {key: _fill(key, data, ttl(data) if callable(ttl) else ttl) for key, data in fresh.items()}
+    return _composed_response(request, {name: filled.get(key) or parts[name] for name, key in keys.items()})
+
+def upstream_unavailable_response(e: UpstreamUnavailable, **extra) -> JSONResponse:
+    """503 + Retry-After cuando el gobernador corta la llamada"""
+    return JSONResponse(
+        status_code=503,
+        content={"error": "upstream_unavailable", "detail": str(e), **extra},
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+    )
+
+def admission_rejected_response(e: UpstreamUnavailable, **extra) -> JSONResponse:
+    """429 + Retry-After cuando el cliente superó su cuota (services/admission)"""
+    return JSONResponse(
+        status_code=429,
+        content={"error": "too_many_requests", "detail": str(e), **extra},
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+    )
+
+def negative_cached_response(e: NegativeCached, **extra) -> JSONResponse:
+    """404 (no existe / no disponible) o 502 (falló hace poco), con Retry-After"""
+    return JSONResponse(
+        status_code=404 if e.permanent else 502,
+        content={"error": "not_found" if e.permanent else "upstream_error", "detail": str(e),
+                 "kind": e.kind, "id": e.key, **extra},
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+    )
+
+def cached_json(request: Request, key: str) -> Response | None:
+    """Si la clave está en cache, responde (200 o 304) sin re-serializar para el hash"""
+    with phase_timer("cache"):
+        entry = get_entry(key)
+    mark_cache(entry is not None)
+    if entry is None:
+        return None
+    return entry_response(request, entry)
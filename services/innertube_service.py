@@ -0,0 +1,62 @@
+# services/innertube_service.py
+"""
+Punto único de acceso a InnerTube (YouTube Music, cliente WEB_REMIX).
+Centraliza las llamadas para poder medir el tiempo upstream de cada request
+y para grabarlas / reproducirlas (UPSTREAM_MODE, ver services/upstream_store).
+"""
+import threading
+from typing import TYPE_CHECKING
+from services import upstream_governor, upstream_store
+from services.metrics import UPSTREAM_SECONDS
+from services.request_context import upstream_timer
+
+if TYPE_CHECKING:
+    from innertube import InnerTube
+
+CLIENT_NAME = "WEB_REMIX"
+
+# Un solo cliente (y su sesión HTTP) por proceso, creado al primer uso
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+def _client() -> "InnerTube":
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                from innertube import InnerTube
+                _CLIENT = InnerTube(CLIENT_NAME)
+    return _CLIENT
+
+def warm_up():
+    """Importa innertube y crea el cliente fuera del camino de los requests"""
+    _client()
+
+def _timed(op: str, fn, *args, **kwargs) -> dict:
+    with upstream_timer(), UPSTREAM_SECONDS.time(upstream="innertube", op=op, outcome="ok") as labels:
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            labels["outcome"] = "error"
+            raise
+
+def _call(op: str, fn, *args, **kwargs) -> dict:
+    """Llamada InnerTube pasando por rate limit + circuit breaker"""
+    return upstream_governor.call("innertube", _timed, op, fn, *args, bucket="innertube", **kwargs)
+
+def search(query: str | None = None, **kwargs) -> dict:
+    return upstream_store.through(
+        "search", query, lambda: _call("search", _client().search, query, **kwargs), kwargs
+    )
+
+def browse(browse_id: str | None = None, **kwargs) -> dict:
+    return upstream_store.through(
+        "browse", browse_id, lambda: _call("browse", _client().browse, browse_id, **kwargs), kwargs
+    )
+
+def watch_next(video_id: str | None = None, playlist_id: str | None = None, **kwargs) -> dict:
+    """Cola "a continuación" de un video (con playlist_id RDAMVM<id>: la radio)"""
+    return upstream_store.through(
+        "next", f"{video_id}:{playlist_id or ''}",
+        lambda: _call("next", _client().next, video_id, playlist_id, **kwargs), kwargs
+    )
@@ -0,0 +1,124 @@
+# services/negative_cache.py
+"""
+Cache negativo: recuerda por un rato los ids / queries que fallaron para que
+los reintentos del cliente no vuelvan a pagar una extracción completa (3
+player clients) o un browse cada vez.
+
+La clasificación del error decide el TTL:
+- permanent: el id no existe / no está disponible: los mensajes puntuales de
+  yt-dlp (video privado, borrado, no disponible) o NotFound (el upstream
+  respondió vacío) -> NEGATIVE_TTL_PERMANENT
+- transient: cualquier otro error (timeouts, formatos que no aparecieron, un
+  404 / "not found" genérico de un proxy o del upstream) ->
+  NEGATIVE_TTL_TRANSIENT
+- UpstreamUnavailable (breaker / rate limit) no se cachea: eso ya lo maneja
+  services/upstream_governor con su Retry-After, y no es culpa del id.
+
+Uso:
+    with negative_cache.guard("album", album_id):
+        response = innertube_service.browse(album_id)
+
+Si hay una entrada vigente, guard() levanta NegativeCached sin llamar al
+upstream; si el bloque falla, guarda la entrada y levanta NegativeCached
+(from el error original), así el primer fallo y los siguientes responden igual.
+
+Es por worker, como el resto de los caches en memoria.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from services.metrics import Counter, Gauge
+from services.upstream_governor import UpstreamUnavailable
+
+NEGATIVE_TTL_PERMANENT = int(os.getenv("NEGATIVE_TTL_PERMANENT", "600"))
+NEGATIVE_TTL_TRANSIENT = int(os.getenv("NEGATIVE_TTL_TRANSIENT", "30"))
+NEGATIVE_MAX_ENTRIES = 10_000
+
+# Mensajes (de yt-dlp) que indican que el recurso no existe o no va a estar
+# disponible. Nada genérico tipo "not found" / "404": eso también lo devuelve
+# un endpoint o proxy caído, y quedaría cacheado como permanente
+PERMANENT_MARKERS = (
+    "video unavailable",
+    "private video",
+    "has been removed",
+    "is not available",
+    "confirm your age",
+)
+
+class NotFound(LookupError):
+    """El upstream respondió, pero vacío: el id no existe (permanente)"""
+
+class NegativeCached(RuntimeError):
+    """Hay (o se acaba de guardar) una entrada negativa vigente para el id"""
+
+    def __init__(self, kind: str, key: str, entry: dict):
+        super().__init__(entry["error"])
+        self.kind = kind
+        self.key = key
+        self.permanent = entry["class"] == "permanent"
+        self.retry_after = max(0.0, entry["expires_at"] - time.time())
+
+_entries: dict[tuple[str, str], dict] = {}
+_lock = threading.Lock()
+
+# --- METRICS ---
+NEGATIVE = Counter("negative_cache_total", "Cache negativo por tipo de id", ("kind", "result"))
+Gauge("negative_cache_entries", "Entradas en el cache negativo", fn=lambda: len(_entries))
+
+def classify(exc: Exception, markers: tuple = PERMANENT_MARKERS) -> str | None:
+    """"permanent" | "transient" | None (no se cachea)"""
+    if isinstance(exc, UpstreamUnavailable):
+        return None
+    if isinstance(exc, NotFound):
+        return "permanent"
+    msg = str(exc).lower()
+    return "permanent" if any(m in msg for m in markers) else "transient"
+
+def lookup(kind: str, key: str) -> dict | None:
+    with _lock:
+        entry = _entries.get((kind, key))
+        if entry and entry["expires_at"] <= time.time():
+            del _entries[(kind, key)]
+            entry = None
+    if entry:
+        NEGATIVE.inc(kind=kind, result="hit")
+    return entry
+
+def store(kind: str, key: str, exc: Exception, markers: tuple = PERMANENT_MARKERS) -> dict | None:
+    error_class = classify(exc, markers)
+    if error_class is None:
+        return None
+    ttl = NEGATIVE_TTL_PERMANENT if error_class == "permanent" else NEGATIVE_TTL_TRANSIENT
+    entry = {"error": str(exc) or type(exc).__name__, "class": error_class, "expires_at": time.time() + ttl}
+    with _lock:
+        if len(_entries) >= NEGATIVE_MAX_ENTRIES:
+            now = time.time()
+            for k in [k for k, e in _entries.items() if e["expires_at"] <= now]:
+                del _entries[k]
+            while len(_entries) >= NEGATIVE_MAX_ENTRIES:
+                del _entries[next(iter(_entries))]  # el más viejo
+        _entries[(kind, key)] = entry
+    NEGATIVE.inc(kind=kind, result=error_class)
+    return entry
+
+def forget(kind: str, key: str):
+    with _lock:
+        _entries.pop((kind, key), None)
+
+@contextmanager
+def guard(kind: str, key: str, markers: tuple = PERMANENT_MARKERS):
+    """Corta con NegativeCached si el id falló hace poco; si el bloque falla, lo recuerda"""
+    entry = lookup(kind, key)
+    if entry:
+        raise NegativeCached(kind, key, entry)
+    try:
+        yield
+    except NegativeCached:
+        raise
+    except Exception as e:
+        entry = store(kind, key, e, markers)
+        if entry is None:
+            raise
+        raise NegativeCached(kind, key, entry) from e
@@ -0,0 +1,366 @@
+# services/po_token.py
+"""
+Cache de PO tokens (y visitor data) para yt-dlp.
+
+Antes cada extracción le pedía un token al provider remoto de bgutil (un host
+free-tier que arranca en frío). Ahora:
+
+- El plugin `youtubepot-bgutilhttp` de yt-dlp apunta a un proxy local
+  (ThreadingHTTPServer en 127.0.0.1, un puerto por worker) que habla el mismo
+  protocolo que bgutil (GET /ping, POST /get_pot). El plugin sigue decidiendo
+  el content binding correcto (visitor data, data sync id con cookies, etc.).
+- El proxy responde desde cache: memoria -> SQLite compartido entre workers
+  (POT_CACHE_PATH). Sólo en un miss llama al provider real.
+- Providers enchufables (POT_PROVIDER): "bgutil-http" (servidor bgutil en
+  POT_PROVIDER_URL; por default el local en 127.0.0.1:4416, un host remoto
+  hay que configurarlo explícitamente), "bgutil-script" (generate_once.js con
+  node, sin servidor) o "none" (no se configura ningún provider).
+- Un thread de fondo re-mintea los bindings usados recientemente antes de que
+  venzan, así un /play nunca espera la generación del token. El mismo thread
+  olvida los bindings que no se usan hace KEEP_WARM (y, por encima de
+  POT_MAX_BINDINGS, los menos usados).
+
+Para clientes sin cookies también se cachea un visitor data propio, que
+_ydl_for pasa como extractor arg.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services import upstream_governor
+from services.metrics import Counter, Gauge
+
+PROVIDER = os.getenv("POT_PROVIDER", "bgutil-http")
+# docker run -p 4416:4416 brainicism/bgutil-ytdlp-pot-provider. Un provider
+# remoto (p.ej. el de onrender.com) sólo si se configura a mano.
+PROVIDER_URL = os.getenv("POT_PROVIDER_URL", "http://127.0.0.1:4416")
+SCRIPT_PATH = os.getenv(
+    "POT_SCRIPT_PATH",
+    os.path.expanduser("~/bgutil-ytdlp-pot-provider/server/build/generate_once.js"),
+)
+TOKEN_TTL = int(os.getenv("POT_TTL", str(6 * 3600)))                # tope si el provider no dice
+REFRESH_BEFORE = int(os.getenv("POT_REFRESH_BEFORE", str(30 * 60)))  # re-mint antes de vencer
+KEEP_WARM = int(os.getenv("POT_KEEP_WARM", str(6 * 3600)))           # bindings usados hace < esto
+REFRESH_INTERVAL = int(os.getenv("POT_REFRESH_INTERVAL", "60"))
+MAX_BINDINGS = int(os.getenv("POT_MAX_BINDINGS", "1000"))           # tope de bindings en memoria
+CACHE_PATH = os.getenv(
+    "POT_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "beatly_po_tokens.sqlite3"),
+)
+MINT_TIMEOUT = 30
+# Binding propio para el visitor data (el provider genera uno si no le pasamos nada)
+VISITOR_KEY = ""
+
+logger = logging.getLogger("uvicorn.error")
+
+# --- METRICS ---
+POT_REQUESTS = Counter("po_token_requests_total", "Pedidos de PO token al proxy local", ("result",))
+POT_MINTS = Counter("po_token_mints_total", "Tokens generados por el provider", ("provider", "outcome", "trigger"))
+Gauge("po_token_cached", "PO tokens vigentes en memoria", fn=lambda: len(_tokens))
+
+# --- PROVIDERS ---
+
+def _parse_expiry(value) -> float:
+    now = time.time()
+    try:
+        if isinstance(value, (int, float)):
+            exp = float(value)
+        else:
+            exp = datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except (TypeError, ValueError):
+        exp = now + TOKEN_TTL
+    return min(exp, now + TOKEN_TTL)
+
+def _token_from(payload: dict, binding: str) -> dict:
+    token = payload.get("poToken") or payload.get("po_token")
+    if not token:
+        raise RuntimeError(f"provider sin token: {payload.get('error') or payload}")
+    return {
+        "token": token,
+        "binding": payload.get("contentBinding") or payload.get("content_binding") or binding,
+        "expires_at": _parse_expiry(payload.get("expiresAt") or payload.get("expires_at")),
+    }
+
+class BgutilHTTPProvider:
+    """Servidor bgutil (POST /get_pot)"""
+    name = "bgutil-http"
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+
+    def mint(self, binding: str) -> dict:
+        body = json.dumps({"content_binding": binding or None, "bypass_cache": False}).encode()
+        req = urllib.request.Request(
+            f"{self.base_url}/get_pot", data=body, method="POST",
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(req, timeout=MINT_TIMEOUT) as r:
+            return _token_from(json.loads(r.read()), binding)
+
+class BgutilScriptProvider:
+    """generate_once.js de bgutil ejecutado con node (sin servidor aparte)"""
+    name = "bgutil-script"
+
+    def __init__(self, script_path: str):
+        self.script_path = script_path
+
+    def mint(self, binding: str) -> dict:
+        cmd = ["node", self.script_path]
+        if binding:
+            cmd += ["-c", binding]
+        out = subprocess.run(cmd, capture_output=True, text=True, timeout=MINT_TIMEOUT, check=True)
+        # El script loguea antes; el JSON es la última línea
+        return _token_from(json.loads(out.stdout.strip().splitlines()[-1]), binding)
+
+PROVIDERS = {
+    "bgutil-http": lambda: BgutilHTTPProvider(PROVIDER_URL),
+    "bgutil-script": lambda: BgutilScriptProvider(SCRIPT_PATH),
+}
+
+_PROVIDER = None
+
+def _provider():
+    global _PROVIDER
+    if _PROVIDER is None:
+        _PROVIDER = PROVIDERS[PROVIDER]()
+    return _PROVIDER
+
+def enabled() -> bool:
+    return PROVIDER in PROVIDERS
+
+# --- STORE (memoria + SQLite compartido) ---
+
+_tokens: dict[str, dict] = {}
+_last_used: dict[str, float] = {}
+_mint_locks: dict[str, threading.Lock] = {}
+_mint_locks_guard = threading.Lock()
+_local = threading.local()
+
+def _conn() -> sqlite3.Connection:
+    """Una conexión por thread (sqlite3 no comparte conexiones entre threads)"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(CACHE_PATH, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS po_tokens (binding TEXT PRIMARY KEY, content_binding TEXT NOT NULL, "
+            "token TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL DEFAULT 0)"
+        )
+        _local.conn = conn
+    return conn
+
+def _load(binding: str) -> dict | None:
+    try:
+        row = _conn().execute(
+            "SELECT token, content_binding, expires_at FROM po_tokens WHERE binding = ?", (binding,)
+        ).fetchone()
+    except sqlite3.Error:
+        return None
+    if not row:
+        return None
+    return {"token": row[0], "binding": row[1], "expires_at": row[2]}
+
+def _save(binding: str, entry: dict):
+    try:
+        _conn().execute(
+            "INSERT INTO po_tokens (binding, content_binding, token, expires_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT(binding) DO UPDATE SET "
+            "content_binding = excluded.content_binding, token = excluded.token, expires_at = excluded.expires_at",
+            (binding, entry["binding"], entry["token"], entry["expires_at"], _last_used.get(binding, 0)),
+        )
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ no se pudo guardar el PO token: {e}")
+
+def _touch(binding: str):
+    now = time.time()
+    # Escribimos last_used a SQLite como mucho una vez por minuto por binding
+    if now - _last_used.get(binding, 0) > 60:
+        try:
+            _conn().execute("UPDATE po_tokens SET last_used = ? WHERE binding = ?", (now, binding))
+        except sqlite3.Error:
+            pass
+    _last_used[binding] = now
+
+def _valid(entry: dict | None, margin: float = 0) -> bool:
+    return entry is not None and entry["expires_at"] - time.time() > margin
+
+def _mint(binding: str, trigger: str) -> dict:
+    """Genera un token (uno a la vez por binding) y lo guarda en ambos niveles"""
+    with _mint_locks_guard:
+        lock = _mint_locks.setdefault(binding, threading.Lock())
+    with lock:
+        # Otro thread u otro worker pudo haberlo generado mientras esperábamos
+        if trigger != "bypass":
+            shared = _load(binding)
+            if _valid(shared, REFRESH_BEFORE):
+                _tokens[binding] = shared
+                return shared
+        provider = _provider()
+        try:
+            entry = upstream_governor.call("pot_provider", provider.mint, binding)
+        except Exception:
+            POT_MINTS.inc(provider=provider.name, outcome="error", trigger=trigger)
+            raise
+        POT_MINTS.inc(provider=provider.name, outcome="ok", trigger=trigger)
+        _tokens[binding] = entry
+        _save(binding, entry)
+        return entry
+
+def get_token(binding: str, bypass_cache: bool = False) -> dict:
+    """Token para el binding: memoria -> SQLite -> provider"""
+    visitor = _tokens.get(VISITOR_KEY)
+    if binding and visitor and visitor["binding"] == binding:
+        # Es nuestro visitor data (lo pasamos a yt-dlp): mismo token
+        binding = VISITOR_KEY
+    _touch(binding)
+    if not bypass_cache:
+        entry = _tokens.get(binding)
+        if not _valid(entry):
+            entry = _load(binding)
+            if _valid(entry):
+                _tokens[binding] = entry
+        if _valid(entry):
+            POT_REQUESTS.inc(result="hit")
+            return entry
+    POT_REQUESTS.inc(result="bypass" if bypass_cache else "miss")
+    return _mint(binding, "bypass" if bypass_cache else "miss")
+
+def cached_visitor_data() -> str | None:
+    """Visitor data vigente (no bloquea: si no hay, lo genera el refresher)"""
+    if not enabled():
+        return None
+    entry = _tokens.get(VISITOR_KEY)
+    return entry["binding"] if _valid(entry, REFRESH_BEFORE / 2) else None
+
+# --- PROXY LOCAL (protocolo bgutil) ---
+
+class _Handler(BaseHTTPRequestHandler):
+    def _json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/ping":
+            self._json(200, {"server_uptime": time.monotonic() - _started_at, "version": "beatly-cache"})
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/get_pot":
+            return self._json(404, {"error": "not found"})
+        try:
+            req = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            entry = get_token(req.get("content_binding") or VISITOR_KEY, bool(req.get("bypass_cache")))
+        except Exception as e:
+            return self._json(500, {"error": str(e)})
+        expires = datetime.fromtimestamp(entry["expires_at"]).astimezone().isoformat()
+        self._json(200, {
+            "poToken": entry["token"], "po_token": entry["token"],
+            "contentBinding": entry["binding"], "expiresAt": expires,
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+_server: ThreadingHTTPServer | None = None
+_server_lock = threading.Lock()
+_started_at = time.monotonic()
+
+def local_base_url() -> str:
+    """URL del proxy local (lo levanta al primer uso)"""
+    global _server
+    if _server is None:
+        with _server_lock:
+            if _server is None:
+                server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+                server.daemon_threads = True
+                threading.Thread(target=server.serve_forever, name="pot-proxy", daemon=True).start()
+                _server = server
+    host, port = _server.server_address[:2]
+    return f"http://{host}:{port}"
+
+# --- PRE-MINT EN BACKGROUND ---
+
+_refresher_started = threading.Event()
+
+def _prune(now: float):
+    """Olvida (en memoria) los bindings sin uso hace KEEP_WARM y, si igual sobran, los menos usados"""
+    idle = {b for b, t in list(_last_used.items()) if now - t >= KEEP_WARM}
+    # Pre-minteados para otro worker: hasta que venzan
+    idle |= {b for b, e in list(_tokens.items()) if b not in _last_used and not _valid(e)}
+    idle.discard(VISITOR_KEY)
+    by_use = sorted((b for b in list(_last_used) if b != VISITOR_KEY and b not in idle),
+                    key=lambda b: _last_used.get(b, 0))
+    idle.update(by_use[:max(0, len(by_use) - MAX_BINDINGS)])
+    for binding in idle:
+        _tokens.pop(binding, None)
+        _last_used.pop(binding, None)
+        with _mint_locks_guard:
+            lock = _mint_locks.get(binding)
+            if lock is not None and not lock.locked():
+                del _mint_locks[binding]
+
+def _refresh_once():
+    now = time.time()
+    _prune(now)
+    try:
+        rows = _conn().execute(
+            "SELECT binding, last_used FROM po_tokens WHERE last_used > ? OR binding = ? "
+            "ORDER BY last_used DESC LIMIT ?",
+            (now - KEEP_WARM, VISITOR_KEY, MAX_BINDINGS),
+        ).fetchall()
+    except sqlite3.Error:
+        rows = []
+    bindings = {b for b, _ in rows} | {b for b, t in _last_used.items() if now - t < KEEP_WARM}
+    bindings.add(VISITOR_KEY)
+    for binding in bindings:
+        if _valid(_tokens.get(binding), REFRESH_BEFORE):
+            continue
+        try:
+            _mint(binding, "background")
+        except Exception as e:
+            logger.warning(f"⚠️ pre-mint de PO token falló: {e}")
+            return  # el breaker de pot_provider decide cuándo reintentar
+
+def _refresh_loop():
+    with upstream_governor.priority_scope(upstream_governor.BACKGROUND):
+        while True:
+            _refresh_once()
+            time.sleep(REFRESH_INTERVAL)
+
+def start_refresher():
+    """Levanta el proxy y el thread de pre-mint (idempotente)"""
+    if not enabled() or _refresher_started.is_set():
+        return
+    _refresher_started.set()
+    local_base_url()
+    threading.Thread(target=_refresh_loop, name="pot-refresh", daemon=True).start()
+
+def _label(binding: str) -> str:
+    """Binding anonimizado para stats"""
+    return hashlib.sha1(binding.encode()).hexdigest()[:10] if binding else "<visitor>"
+
+def stats() -> dict:
+    now = time.time()
+    return {
+        "provider": PROVIDER,
+        "proxy": local_base_url() if _server else None,
+        # Los bindings (visitor data / data-sync id) identifican sesiones: sólo un hash
+        "tokens": {
+            _label(b): {"expires_in": round(e["expires_at"] - now), "used_ago": round(now - _last_used.get(b, 0))}
+            for b, e in list(_tokens.items())
+        },
+    }
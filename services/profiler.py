@@ -0,0 +1,74 @@
+# services/profiler.py
+"""
+Profiler por muestreo, sin dependencias: un thread lee sys._current_frames()
+cada `interval` segundos y acumula stacks en formato "collapsed"
+(func;func;func N), el que consumen flamegraph.pl y speedscope.
+
+Pensado para perfilar UN request en entornos no productivos: muestrea todos
+los threads (event loop + threadpool) y descarta los que están ociosos.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# (archivo, función) del frame más interno de un thread que está esperando
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("socketserver.py", "serve_forever"),
+    ("profiler.py", "_run"),
+}
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.001, max_depth: int = 128):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+        return self
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.is_set():
+            t0 = time.perf_counter()
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                leaf = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+                if leaf in _IDLE_LEAVES:
+                    continue
+                stack = []
+                depth = 0
+                while frame is not None and depth < self.max_depth:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                    depth += 1
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            # Descontamos lo que tardó el muestreo para mantener el intervalo
+            self._stop.wait(max(0.0, self.interval - (time.perf_counter() - t0)))
+
+    def collapsed(self) -> str:
+        """Stacks en formato collapsed, los más frecuentes primero"""
+        return "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common()) + "\n"
@@ -0,0 +1,174 @@
+# services/range_fetcher.py
+"""
+Descarga de audio de googlevideo con varias conexiones en paralelo.
+
+googlevideo limita el throughput POR CONEXIÓN, así que con una sola conexión
+los formatos de bitrate alto a veces bajan más lento que el tiempo real y el
+cliente se queda buffereando. El proxy ahora:
+
+- Pide el primer segmento y lo streamea directo (mismo TTFB que antes); su
+  Content-Range además nos da el tamaño total.
+- El resto del rango se parte en segmentos de SEGMENT_BYTES que bajan N
+  conexiones en paralelo (N según el bitrate del formato).
+- Read-ahead acotado: como mucho READ_AHEAD segmentos bajados y sin entregar
+  por stream, y se entregan SIEMPRE en orden.
+- Si el cliente corta, los workers dejan de bajar en el próximo chunk.
+
+STREAM_CONNECTIONS_BY_ABR: "kbps:conexiones" separados por coma; se usa el
+mayor umbral <= abr del formato. Ej: "0:1,96:2,160:4".
+"""
+import os
+import re
+import threading
+
+from services.metrics import Counter
+
+SEGMENT_BYTES = int(os.getenv("STREAM_SEGMENT_BYTES", str(512 * 1024)))
+READ_AHEAD = int(os.getenv("STREAM_READ_AHEAD", "6"))
+DEFAULT_CONNECTIONS = int(os.getenv("STREAM_CONNECTIONS", "2"))  # abr desconocido
+MAX_CONNECTIONS = 8
+CHUNK_SIZE = 64 * 1024
+
+def _parse_ladder(raw: str) -> list[tuple[float, int]]:
+    ladder = []
+    for part in raw.split(","):
+        if ":" in part:
+            abr, conns = part.split(":", 1)
+            ladder.append((float(abr), max(1, min(MAX_CONNECTIONS, int(conns)))))
+    return sorted(ladder)
+
+CONNECTIONS_BY_ABR = _parse_ladder(os.getenv("STREAM_CONNECTIONS_BY_ABR", "0:1,96:2,160:4"))
+
+# --- METRICS ---
+SEGMENTS = Counter("proxy_range_segments_total", "Segmentos bajados en paralelo", ("outcome",))
+
+def connections_for(abr: float | None) -> int:
+    """Conexiones a usar según el bitrate (kbps) del formato"""
+    if not abr:
+        return DEFAULT_CONNECTIONS
+    conns = 1
+    for threshold, n in CONNECTIONS_BY_ABR:
+        if abr >= threshold:
+            conns = n
+    return conns
+
+_RANGE_RE = re.compile(r"^bytes=(\d+)-(\d*)$")
+_CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+def parse_range(header: str | None) -> tuple[int, int | None] | None:
+    """(start, end|None) del Range del cliente; None si no se puede partir (sufijo, multi-rango)"""
+    if not header:
+        return 0, None
+    m = _RANGE_RE.match(header.strip())
+    if not m:
+        return None
+    return int(m.group(1)), int(m.group(2)) if m.group(2) else None
+
+def parse_content_range(value: str | None) -> tuple[int, int, int] | None:
+    m = _CONTENT_RANGE_RE.match((value or "").strip())
+    return (int(m.group(1)), int(m.group(2)), int(m.group(3))) if m else None
+
+class SegmentReader:
+    """Baja [start, end] en segmentos con `connections` threads y los entrega en orden"""
+
+    def __init__(self, session, url: str, start: int, end: int, connections: int,
+                 segment_bytes: int = SEGMENT_BYTES, read_ahead: int = READ_AHEAD, timeout=(5, 30)):
+        self.session = session
+        self.url = url
+        self.timeout = timeout
+        self.segments = [(s, min(s + segment_bytes - 1, end)) for s in range(start, end + 1, segment_bytes)]
+        self._next = 0
+        self._results: dict[int, bytes | Exception] = {}
+        self._cond = threading.Condition()
+        # Un slot por segmento bajado y no entregado: acota la memoria por stream
+        self._slots = threading.Semaphore(max(1, read_ahead))
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._work, name="range-fetch", daemon=True)
+            for _ in range(max(1, min(connections, len(self.segments))))
+        ]
+
+    def start(self):
+        for t in self._threads:
+            t.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+
+    def _claim(self) -> int | None:
+        with self._cond:
+            if self._next >= len(self.segments):
+                return None
+            i = self._next
+            self._next += 1
+            return i
+
+    def _work(self):
+        while not self._stop.is_set():
+            # Primero el slot y después el índice: los segmentos en memoria son
+            # siempre los más bajos pendientes, así el consumidor nunca se traba
+            if not self._slots.acquire(timeout=0.5):
+                continue
+            i = self._claim()
+            if i is None:
+                self._slots.release()
+                return
+            try:
+                data = self._fetch(*self.segments[i])
+            except Exception as e:
+                data = e
+            with self._cond:
+                self._results[i] = data
+                self._cond.notify_all()
+
+    def _fetch(self, start: int, end: int) -> bytes:
+        for attempt in (1, 2):
+            try:
+                r = self.session.get(self.url, headers={"Range": f"bytes={start}-{end}"},
+                                     stream=True, timeout=self.timeout, allow_redirects=True)
+                try:
+                    if r.status_code != 206:
+                        raise RuntimeError(f"segment http_{r.status_code}")
+                    buf = bytearray()
+                    for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                        if self._stop.is_set():
+                            raise RuntimeError("cancelled")
+                        buf += chunk
+                finally:
+                    r.close()
+                if len(buf) != end - start + 1:
+                    raise RuntimeError(f"segment truncated ({len(buf)}/{end - start + 1})")
+                SEGMENTS.inc(outcome="ok")
+                return bytes(buf)
+            except Exception:
+                if attempt == 2 or self._stop.is_set():
+                    SEGMENTS.inc(outcome="error")
+                    raise
+                SEGMENTS.inc(outcome="retry")
+
+    def __iter__(self):
+        try:
+            for i in range(len(self.segments)):
+                with self._cond:
+                    while i not in self._results:
+                        self._cond.wait()
+                    data = self._results.pop(i)
+                self._slots.release()
+                if isinstance(data, Exception):
+                    # Cortamos el stream: el cliente reintenta con Range desde donde quedó
+                    raise data
+                yield data
+        finally:
+            self.close()
+
+def chain(first, reader: SegmentReader | None):
+    """Primer segmento (respuesta abierta) + el resto en paralelo, en orden"""
+    try:
+        yield from first.iter_content(chunk_size=CHUNK_SIZE)
+        if reader is not None:
+            yield from reader
+    finally:
+        first.close()
+        if reader is not None:
+            reader.close()
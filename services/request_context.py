@@ -0,0 +1,58 @@
+# services/request_context.py
+"""
+Estado por request (cache hit/miss, tiempo por fase, campos extra) que los
+middlewares leen al final para el access log y el header Server-Timing.
+
+Se guarda un dict mutable en un ContextVar: los endpoints sync corren en el
+threadpool con una copia del contexto, pero el dict es el mismo objeto, así
+que lo que anotan ahí lo ve el middleware.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current: ContextVar[dict | None] = ContextVar("request_stats", default=None)
+
+def start_request() -> dict:
+    """Crea las stats del request actual (lo llama el middleware de access log)"""
+    stats = {"cache": None, "phases": {}, "extra": {}}
+    _current.set(stats)
+    return stats
+
+def current() -> dict | None:
+    return _current.get()
+
+def mark_cache(hit: bool):
+    """Registra hit/miss; si hubo varios lookups, con un miss alcanza para 'miss'"""
+    stats = _current.get()
+    if stats is None:
+        return
+    if not hit:
+        stats["cache"] = "miss"
+    elif stats["cache"] is None:
+        stats["cache"] = "hit"
+
+def annotate(**fields):
+    """Agrega campos libres al registro del request (ej: client=web_music)"""
+    stats = _current.get()
+    if stats is not None:
+        stats["extra"].update(fields)
+
+@contextmanager
+def phase_timer(name: str):
+    """Suma al request el tiempo del bloque en la fase `name` (ms)"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current.get()
+        if stats is not None:
+            phases = stats["phases"]
+            phases[name] = phases.get(name, 0.0) + (time.perf_counter() - t0) * 1000
+
+def upstream_timer():
+    """Tiempo pasado esperando a YouTube / googlevideo"""
+    return phase_timer("upstream")
+
+def phase_ms(stats: dict, name: str) -> float:
+    return stats["phases"].get(name, 0.0)
@@ -1,7 +1,14 @@
 # services/supabase_service.py
-from supabase import create_client, Client
 from dotenv import load_dotenv
 import os
+import threading
+from typing import TYPE_CHECKING
+from services.metrics import UPSTREAM_SECONDS
+
+# supabase (y todo su árbol: gotrue, postgrest, httpx, realtime...) se importa
+# recién cuando hace falta un cliente: /api y /api/music arrancan sin pagarlo
+if TYPE_CHECKING:
+    from supabase import Client
 
 load_dotenv()
 
@@ -9,16 +16,49 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
-# Clientes globales
-supabase_anon: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-supabase_service: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+# Clientes globales (se construyen al primer uso)
+_clients: dict[str, "Client"] = {}
+_clients_lock = threading.Lock()
+
+def _create_client(key: str) -> "Client":
+    from supabase import create_client
+    return create_client(SUPABASE_URL, key)
+
+def _global_client(name: str, key: str) -> "Client":
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = _create_client(key)
+    return client
+
+def get_supabase_anon() -> "Client":
+    return _global_client("anon", SUPABASE_ANON_KEY)
 
-def db_as_user(jwt: str) -> Client:
+def get_supabase_service() -> "Client":
+    return _global_client("service", SUPABASE_SERVICE_ROLE_KEY)
+
+def warm_up():
+    """Importa supabase y construye los clientes globales fuera de un request"""
+    get_supabase_anon()
+    get_supabase_service()
+
+def db_as_user(jwt: str) -> "Client":
     """
     Devuelve un cliente autenticado como el usuario del JWT (RLS ON).
     No uses 'options={'headers': ...}' porque rompe en supabase-py.
     """
-    client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+    client = _create_client(SUPABASE_ANON_KEY)
     if jwt:
         client.postgrest.auth(jwt)  # setea Authorization: Bearer <jwt> internamente
-    return client
\ No newline at end of file
+    return client
+
+def execute(query, op: str):
+    """query.execute() midiendo latencia contra Supabase (op: 'playlists.select', ...)"""
+    with UPSTREAM_SECONDS.time(upstream="supabase", op=op, outcome="ok") as labels:
+        try:
+            return query.execute()
+        except Exception:
+            labels["outcome"] = "error"
+            raise
@@ -0,0 +1,124 @@
+# services/up_next.py
+"""
+Pipeline "up next": resuelve en background la URL de audio de los próximos
+tracks (álbum, playlist o radio) para que el cambio de tema no pague la
+extracción de yt-dlp.
+
+- Las resoluciones corren en un pool chico y en el carril BACKGROUND del
+  gobernador (services/upstream_governor): nunca le sacan capacidad a /play.
+- Cada job se le cobra al cliente que pidió /next (services/admission): usa
+  sus slots de extracción y su cola, así que /next no sirve para saltarse la
+  cuota. Además hay un tope de jobs pendientes por cliente
+  (UPNEXT_MAX_PENDING_PER_CLIENT) y en total (UPNEXT_MAX_PENDING); lo que no
+  entra no se agenda (/play lo extrae cuando llegue).
+- /play llama a claim(): si el track estaba agendado registra si llegó
+  "warm" (ya resuelto), "pending" (todavía resolviendo: lo espera en vez de
+  extraer de nuevo) o "failed".
+
+Es por worker: si el próximo /play cae en otro worker, ahí no cuenta ni
+aprovecha lo resuelto (el cache de URLs también es por worker).
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from services import admission
+from services.metrics import Counter, Gauge
+from services.upstream_governor import BACKGROUND, priority_scope
+
+UPNEXT_COUNT = int(os.getenv("UPNEXT_COUNT", "3"))        # tracks a resolver por defecto
+UPNEXT_WORKERS = int(os.getenv("UPNEXT_WORKERS", "2"))
+UPNEXT_WAIT = float(os.getenv("UPNEXT_WAIT", "10"))       # cuánto espera /play una resolución en curso
+UPNEXT_MAX_PENDING = int(os.getenv("UPNEXT_MAX_PENDING", "200"))
+UPNEXT_MAX_PENDING_PER_CLIENT = int(os.getenv("UPNEXT_MAX_PENDING_PER_CLIENT", "10"))
+SCHEDULED_TTL = 30 * 60  # agendados que nadie reprodujo: se olvidan
+MAX_JOBS = 5000  # terminados que se recuerdan para claim(); los más viejos se olvidan antes
+
+_executor: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+# video_id -> (future, agendado en, cliente)
+_jobs: dict[str, tuple[Future, float, str | None]] = {}
+
+# --- METRICS ---
+SCHEDULED = Counter("upnext_scheduled_total", "Tracks agendados para resolver en background", ("source",))
+SKIPPED = Counter("upnext_skipped_total", "Tracks no agendados por los topes de pendientes", ("reason",))
+PLAYS = Counter("upnext_plays_total", "Plays de tracks agendados por up-next", ("result",))
+Gauge("upnext_pending", "Resoluciones up-next en curso", fn=lambda: sum(not f.done() for f, _, _ in list(_jobs.values())))
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(UPNEXT_WORKERS, thread_name_prefix="up-next")
+    return _executor
+
+def _run(resolve, video_id: str, client: tuple[str, str] | None):
+    with admission.client_context(client), priority_scope(BACKGROUND):
+        return resolve(video_id)
+
+def _prune(now: float):
+    """Con el lock tomado: olvida terminados vencidos y, si sobran, los más viejos"""
+    for vid, (fut, ts, _) in list(_jobs.items()):
+        if fut.done() and now - ts > SCHEDULED_TTL:
+            del _jobs[vid]
+    if len(_jobs) >= MAX_JOBS:
+        for vid in [vid for vid, (fut, _, _) in _jobs.items() if fut.done()][: len(_jobs) - MAX_JOBS + 1]:
+            del _jobs[vid]
+
+def schedule(video_ids: list[str], resolve, source: str, client: tuple[str, str] | None = None) -> list[str]:
+    """
+    Agenda resolve(video_id) para cada id no agendado todavía, a cuenta de
+    `client` (admission.client_of del request); devuelve los nuevos
+    """
+    now = time.time()
+    scheduled, skipped = [], {}
+    pool = _pool()
+    owner = client[0] if client else None
+    with _lock:
+        _prune(now)
+        pending = [c for fut, _, c in _jobs.values() if not fut.done()]
+        total, mine = len(pending), pending.count(owner) if owner else 0
+        for vid in video_ids:
+            if vid in _jobs:
+                continue
+            if total >= UPNEXT_MAX_PENDING:
+                skipped["global"] = skipped.get("global", 0) + 1
+                continue
+            if owner and mine >= UPNEXT_MAX_PENDING_PER_CLIENT:
+                skipped["client"] = skipped.get("client", 0) + 1
+                continue
+            _jobs[vid] = (pool.submit(_run, resolve, vid, client), now, owner)
+            scheduled.append(vid)
+            total += 1
+            mine += 1
+    if scheduled:
+        SCHEDULED.inc(len(scheduled), source=source)
+    for reason, n in skipped.items():
+        SKIPPED.inc(n, reason=reason)
+    return scheduled
+
+def claim(video_id: str, wait: float = UPNEXT_WAIT):
+    """Lo llama /play: mide si llegó warm y espera una resolución en curso"""
+    with _lock:
+        job = _jobs.pop(video_id, None)
+    if job is None:
+        return
+    fut, _, _ = job
+    if fut.done():
+        PLAYS.inc(result="failed" if fut.exception() else "warm")
+        return
+    PLAYS.inc(result="pending")
+    try:
+        fut.result(timeout=wait)
+    except Exception:
+        pass  # /play reintenta por su cuenta
+
+def following(queue: list[str], current: str, n: int) -> list[str]:
+    """Los n ids que siguen a `current` en la cola (desde el principio si no está)"""
+    try:
+        start = queue.index(current) + 1
+    except ValueError:
+        start = 0
+    return [vid for vid in queue[start:] if vid and vid != current][:n]
@@ -0,0 +1,246 @@
+# services/upstream_governor.py
+"""
+Gobernador de llamadas upstream (YouTube):
+
+- Token bucket por tipo de llamada ("extract" = yt-dlp, "innertube" =
+  browse/search) para no empeorar un throttling de YouTube.
+- Circuit breaker por upstream ("innertube", "ytdlp:<client>", "googlevideo"):
+  tras N fallas seguidas se abre y falla rápido durante OPEN_SECONDS; después
+  deja pasar una prueba (half-open).
+- Carriles de prioridad: cuando falta capacidad, /play (INTERACTIVE) pasa
+  antes que /prefetch (PREFETCH) y que tareas de fondo (BACKGROUND). Los
+  carriles bajos además esperan menos antes de rendirse.
+
+La prioridad del request se toma de un ContextVar (priority_scope()).
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from services.metrics import Counter, Gauge
+
+INTERACTIVE, PREFETCH, BACKGROUND = 0, 1, 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", PREFETCH: "prefetch", BACKGROUND: "background"}
+# Cuánto espera cada carril por un token antes de UpstreamThrottled (s)
+MAX_WAIT = {INTERACTIVE: 10.0, PREFETCH: 5.0, BACKGROUND: 2.0}
+
+FAILURE_THRESHOLD = int(os.getenv("GOV_BREAKER_FAILURES", "5"))
+OPEN_SECONDS = float(os.getenv("GOV_BREAKER_OPEN_SECONDS", "30"))
+
+_priority: ContextVar[int] = ContextVar("upstream_priority", default=INTERACTIVE)
+
+class UpstreamUnavailable(RuntimeError):
+    """Base: el gobernador no dejó pasar la llamada (retry_after en segundos)"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class CircuitOpen(UpstreamUnavailable):
+    pass
+
+class UpstreamThrottled(UpstreamUnavailable):
+    pass
+
+@contextmanager
+def priority_scope(priority: int):
+    """Las llamadas upstream dentro del bloque usan este carril"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority() -> int:
+    return _priority.get()
+
+# --- METRICS ---
+BREAKER_STATE = Gauge("upstream_circuit_state", "Estado del breaker (0=closed, 1=half_open, 2=open)", ("upstream",))
+BREAKER_REJECTIONS = Counter("upstream_circuit_rejections_total", "Llamadas rechazadas por breaker abierto", ("upstream",))
+THROTTLED = Counter("upstream_throttled_total", "Llamadas sin token a tiempo", ("bucket", "lane"))
+TOKEN_WAIT = Counter("upstream_token_wait_seconds_total", "Tiempo esperando tokens", ("bucket", "lane"))
+
+class TokenBucket:
+    """Token bucket con cola de espera ordenada por (prioridad, llegada)"""
+
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiters: list[tuple[int, int]] = []
+        self._seq = itertools.count()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority: int = INTERACTIVE):
+        lane = PRIORITY_NAMES.get(priority, str(priority))
+        deadline = time.monotonic() + MAX_WAIT.get(priority, 5.0)
+        ticket = (priority, next(self._seq))
+        t0 = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiters[0] == ticket and self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        THROTTLED.inc(bucket=self.name, lane=lane)
+                        raise UpstreamThrottled(f"{self.name}: sin capacidad ({lane})", 1 / self.rate)
+                    needed = max(0.0, 1 - self.tokens) / self.rate
+                    self._cond.wait(min(remaining, max(needed, 0.005)))
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+                TOKEN_WAIT.inc(time.monotonic() - t0, bucket=self.name, lane=lane)
+
+    def stats(self) -> dict:
+        with self._cond:
+            self._refill()
+            lanes = {}
+            for prio, _ in self._waiters:
+                name = PRIORITY_NAMES.get(prio, str(prio))
+                lanes[name] = lanes.get(name, 0) + 1
+            return {"rate": self.rate, "burst": self.burst, "tokens": round(self.tokens, 2), "waiting": lanes}
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD, open_seconds: float = OPEN_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.totals = {"success": 0, "failure": 0, "rejected": 0}
+        self._lock = threading.Lock()
+        BREAKER_STATE.set(0, upstream=name)
+
+    def _set_state(self, state: str):
+        self.state = state
+        BREAKER_STATE.set({"closed": 0, "half_open": 1, "open": 2}[state], upstream=self.name)
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and self.retry_after() <= 0:
+                self._set_state("half_open")
+                self.trial_in_flight = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            self.totals["rejected"] += 1
+            BREAKER_REJECTIONS.inc(upstream=self.name)
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.totals["success"] += 1
+            self.failures = 0
+            self.trial_in_flight = False
+            if self.state != "closed":
+                self._set_state("closed")
+
+    def record_failure(self):
+        with self._lock:
+            self.totals["failure"] += 1
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state("open")
+
+    def release_trial(self):
+        """La prueba half-open no llegó a ejecutarse (ej: sin token)"""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == "open" and self.retry_after() > 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "retry_after": round(self.retry_after(), 1) if self.state == "open" else 0,
+                **self.totals,
+            }
+
+_buckets = {
+    "extract": TokenBucket("extract", float(os.getenv("GOV_EXTRACT_RATE", "5")), float(os.getenv("GOV_EXTRACT_BURST", "10"))),
+    "innertube": TokenBucket("innertube", float(os.getenv("GOV_INNERTUBE_RATE", "10")), float(os.getenv("GOV_INNERTUBE_BURST", "20"))),
+}
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def breaker(name: str) -> CircuitBreaker:
+    b = _breakers.get(name)
+    if b is None:
+        with _breakers_lock:
+            b = _breakers.setdefault(name, CircuitBreaker(name))
+    return b
+
+def call(upstream: str, fn, *args, bucket: str | None = None, is_failure=None, **kwargs):
+    """
+    Ejecuta fn pasando por breaker (+ token bucket si se indica).
+    is_failure(exc) decide si una excepción cuenta como falla del upstream
+    (ej: un video privado no es culpa de YouTube); por defecto todas cuentan.
+    """
+    b = breaker(upstream)
+    if not b.allow():
+        raise CircuitOpen(f"{upstream}: circuito abierto", b.retry_after() or 1.0)
+    if bucket:
+        try:
+            _buckets[bucket].acquire(current_priority())
+        except UpstreamThrottled:
+            # No llegamos a llamar: liberamos la prueba half-open sin juzgar
+            b.release_trial()
+            raise
+    try:
+        result = fn(*args, **kwargs)
+    except Exception as e:
+        if is_failure is None or is_failure(e):
+            b.record_failure()
+        else:
+            b.record_success()
+        raise
+    b.record_success()
+    return result
+
+def check(upstream: str):
+    """Para llamadas que no encajan en call(): CircuitOpen si está abierto"""
+    b = breaker(upstream)
+    if not b.allow():
+        raise CircuitOpen(f"{upstream}: circuito abierto", b.retry_after() or 1.0)
+
+def record(upstream: str, ok: bool):
+    """Resultado de una llamada hecha tras check()"""
+    if ok:
+        breaker(upstream).record_success()
+    else:
+        breaker(upstream).record_failure()
+
+def stats() -> dict:
+    return {
+        "buckets": {name: bk.stats() for name, bk in _buckets.items()},
+        "breakers": {name: br.stats() for name, br in sorted(_breakers.items())},
+    }
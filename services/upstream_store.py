@@ -0,0 +1,112 @@
+# services/upstream_store.py
+"""
+Grabación / reproducción de respuestas upstream (InnerTube y yt-dlp).
+
+UPSTREAM_MODE:
+- live   (default) -> siempre upstream, no toca disco
+- record           -> upstream + guarda cada respuesta; si upstream falla y ya
+                      hay una grabación, se sirve esa (fallback tibio)
+- replay           -> sólo disco; si no hay grabación -> UpstreamReplayMiss
+
+Layout (gzip, un JSON por respuesta), compatible con bench/fixtures.py:
+    <UPSTREAM_STORE_DIR>/<kind>/<key>[__<hash de args extra>].json.gz
+ej: search/daft%20punk.json.gz, browse/MPREb_xxx.json.gz, ytdlp/web_music/<videoId>.json.gz
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import urllib.parse
+
+MODE = os.getenv("UPSTREAM_MODE", "live").lower()
+STORE_DIR = os.getenv(
+    "UPSTREAM_STORE_DIR",
+    os.path.join(os.path.dirname(__file__), "..", "upstream_store"),
+)
+
+# search | browse | next | ytdlp/<client>: nada de "..", "/" extra ni absolutos
+_KIND_RE = re.compile(r"^[a-z_]+(/[a-z_]+)?$")
+
+class UpstreamReplayMiss(RuntimeError):
+    """Modo replay y no hay grabación para ese request"""
+
+def _kind_dir(kind: str) -> str:
+    """Directorio del kind dentro de STORE_DIR; ValueError si no es un kind válido"""
+    if not _KIND_RE.match(kind or ""):
+        raise ValueError(f"kind inválido: {kind!r}")
+    return os.path.join(STORE_DIR, *kind.split("/"))
+
+def _path(kind: str, key: str, extras: dict | None) -> str:
+    name = urllib.parse.quote(key or "", safe="")
+    extras = {k: v for k, v in (extras or {}).items() if v is not None}
+    if extras:
+        digest = hashlib.sha1(json.dumps(extras, sort_keys=True, default=str).encode()).hexdigest()[:12]
+        name = f"{name}__{digest}"
+    return os.path.join(_kind_dir(kind), name + ".json.gz")
+
+def load(kind: str, key: str, extras: dict | None = None):
+    path = _path(kind, key, extras)
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def save(kind: str, key: str, data, extras: dict | None = None):
+    """Escritura atómica (tmp + rename) para no dejar archivos a medias"""
+    path = _path(kind, key, extras)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as f:
+            f.write(json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"))
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+def through(kind: str, key: str, fetch, extras: dict | None = None):
+    """Ejecuta fetch() según el modo: live / record / replay"""
+    if MODE == "replay":
+        data = load(kind, key, extras)
+        if data is None:
+            raise UpstreamReplayMiss(f"{kind}:{key}")
+        return data
+
+    if MODE != "record":
+        return fetch()
+
+    try:
+        data = fetch()
+    except Exception:
+        stored = load(kind, key, extras)
+        if stored is not None:
+            return stored
+        raise
+    try:
+        save(kind, key, data, extras)
+    except Exception:
+        pass  # grabar es best-effort: nunca rompe el request
+    return data
+
+def list_entries(kind: str | None = None) -> list[dict]:
+    """Lista lo grabado (para /debug/upstream_store)"""
+    base = _kind_dir(kind) if kind else STORE_DIR
+    entries = []
+    for root, _, files in os.walk(base):
+        for fname in files:
+            if not fname.endswith(".json.gz"):
+                continue
+            full = os.path.join(root, fname)
+            rel = os.path.relpath(full, STORE_DIR)
+            entries.append({
+                "kind": os.path.dirname(rel).replace(os.sep, "/"),
+                "key": urllib.parse.unquote(fname[: -len(".json.gz")]),
+                "bytes": os.path.getsize(full),
+            })
+    return sorted(entries, key=lambda e: (e["kind"], e["key"]))
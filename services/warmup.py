@@ -0,0 +1,41 @@
+# services/warmup.py
+"""
+Warm-up en background, DESPUÉS de que el server ya acepta tráfico.
+
+Los módulos pesados (yt_dlp, innertube, supabase, requests) se importan de
+forma lazy; este paso los carga en un thread aparte para que el primer
+/play o /search no pague el import ni la construcción de clientes.
+
+WARMUP=0 lo deshabilita; WARMUP_DELAY (s) es la espera antes de empezar.
+"""
+import logging
+import os
+import threading
+import time
+
+from services.upstream_governor import BACKGROUND, priority_scope
+
+WARMUP = os.getenv("WARMUP", "1") != "0"
+WARMUP_DELAY = float(os.getenv("WARMUP_DELAY", "1"))
+
+logger = logging.getLogger("uvicorn.error")
+
+def start_warmup(steps: list[tuple[str, callable]]):
+    """Lanza los pasos (nombre, función) en un thread daemon"""
+    if not WARMUP or not steps:
+        return
+    threading.Thread(target=_run, args=(steps,), name="warmup", daemon=True).start()
+
+def _run(steps):
+    time.sleep(WARMUP_DELAY)
+    with priority_scope(BACKGROUND):
+        _run_steps(steps)
+
+def _run_steps(steps):
+    for name, step in steps:
+        t0 = time.perf_counter()
+        try:
+            step()
+            logger.info(f"🔥 warm-up {name}: {(time.perf_counter() - t0) * 1000:.0f} ms")
+        except Exception as e:
+            logger.warning(f"⚠️ warm-up {name} falló: {e}")
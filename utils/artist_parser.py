@@ -222,4 +222,169 @@ def parse_related_artists(section: dict):
                 "thumbnails": thumbs
             })
 
-    return related
\ No newline at end of file
+    return related
+
+# YouTube reordena las secciones según el artista, así que no podemos confiar
+# en la posición. Lo que manda es la estructura: el pageType de los items (o
+# del botón "Más"). Los títulos (en / es / pt, dependen del idioma de la
+# sesión) sólo desempatan álbumes vs singles o clasifican carruseles sin items
+_SECTION_TITLES = (
+    ("singles_eps", ("singles", "sencillos", "ep")),
+    ("albums", ("albums", "álbumes", "álbuns")),
+    ("related", ("fans might also like", "fans también", "fãs também", "similar", "related")),
+)
+
+def _section_title(renderer: dict) -> str:
+    header = renderer.get("header", {})
+    header = header.get("musicCarouselShelfBasicHeaderRenderer") or header
+    runs = (header.get("title") or renderer.get("title") or {}).get("runs", [])
+    return "".join(run.get("text", "") for run in runs).strip().lower()
+
+def _first_page_type(renderer: dict) -> str | None:
+    for item in renderer.get("contents", []):
+        r = item.get("musicTwoRowItemRenderer")
+        if not r:
+            continue
+        return (
+            r.get("navigationEndpoint", {})
+            .get("browseEndpoint", {})
+            .get("browseEndpointContextSupportedConfigs", {})
+            .get("browseEndpointContextMusicConfig", {})
+            .get("pageType")
+        )
+    return None
+
+def _more_page_type(renderer: dict) -> str | None:
+    header = renderer.get("header", {}).get("musicCarouselShelfBasicHeaderRenderer", {})
+    return (
+        header.get("moreContentButton", {})
+        .get("buttonRenderer", {})
+        .get("navigationEndpoint", {})
+        .get("browseEndpoint", {})
+        .get("browseEndpointContextSupportedConfigs", {})
+        .get("browseEndpointContextMusicConfig", {})
+        .get("pageType")
+    )
+
+def _title_section(title: str, candidates) -> str | None:
+    words = set(title.replace("&", " ").split())
+    return next(
+        (key for key, needles in _SECTION_TITLES
+         if key in candidates and any((n in words) if " " not in n else (n in title) for n in needles)),
+        None,
+    )
+
+def index_artist_sections(contents: list) -> dict:
+    """
+    Identifica las secciones de la página de artista por renderer + pageType
+    de sus items (artistas -> related, álbumes -> albums / singles_eps). El
+    título sólo desempata álbumes vs singles (si no dice nada: el primero es
+    albums) y clasifica los carruseles sin pageType.
+    Devuelve {"topSongs"|"albums"|"singles_eps"|"related": sección cruda}.
+    """
+    index = {}
+    for sec in contents:
+        if "musicShelfRenderer" in sec:
+            index.setdefault("topSongs", sec)
+            continue
+
+        carousel = sec.get("musicCarouselShelfRenderer")
+        if not carousel:
+            continue
+
+        page_type = _first_page_type(carousel)
+        title = _section_title(carousel)
+        if page_type == "MUSIC_PAGE_TYPE_ARTIST":
+            name = "related"
+        elif page_type == "MUSIC_PAGE_TYPE_ALBUM" or _more_page_type(carousel) == "MUSIC_PAGE_TYPE_ARTIST_DISCOGRAPHY":
+            name = _title_section(title, ("albums", "singles_eps"))
+            if name is None:
+                name = "albums" if "albums" not in index else "singles_eps"
+        elif page_type is None:
+            name = _title_section(title, ("albums", "singles_eps", "related"))
+        else:
+            name = None  # playlists, videos, etc.
+        if name:
+            index.setdefault(name, sec)
+    return index
+
+def more_endpoint(section: dict) -> dict | None:
+    """browseEndpoint del botón "Más" de un carrusel (discografía completa)"""
+    header = (
+        section.get("musicCarouselShelfRenderer", {})
+        .get("header", {})
+        .get("musicCarouselShelfBasicHeaderRenderer", {})
+    )
+    endpoint = (
+        header.get("moreContentButton", {})
+        .get("buttonRenderer", {})
+        .get("navigationEndpoint", {})
+        .get("browseEndpoint")
+    )
+    return endpoint if endpoint and endpoint.get("browseId") else None
+
+def parse_release_grid(response: dict):
+    """
+    Página de discografía ("Más" de álbumes / singles) o su continuación.
+    Devuelve (items musicTwoRowItemRenderer, token de continuación | None).
+    """
+    grid = response.get("continuationContents", {}).get("gridContinuation")
+    if grid is None:
+        tabs = (
+            response.get("contents", {})
+            .get("singleColumnBrowseResultsRenderer", {})
+            .get("tabs", [])
+        )
+        sections = (
+            tabs[0].get("tabRenderer", {})
+            .get("content", {})
+            .get("sectionListRenderer", {})
+            .get("contents", [])
+        ) if tabs else []
+        grid = next((sec["gridRenderer"] for sec in sections if "gridRenderer" in sec), {})
+
+    continuation = (
+        (grid.get("continuations") or [{}])[0]
+        .get("nextContinuationData", {})
+        .get("continuation")
+    )
+    return grid.get("items", []), continuation
+
+def parse_release_items(items: list):
+    """Álbumes / singles / EPs de un grid de discografía"""
+    releases = []
+    for item in items:
+        r = item.get("musicTwoRowItemRenderer")
+        if not r:
+            continue
+
+        title_run = r.get("title", {}).get("runs", [{}])[0]
+        release_id = title_run.get("navigationEndpoint", {}).get("browseEndpoint", {}).get("browseId")
+        if not release_id:
+            continue
+
+        # Subtitle → [ "Album", " • ", "2019" ] (en singles a veces sólo el año)
+        parts = [
+            run.get("text", "").strip()
+            for run in r.get("subtitle", {}).get("runs", [])
+            if run.get("text", "").strip() not in ("", "•")
+        ]
+        year = parts[-1] if parts and parts[-1].isdigit() else None
+        release_type = parts[0] if parts and not parts[0].isdigit() else None
+
+        thumbs = (
+            r.get("thumbnailRenderer", {})
+            .get("musicThumbnailRenderer", {})
+            .get("thumbnail", {})
+            .get("thumbnails", [])
+        )
+
+        releases.append({
+            "id": release_id,
+            "title": title_run.get("text"),
+            "type": release_type,
+            "year": year,
+            "thumbnails": thumbs,
+        })
+
+    return releases
@@ -0,0 +1,148 @@
+# utils/search_parser.py
+"""
+Parsers de las búsquedas filtradas de InnerTube (canciones / álbumes /
+artistas). Devuelven los mismos campos que las tarjetas de resultado
+principal de /search para poder mezclar y deduplicar.
+"""
+
+def parse_search_shelf(response: dict):
+    """
+    Shelf de una búsqueda filtrada o de su continuación.
+    Devuelve (items musicResponsiveListItemRenderer, token de continuación | None).
+    """
+    shelf = response.get("continuationContents", {}).get("musicShelfContinuation")
+    if shelf is None:
+        shelf = {}
+        tabs = (
+            response.get("contents", {})
+            .get("tabbedSearchResultsRenderer", {})
+            .get("tabs", [])
+        )
+        for tab in tabs:
+            sections = (
+                tab.get("tabRenderer", {})
+                .get("content", {})
+                .get("sectionListRenderer", {})
+                .get("contents", [])
+            )
+            shelf = next((sec["musicShelfRenderer"] for sec in sections if "musicShelfRenderer" in sec), {})
+            if shelf:
+                break
+
+    continuation = (
+        (shelf.get("continuations") or [{}])[0]
+        .get("nextContinuationData", {})
+        .get("continuation")
+    )
+    items = [item["musicResponsiveListItemRenderer"] for item in shelf.get("contents", [])
+             if "musicResponsiveListItemRenderer" in item]
+    return items, continuation
+
+def _column_runs(r: dict, n: int) -> list:
+    columns = r.get("flexColumns", [])
+    if len(columns) <= n:
+        return []
+    return columns[n].get("musicResponsiveListItemFlexColumnRenderer", {}).get("text", {}).get("runs", [])
+
+def _browse_id(run: dict) -> str | None:
+    return run.get("navigationEndpoint", {}).get("browseEndpoint", {}).get("browseId")
+
+def _thumbnails(r: dict) -> list:
+    return (
+        r.get("thumbnail", {})
+        .get("musicThumbnailRenderer", {})
+        .get("thumbnail", {})
+        .get("thumbnails", [])
+    )
+
+def _is_separator(text: str) -> bool:
+    return text.strip() in ("", "•", "&", ",")
+
+def parse_song_items(items: list):
+    songs = []
+    for r in items:
+        title_runs = _column_runs(r, 0)
+        video_id = (
+            r.get("playlistItemData", {}).get("videoId")
+            or (title_runs[0].get("navigationEndpoint", {}).get("watchEndpoint", {}).get("videoId") if title_runs else None)
+        )
+        if not video_id:
+            continue
+
+        # Subtitle → [artista(s), " • ", álbum, " • ", "3:21"] (algunas filas
+        # traen el álbum en una columna aparte)
+        artists, album, duration = [], None, None
+        runs = [run for n in range(1, len(r.get("flexColumns", []))) for run in _column_runs(r, n)]
+        for run in runs:
+            browse_id = _browse_id(run)
+            text = run.get("text", "")
+            if browse_id and browse_id.startswith("MPRE"):
+                album = {"id": browse_id, "title": text}
+            elif browse_id:
+                artists.append({"name": text, "id": browse_id})
+            elif ":" in text:
+                duration = text
+
+        # Algunas filas traen la duración en la columna fija
+        if duration is None:
+            for col in r.get("fixedColumns", []):
+                runs = col.get("musicResponsiveListItemFixedColumnRenderer", {}).get("text", {}).get("runs", [])
+                if runs and ":" in runs[0].get("text", ""):
+                    duration = runs[0]["text"]
+
+        songs.append({
+            "title": title_runs[0]["text"] if title_runs else None,
+            "videoId": video_id,
+            "artists": artists,
+            "album": album,
+            "duration": duration,
+            "thumbnails": _thumbnails(r),
+        })
+    return songs
+
+def parse_album_items(items: list):
+    albums = []
+    for r in items:
+        album_id = _browse_id(r)
+        if not album_id:
+            continue
+
+        # Subtitle → ["Album", " • ", artista, " • ", "2020"]
+        release_type, year, artists = None, None, []
+        for i, run in enumerate(_column_runs(r, 1)):
+            text = run.get("text", "")
+            browse_id = _browse_id(run)
+            if browse_id:
+                artists.append({"name": text, "id": browse_id})
+            elif _is_separator(text):
+                continue
+            elif i == 0:
+                release_type = text
+            elif text.isdigit():
+                year = text
+
+        title_runs = _column_runs(r, 0)
+        albums.append({
+            "id": album_id,
+            "title": title_runs[0]["text"] if title_runs else None,
+            "type": release_type,
+            "year": year,
+            "artists": artists,
+            "thumbnails": _thumbnails(r),
+        })
+    return albums
+
+def parse_artist_items(items: list):
+    artists = []
+    for r in items:
+        artist_id = _browse_id(r)
+        name_runs = _column_runs(r, 0)
+        if not artist_id or not name_runs:
+            continue
+        artists.append({
+            "name": name_runs[0]["text"],
+            "artistId": artist_id,
+            "subtitle": "".join(run.get("text", "") for run in _column_runs(r, 1)),
+            "thumbnails": _thumbnails(r),
+        })
+    return artists
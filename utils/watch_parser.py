@@ -0,0 +1,40 @@
+# utils/watch_parser.py
+def parse_watch_next(response: dict):
+    """
+    Extrae la cola "a continuación" (playlistPanelRenderer) de la respuesta
+    de InnerTube /next.
+    """
+    tabs = (
+        response.get("contents", {})
+        .get("singleColumnMusicWatchNextResultsRenderer", {})
+        .get("tabbedRenderer", {})
+        .get("watchNextTabbedResultsRenderer", {})
+        .get("tabs", [])
+    )
+    if not tabs:
+        return []
+
+    panel = (
+        tabs[0].get("tabRenderer", {})
+        .get("content", {})
+        .get("musicQueueRenderer", {})
+        .get("content", {})
+        .get("playlistPanelRenderer", {})
+    )
+
+    tracks = []
+    for item in panel.get("contents", []):
+        renderer = item.get("playlistPanelVideoRenderer")
+        if not renderer or not renderer.get("videoId"):
+            continue
+
+        title_runs = renderer.get("title", {}).get("runs", [])
+        length_runs = renderer.get("lengthText", {}).get("runs", [])
+
+        tracks.append({
+            "videoId": renderer["videoId"],
+            "title": title_runs[0]["text"] if title_runs else None,
+            "duration": length_runs[0]["text"] if length_runs else None,
+        })
+
+    return tracks